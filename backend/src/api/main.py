@@ -1,10 +1,45 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
+from typing import Literal, Union
+from src.graph.pool import aclose_pools, pool_stats
+from src.rag.admission import Overloaded, request_class
 from src.rag.query_processor import GraphRAGProcessor
+from src.rag.llm_cache import get_llm_cache
+from src.rag.single_flight import SingleFlight, normalize_query
+from src.rag.tracing import percentile
+from collections import deque
+from contextlib import asynccontextmanager
+import asyncio
+import json
+import logging
 import os
+import time
 
-app = FastAPI(title="SAP GraphRAG API")
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app):
+    # Build or load the vector index now rather than on the first seeded request
+    if processor.vector_seeds > 0:
+        await asyncio.to_thread(processor.vector_index)
+    # Likewise the lexical extractor and the reachability index behind impact questions
+    builds = [("reachability index", processor.reachability)]
+    if processor.lexical_min_confidence <= 1:
+        builds.insert(0, ("lexical extractor", processor.lexical_extractor))
+    for name, build in builds:
+        try:
+            await asyncio.to_thread(build)
+        except Exception:
+            # The graph may be unreachable at startup; the first request that needs it retries
+            logger.warning("%s not built at startup", name, exc_info=True)
+    yield
+    processor.close()
+    # Close the shared Neo4j drivers so in-flight connections are released cleanly
+    await aclose_pools()
+
+app = FastAPI(title="SAP GraphRAG API", lifespan=lifespan)
 
 # CORS for frontend
 app.add_middleware(
@@ -22,35 +57,202 @@ processor = GraphRAGProcessor(
     anthropic_api_key=os.getenv("ANTHROPIC_API_KEY")
 )
 
+# Concurrent /query requests for the same question and schema version share one run
+query_flight = SingleFlight("query", processor.tracer.singleflight_calls)
+
 class QueryRequest(BaseModel):
     query: str
+    # Batch/eval traffic waits behind interactive queries and is shed first
+    priority: Literal["interactive", "batch"] = "interactive"
 
 class QueryResponse(BaseModel):
     query: str
     answer: str
     tables: list[str]
     relationships: list[dict]
+    join_paths: list[dict] = []
+    impact: list[dict] = []
+    context_report: dict = {}
+    timings: dict = {}
+    coalesced: bool = False
+
+class BatchQueryRequest(BaseModel):
+    queries: list[str]
+    priority: Literal["interactive", "batch"] = "batch"
+
+class BatchQueryError(BaseModel):
+    query: str
+    error: str
+
+class BatchQueryResponse(BaseModel):
+    # A query that failed is reported on its own; the others still get answers
+    results: list[Union[QueryResponse, BatchQueryError]]
+
+def to_response(result):
+    if "error" in result:
+        return BatchQueryError(query=result['query'], error=result['error'])
+    return QueryResponse(
+        query=result['query'],
+        answer=result['answer'],
+        tables=result['entities'].get('tables', []),
+        relationships=result.get('graph_context', []),
+        join_paths=result.get('join_paths', []),
+        impact=result.get('impact', []),
+        context_report=result.get('context_report', {}),
+        timings=result.get('timings', {})
+    )
+
+def overloaded(e):
+    """429 (queue full) or 503 (deadline passed, shed) with a Retry-After hint"""
+    return HTTPException(
+        status_code=e.status, detail=str(e), headers={"Retry-After": str(e.retry_after)}
+    )
 
 @app.post("/query", response_model=QueryResponse)
 async def process_query(request: QueryRequest):
+    """Answer one query; identical concurrent queries attach to the run already in flight"""
+    try:
+        with request_class(request.priority, processor.admission.timeout):
+            version = await processor.graph.aschema_version()
+            result, coalesced = await query_flight.ado(
+                (normalize_query(request.query), version),
+                lambda: processor.aprocess(request.query),
+            )
+        response = to_response(result)
+        response.query = request.query
+        response.coalesced = coalesced
+        return response
+    except Overloaded as e:
+        raise overloaded(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/query/batch", response_model=BatchQueryResponse)
+async def process_batch(request: BatchQueryRequest):
+    """Many queries at once; results are in request order"""
+    try:
+        with request_class(request.priority, processor.admission.timeout):
+            results = await processor.aprocess_batch(request.queries)
+        return BatchQueryResponse(results=[to_response(r) for r in results])
+    except Overloaded as e:
+        raise overloaded(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Recent /query/stream timings: first pipeline event handed to the response (not the
+# first byte on the wire) and first answer token
+stream_timings = {"first_event_ms": deque(maxlen=1000), "first_token_ms": deque(maxlen=1000)}
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+async def open_stream(query, priority="interactive"):
+    """Start the pipeline and run it up to its "subgraph" event.
+
+    astream emits "subgraph" once the answer holds its LLM slot, so every
+    admission decision is made here, before the response starts: an
+    overloaded stage gets a 429/503 with Retry-After instead of a 200 stream.
+    """
+    started = time.perf_counter()
+    events = processor.astream(query)
+    ready = []
     try:
-        result = processor.process(request.query)
-        return QueryResponse(
-            query=result['query'],
-            answer=result['answer'],
-            tables=result['entities'].get('tables', []),
-            relationships=result.get('graph_context', [])
-        )
+        # The answer task started inside the block inherits its priority and deadline
+        with request_class(priority, processor.admission.timeout):
+            while not ready or ready[-1][0] != "subgraph":
+                ready.append(await events.__anext__())
+    except Overloaded as e:
+        await events.aclose()
+        raise overloaded(e)
     except Exception as e:
+        await events.aclose()
         raise HTTPException(status_code=500, detail=str(e))
+    return StreamingResponse(stream_events(events, ready, started),
+                             media_type="text/event-stream")
+
+async def stream_events(events, ready, started):
+    timings = {}
+
+    async def pending():
+        for item in ready:
+            yield item
+        async for item in events:
+            yield item
+
+    try:
+        async for event, data in pending():
+            elapsed = round((time.perf_counter() - started) * 1000, 1)
+            if "first_event_ms" not in timings:
+                timings["first_event_ms"] = elapsed
+                stream_timings["first_event_ms"].append(elapsed)
+            if event == "token" and "first_token_ms" not in timings:
+                timings["first_token_ms"] = elapsed
+                stream_timings["first_token_ms"].append(elapsed)
+            if event == "done":
+                data = {**data, **timings, "total_ms": elapsed}
+            yield sse_event(event, data)
+    except Exception as e:
+        # Headers are already sent, so errors past the first events travel as an event
+        yield sse_event("error", {"detail": str(e)})
+    finally:
+        await events.aclose()
+
+@app.post("/query/stream")
+async def stream_query(request: QueryRequest):
+    """Server-sent events: entities, subgraph, answer tokens, done"""
+    return await open_stream(request.query, request.priority)
+
+@app.get("/query/stream")
+async def stream_query_get(query: str):
+    """Same as POST /query/stream, for EventSource clients"""
+    return await open_stream(query)
 
 @app.get("/schema")
 async def get_schema():
     """Return available tables"""
-    with processor.graph_driver.session() as session:
-        result = session.run("MATCH (t:Table) RETURN t")
-        tables = [record['t'] for record in result]
-    return {"tables": tables}
+    return {"tables": await processor.graph.alist_tables()}
+
+@app.get("/stats")
+async def get_stats():
+    """Extraction tiers, streaming latency, coalescing, stage queues, LLM calls and Neo4j pools"""
+    streaming = {}
+    for name, values in stream_timings.items():
+        streaming[name] = {
+            "count": len(values),
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+        }
+    return {
+        "extraction_tiers": dict(processor.extraction_tiers),
+        "streaming": streaming,
+        "coalescing": {
+            "query": query_flight.stats(),
+            "subgraph": processor.subgraph_flight.stats(),
+        },
+        # Per-stage limit, active slots, queue depth by priority and wait percentiles
+        "admission": processor.admission.stats(),
+        # Per-stage LLM attempts, retries, timeouts and hedged calls
+        "llm_calls": {stage: llm.stats() for stage, llm in processor.llm_stages.items()},
+        "graph_pools": pool_stats(),
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Request and per-stage latency histograms, LLM token counters, in Prometheus format"""
+    return PlainTextResponse(
+        processor.tracer.registry.render(), media_type="text/plain; version=0.0.4"
+    )
+
+@app.get("/cache")
+async def get_cache_stats():
+    """LLM cache hit/miss counts per namespace, and subgraph cache hit ratio and size"""
+    cache = get_llm_cache()
+    subgraph_cache = processor.subgraph_cache
+    return {
+        "llm": {"enabled": False} if cache is None else {"enabled": True, **cache.stats()},
+        "subgraph": {"enabled": False} if subgraph_cache is None
+                    else {"enabled": True, **subgraph_cache.stats()},
+    }
 
 if __name__ == "__main__":
     import uvicorn
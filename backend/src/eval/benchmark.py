@@ -0,0 +1,345 @@
+"""Offline latency/throughput benchmark of the query pipelines.
+
+Runs GraphRAGProcessor, PlainRAGProcessor and the FastAPI app against a
+deterministic stub LLM and the embedded schema graph, so results measure
+the pipeline's own overhead rather than Anthropic or Neo4j.
+
+    python -m src.eval.benchmark --concurrency 1,8,32 --baseline data/bench_baseline.json \
+        --save-baseline
+    python -m src.eval.benchmark --concurrency 1,8,32 --baseline data/bench_baseline.json
+
+The first run records the baseline; later runs compare against it. The "api"
+target needs httpx.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import re
+import time
+import tracemalloc
+from datetime import datetime
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from src.eval.dataset import BASE_QUERIES
+from src.graph.backends import EmbeddedGraphBackend
+from src.graph.embedded import SchemaGraph
+from src.rag.context_builder import estimate_tokens
+from src.rag.llm_resilience import ResilientLLM
+from src.rag.plain_rag import PlainRAGProcessor
+from src.rag.query_processor import GraphRAGProcessor
+from src.rag.tracing import Tracer, percentile
+from src.rag.vector_index import HashingEmbedder
+
+TARGETS = ("graph_rag", "plain_rag", "api")
+
+
+class StubLLM:
+    """Deterministic chat model: a fixed delay, then `reply_tokens` tokens at `tokens_per_s`.
+
+    Extraction prompts get JSON naming the known tables mentioned in the
+    question; answer prompts get a reply listing the tables in the context.
+    Every `tail_every`-th call is `tail_ms` slower, to model a latency tail.
+    """
+
+    model = "stub"
+    max_tokens = 1000
+
+    def __init__(self, tables=(), latency_ms=50.0, tokens_per_s=0.0, reply_tokens=60,
+                 tail_every=0, tail_ms=0.0):
+        self.tables = set(tables)
+        self.latency = latency_ms / 1000
+        self.tail_every = tail_every
+        self.tail = tail_ms / 1000
+        self.tokens_per_s = tokens_per_s
+        self.reply_tokens = reply_tokens
+        self.calls = 0
+
+    def _reply(self, prompt):
+        if "Return as JSON" in prompt:
+            question = prompt.split('"')[1] if '"' in prompt else prompt
+            tables = [t for t in re.findall(r"[A-Z0-9_]{3,}", question) if t in self.tables]
+            return json.dumps({"tables": tables, "entities": [], "intent": "entity_lookup"})
+        tables = sorted(t for t in set(re.findall(r"[A-Z0-9_]{3,}", prompt)) if t in self.tables)
+        words = ("Relevant tables: " + ", ".join(tables) + ". ").split()
+        words += ["detail"] * max(self.reply_tokens - len(words), 0)
+        return " ".join(words[:max(self.reply_tokens, 1)])
+
+    def _delay(self):
+        """Fixed latency of the current call, counting it"""
+        self.calls += 1
+        if self.tail_every and self.calls % self.tail_every == 0:
+            return self.latency + self.tail
+        return self.latency
+
+    def _generation_time(self, text):
+        if self.tokens_per_s <= 0:
+            return 0.0
+        return estimate_tokens(text) / self.tokens_per_s
+
+    def invoke(self, prompt):
+        delay = self._delay()
+        text = self._reply(prompt)
+        time.sleep(delay + self._generation_time(text))
+        return AIMessage(content=text)
+
+    async def ainvoke(self, prompt):
+        delay = self._delay()
+        text = self._reply(prompt)
+        await asyncio.sleep(delay + self._generation_time(text))
+        return AIMessage(content=text)
+
+    async def astream(self, prompt):
+        delay = self._delay()
+        text = self._reply(prompt)
+        await asyncio.sleep(delay)
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            chunk = word if i == len(words) - 1 else word + " "
+            await asyncio.sleep(self._generation_time(chunk))
+            yield AIMessageChunk(content=chunk)
+
+
+def bench_queries(n):
+    """The first n questions cycling through every dataset template, in a fixed order"""
+    templates = [q for base in BASE_QUERIES for q in base["templates"]]
+    return list(itertools.islice(itertools.cycle(templates), n))
+
+
+def build_targets(schema_file="data/mock_sap_schema.json", llm_latency_ms=50.0,
+                  tokens_per_s=0.0, reply_tokens=60, tail_every=0, tail_ms=0.0,
+                  hedge_percentile=None):
+    """Processors wired to the stub LLM and the embedded graph; nothing leaves the process"""
+    graph = SchemaGraph.from_schema_file(schema_file)
+    tables = {t["name"] for t in graph.tables()}
+    llm = StubLLM(tables, llm_latency_ms, tokens_per_s, reply_tokens, tail_every, tail_ms)
+    tracer = Tracer(slow_ms=0)
+
+    graph_rag = GraphRAGProcessor(
+        None, None, None, None,
+        graph_backend=EmbeddedGraphBackend(graph),
+        embedder=HashingEmbedder(),
+        tracer=tracer,
+    )
+    graph_rag.vector_index_path = None
+    # Bypass the response cache so every query pays for its LLM calls; keep the
+    # deadlines, retries, hedging and admission slots the real models get
+    for stage in graph_rag.llm_stages:
+        graph_rag.llm_stages[stage] = ResilientLLM(
+            llm, stage, tracer=tracer, hedge_percentile=hedge_percentile,
+            limiter=graph_rag.admission.stages["llm"],
+        )
+    graph_rag.entity_llm = graph_rag.llm_stages["extract"]
+    graph_rag.answer_llm = graph_rag.llm_stages["generate"]
+
+    plain_rag = PlainRAGProcessor(schema_file=schema_file, index_path="", tracer=tracer)
+    plain_rag.answer_llm = llm
+    return {"graph_rag": graph_rag, "plain_rag": plain_rag}, llm
+
+
+def api_client(processor):
+    """httpx client calling the FastAPI app in-process, with `processor` behind it"""
+    import httpx
+
+    from src.api import main
+
+    main.processor = processor
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench")
+
+
+async def _drive(call, queries, concurrency):
+    """Run `call` over the queries `concurrency` at a time; (latencies in ms, wall clock s)"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(query):
+        async with semaphore:
+            t0 = time.perf_counter()
+            await call(query)
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(q) for q in queries))
+    return latencies, time.perf_counter() - started
+
+
+async def measure(target, call, queries, concurrency, track_memory=False):
+    """Latency percentiles, throughput and (optionally) peak traced memory of one scenario"""
+    if track_memory:
+        tracemalloc.start()
+    try:
+        latencies, wall = await _drive(call, queries, concurrency)
+        peak = tracemalloc.get_traced_memory()[1] if track_memory else None
+    finally:
+        if track_memory:
+            tracemalloc.stop()
+    return {
+        "target": target,
+        "concurrency": concurrency,
+        "queries": len(queries),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "throughput_qps": round(len(queries) / wall, 2) if wall > 0 else 0.0,
+        "wall_clock_s": round(wall, 3),
+        "peak_mem_mb": None if peak is None else round(peak / 2**20, 2),
+    }
+
+
+async def run_benchmark(targets=TARGETS, num_queries=50, concurrency_levels=(1, 8, 32),
+                        llm_latency_ms=50.0, tokens_per_s=0.0, reply_tokens=60, warmup=5,
+                        tail_every=0, tail_ms=0.0, hedge_percentile=None):
+    processors, llm = build_targets(
+        llm_latency_ms=llm_latency_ms, tokens_per_s=tokens_per_s, reply_tokens=reply_tokens,
+        tail_every=tail_every, tail_ms=tail_ms, hedge_percentile=hedge_percentile,
+    )
+    queries = bench_queries(num_queries)
+    client = api_client(processors["graph_rag"]) if "api" in targets else None
+    calls = {
+        "graph_rag": processors["graph_rag"].aprocess,
+        "plain_rag": processors["plain_rag"].aprocess,
+    }
+    if client is not None:
+        async def call_api(query):
+            response = await client.post("/query", json={"query": query})
+            response.raise_for_status()
+        calls["api"] = call_api
+
+    scenarios = []
+    try:
+        for target in targets:
+            # Warm caches, indexes and the lexical automaton outside the timed runs
+            await _drive(calls[target], bench_queries(warmup), 1)
+            for concurrency in concurrency_levels:
+                scenarios.append(await measure(target, calls[target], queries, concurrency))
+            # Memory is traced in its own pass: tracemalloc would skew the timings
+            memory = await measure(
+                target, calls[target], queries, max(concurrency_levels), track_memory=True
+            )
+            for scenario in scenarios:
+                if scenario["target"] == target:
+                    scenario["peak_mem_mb"] = memory["peak_mem_mb"]
+    finally:
+        if client is not None:
+            await client.aclose()
+        processors["graph_rag"].close()
+
+    return {
+        "created": datetime.utcnow().isoformat(timespec="seconds"),
+        "config": {
+            "queries": num_queries,
+            "concurrency": list(concurrency_levels),
+            "llm_latency_ms": llm_latency_ms,
+            "tokens_per_s": tokens_per_s,
+            "reply_tokens": reply_tokens,
+            "tail_every": tail_every,
+            "tail_ms": tail_ms,
+            "hedge_percentile": processors["graph_rag"].llm_stages["generate"].hedge_percentile,
+            "llm_calls": llm.calls,
+        },
+        "llm_stages": {
+            stage: wrapped.stats()
+            for stage, wrapped in processors["graph_rag"].llm_stages.items()
+        },
+        "scenarios": scenarios,
+    }
+
+
+def compare(results, baseline, tolerance=0.10):
+    """Scenarios whose p95 rose, or throughput fell, by more than `tolerance` vs the baseline"""
+    previous = {(s["target"], s["concurrency"]): s for s in baseline.get("scenarios", [])}
+    regressions = []
+    for scenario in results["scenarios"]:
+        old = previous.get((scenario["target"], scenario["concurrency"]))
+        if old is None:
+            continue
+        checks = [
+            ("p95_ms", scenario["p95_ms"] > old["p95_ms"] * (1 + tolerance)),
+            ("throughput_qps",
+             scenario["throughput_qps"] < old["throughput_qps"] * (1 - tolerance)),
+        ]
+        for metric, regressed in checks:
+            if regressed:
+                regressions.append({
+                    "target": scenario["target"],
+                    "concurrency": scenario["concurrency"],
+                    "metric": metric,
+                    "baseline": old[metric],
+                    "current": scenario[metric],
+                })
+    return regressions
+
+
+def print_results(results, regressions=None):
+    print(f"{'target':<10} {'conc':>4} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'qps':>8} {'peak MB':>8}")
+    for s in results["scenarios"]:
+        print(f"{s['target']:<10} {s['concurrency']:>4} {s['p50_ms']:>9} {s['p95_ms']:>9} "
+              f"{s['p99_ms']:>9} {s['throughput_qps']:>8} {s['peak_mem_mb']!s:>8}")
+    for r in regressions or []:
+        print(f"REGRESSION {r['target']} c={r['concurrency']} {r['metric']}: "
+              f"{r['baseline']} -> {r['current']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the pipelines offline")
+    parser.add_argument("--targets", default=",".join(TARGETS),
+                        help="comma-separated subset of " + ",".join(TARGETS))
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--concurrency", default="1,8,32",
+                        help="comma-separated concurrency levels")
+    parser.add_argument("--llm-latency-ms", type=float, default=50.0)
+    parser.add_argument("--tokens-per-s", type=float, default=0.0,
+                        help="stub LLM generation rate (0 = instant)")
+    parser.add_argument("--reply-tokens", type=int, default=60)
+    parser.add_argument("--tail-every", type=int, default=0,
+                        help="make every Nth stub LLM call slow (0 = never)")
+    parser.add_argument("--tail-ms", type=float, default=0.0,
+                        help="extra latency of the slow stub LLM calls")
+    parser.add_argument("--hedge-percentile", type=float, default=None,
+                        help="hedge LLM calls slower than this percentile "
+                             "(default LLM_HEDGE_PERCENTILE, off)")
+    parser.add_argument("--out", default=None, help="results JSON (default runs/bench/<ts>.json)")
+    parser.add_argument("--baseline", help="compare against this results JSON")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="allowed relative p95/throughput change before flagging")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="write the results to --baseline instead of comparing")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run_benchmark(
+        targets=[t for t in args.targets.split(",") if t],
+        num_queries=args.queries,
+        concurrency_levels=[int(c) for c in args.concurrency.split(",")],
+        llm_latency_ms=args.llm_latency_ms,
+        tokens_per_s=args.tokens_per_s,
+        reply_tokens=args.reply_tokens,
+        tail_every=args.tail_every,
+        tail_ms=args.tail_ms,
+        hedge_percentile=args.hedge_percentile,
+    ))
+
+    regressions = []
+    if args.baseline and not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        results["baseline"] = args.baseline
+        results["regressions"] = regressions
+    elif args.baseline and not args.save_baseline:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to record one")
+
+    out = args.out or os.path.join("runs", "bench", f"{datetime.utcnow():%Y%m%d_%H%M%S}.json")
+    for path in filter(None, [out, args.baseline if args.save_baseline else None]):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved benchmark results to {path}")
+
+    print_results(results, regressions)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
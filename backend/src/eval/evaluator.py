@@ -1,7 +1,8 @@
-KNOWN_TABLES = {"KNA1", "VBAK", "VBAP"}
-
 def extract_tables_from_answer(answer: str):
-    return [t for t in KNOWN_TABLES if t in answer]
+    """Schema tables named in the answer, as whole words, in mention order"""
+    from src.eval.scoring import get_scorer
+
+    return get_scorer().tables_in(answer)
 
 def is_refusal(answer: str):
     refusal_phrases = [
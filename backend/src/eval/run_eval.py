@@ -1,98 +1,111 @@
+import argparse
+import asyncio
 import os
-import csv
-import json
 from datetime import datetime
 
 from src.eval.dataset import generate_dataset
-from src.eval.evaluator import (
-    extract_tables_from_answer,
-    is_refusal,
-    precision_recall
-)
+from src.eval.runner import EvalRunner, load_dataset, save_dataset
+from src.graph.pool import close_pools
 from src.rag.query_processor import GraphRAGProcessor
 from src.rag.plain_rag import PlainRAGProcessor
 
-def flatten_schema_for_rag(schema_json):
-    lines = []
-    for t in schema_json["tables"]:
-        lines.append(f"Table {t['name']}: {t['description']}")
-        for f in t["fields"]:
-            lines.append(f"  - {f['name']}: {f['description']}")
-    return "\n".join(lines)
+# Both agents call the Anthropic API, so they share one rate limit
+AGENT_PROVIDERS = {"graph_rag": "anthropic", "plain_rag": "anthropic"}
 
 
-
-def run_evaluation(num_samples: int):
-    dataset = generate_dataset(num_samples)
-
-    # Load schema for plain RAG
-    with open("data/mock_sap_schema.json") as f:
-        schema_json = json.load(f)
-
-
-    schema_text = flatten_schema_for_rag(schema_json)
-
-    agents = {
+def build_agents():
+    return {
         "graph_rag": GraphRAGProcessor(
             os.getenv("NEO4J_URI"),
             os.getenv("NEO4J_USER"),
             os.getenv("NEO4J_PASSWORD"),
             os.getenv("ANTHROPIC_API_KEY"),
         ),
-        "plain_rag": PlainRAGProcessor(schema_text)
+        # Indexed by file hash: the schema is only flattened when it changed
+        "plain_rag": PlainRAGProcessor(schema_file="data/mock_sap_schema.json")
     }
 
 
-    run_id = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-    out_dir = f"runs/{run_id}"
-    os.makedirs(out_dir, exist_ok=True)
-
-    rows = []
-    
-    for agent_name, agent in agents.items():
-        for ex in dataset:
-            print(f"[{agent_name}] {ex['query_id']} - {ex['query']}")
-
-            result = agent.process(ex["query"])
-            answer = result["answer"]
-
-            predicted_tables = extract_tables_from_answer(answer)
-            expected_tables = ex["expected"]["tables"]
-
-            precision, recall = precision_recall(predicted_tables, expected_tables)
-
-            predicted_answerable = not is_refusal(answer)
-            expected_answerable = ex["expected"]["answerable"]
-
-            rows.append({
-                "run_id": run_id,
-                "agent": agent_name,
-                "query_id": ex["query_id"],
-                "task_type": ex["task_type"],
-                "query": ex["query"],
-                "answer": answer,
-                "predicted_tables": ",".join(predicted_tables),
-                "expected_tables": ",".join(expected_tables),
-                "expected_answerable": expected_answerable,
-                "predicted_answerable": predicted_answerable,
-                "table_precision": round(precision, 3),
-                "table_recall": round(recall, 3),
-                # "grounded": int(all(t in result["graph_context"] for t in predicted_tables)),
-            })
-
-    # Save TSV
-    out_path = f"{out_dir}/results.tsv"
-    with open(out_path, "w", newline="") as f:
-        writer = csv.DictWriter(
-            f,
-            fieldnames=rows[0].keys(),
-            delimiter="\t"
+def parse_rate_limits(specs):
+    """["anthropic=2.5", ...] -> {"anthropic": 2.5} (requests per second)"""
+    limits = {}
+    for spec in specs or []:
+        provider, _, rate = spec.partition("=")
+        limits[provider] = float(rate)
+    return limits
+
+
+def print_summary(summary):
+    print(f"\nRun {summary['run_id']}: {summary['completed']} completed, "
+          f"{summary['failed']} failed in {summary['wall_clock_s']}s "
+          f"({summary['throughput_qps']} queries/s)")
+    saved = summary.get("parallel_saved_ms") or {}
+    if saved.get("examples"):
+        print(f"  running agents side by side saved {saved['total']}ms over "
+              f"{saved['examples']} examples (p50 {saved['p50']}ms per query)")
+    for agent_name, s in summary["agents"].items():
+        print(f"  {agent_name}: precision={s['precision']} recall={s['recall']} "
+              f"grounded={s.get('grounded_rate')} "
+              f"p50={s['latency_ms_p50']}ms p95={s['latency_ms_p95']}ms "
+              f"p99={s['latency_ms_p99']}ms (n={s['examples']})")
+        if s.get("stages_ms"):
+            print("    stages p50/p95: " + ", ".join(
+                f"{stage}={v['p50']}/{v['p95']}ms" for stage, v in s["stages_ms"].items()
+            ))
+
+
+def run_evaluation(num_samples: int, concurrency=None, rate_limits=None, resume=None):
+    """Run both agents over a generated dataset; `resume` continues runs/<run_id>"""
+    concurrency = concurrency or int(os.getenv("EVAL_CONCURRENCY", "8"))
+
+    if resume:
+        run_id = resume
+        out_dir = f"runs/{run_id}"
+        dataset = load_dataset(out_dir)
+    else:
+        run_id = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+        out_dir = f"runs/{run_id}"
+        os.makedirs(out_dir, exist_ok=True)
+        dataset = generate_dataset(num_samples)
+        # Saved so a resumed run sees the same queries under the same ids
+        save_dataset(out_dir, dataset)
+
+    runner = EvalRunner(
+        build_agents(),
+        out_dir,
+        run_id,
+        concurrency=concurrency,
+        rate_limits=rate_limits,
+        providers=AGENT_PROVIDERS,
+    )
+    summary = asyncio.run(runner.run(dataset))
+
+    print_summary(summary)
+    print(f"Saved evaluation results to {runner.results_path}")
+    return summary
+
+
+def main(argv=None, description="Evaluate GraphRAG against plain RAG"):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--num-samples", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="queries in flight at once (default: EVAL_CONCURRENCY or 8)")
+    parser.add_argument("--rate-limit", action="append", metavar="PROVIDER=RPS",
+                        help="per-provider requests/second, e.g. anthropic=2")
+    parser.add_argument("--resume", metavar="RUN_ID",
+                        help="continue a partial run, skipping queries already in its results.tsv")
+    args = parser.parse_args(argv)
+
+    try:
+        return run_evaluation(
+            args.num_samples,
+            concurrency=args.concurrency,
+            rate_limits=parse_rate_limits(args.rate_limit),
+            resume=args.resume,
         )
-        writer.writeheader()
-        writer.writerows(rows)
-
-    print(f"Saved evaluation results to {out_path}")
+    finally:
+        close_pools()
 
 
 if __name__ == "__main__":
-    run_evaluation(num_samples=20)
+    main()
@@ -0,0 +1,266 @@
+import asyncio
+import csv
+import json
+import os
+import time
+
+from src.eval.scoring import context_of, format_context, get_scorer
+from src.rag.admission import request_class
+from src.rag.tracing import percentile
+
+RESULT_FIELDS = [
+    "run_id",
+    "agent",
+    "query_id",
+    "task_type",
+    "query",
+    "answer",
+    "predicted_tables",
+    "expected_tables",
+    "expected_answerable",
+    "predicted_answerable",
+    "table_precision",
+    "table_recall",
+    "latency_ms",
+    "stages_ms",
+    "grounded",
+    "ungrounded_tables",
+    "unsupported_relationships",
+    "unknown_identifiers",
+    "context_tables",
+    "context_edges",
+]
+
+
+def save_dataset(out_dir, dataset):
+    with open(os.path.join(out_dir, "dataset.json"), "w") as f:
+        json.dump(dataset, f, indent=2)
+
+
+def load_dataset(out_dir):
+    with open(os.path.join(out_dir, "dataset.json")) as f:
+        return json.load(f)
+
+
+def score_result(run_id, agent_name, ex, result, latency_ms, stages=None, scorer=None):
+    answer = result["answer"]
+    context = context_of(result)
+    scores = (scorer or get_scorer()).score(answer, ex["expected"]["tables"], context)
+
+    return {
+        "run_id": run_id,
+        "agent": agent_name,
+        "query_id": ex["query_id"],
+        "task_type": ex["task_type"],
+        "query": ex["query"],
+        "answer": answer,
+        "predicted_tables": ",".join(scores["predicted_tables"]),
+        "expected_tables": ",".join(ex["expected"]["tables"]),
+        "expected_answerable": ex["expected"]["answerable"],
+        "predicted_answerable": scores["predicted_answerable"],
+        "table_precision": scores["table_precision"],
+        "table_recall": scores["table_recall"],
+        "latency_ms": round(latency_ms, 1),
+        # Per-stage breakdown from the agent's trace, e.g. {"retrieve": 12.3, "generate": 840.1}
+        "stages_ms": json.dumps(stages or {}, sort_keys=True),
+        "grounded": scores["grounded"],
+        "ungrounded_tables": ",".join(scores["ungrounded_tables"]),
+        "unsupported_relationships": ",".join(scores["unsupported_relationships"]),
+        "unknown_identifiers": ",".join(scores["unknown_identifiers"]),
+        # What was retrieved, so old runs can be re-scored offline (python -m src.eval.scoring)
+        **format_context(context),
+    }
+
+
+class RateLimiter:
+    """Async token bucket: `rate` acquisitions per second, bursts up to `burst`"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class EvalRunner:
+    """Runs every (agent, example) pair through a bounded worker pool.
+
+    The agents' calls for one example are started together, so Plain RAG
+    and Graph RAG answer the same question concurrently; the wall-clock time
+    this saves per example is reported in the summary. Each result is
+    appended to results.tsv as soon as it completes, so a crashed run loses
+    at most the in-flight examples; running again with the same out_dir
+    skips the (agent, query_id) pairs already on disk.
+
+    `rate_limits` maps provider name to requests/second and `providers`
+    maps agent name to provider; agents without a provider are unlimited.
+    """
+
+    def __init__(self, agents, out_dir, run_id, concurrency=8, rate_limits=None, providers=None,
+                 scorer=None):
+        self.agents = agents
+        self.out_dir = out_dir
+        self.run_id = run_id
+        self.concurrency = concurrency
+        self.limiters = {
+            provider: RateLimiter(rate) for provider, rate in (rate_limits or {}).items()
+        }
+        self.providers = providers or {}
+        self.results_path = os.path.join(out_dir, "results.tsv")
+        self.scorer = scorer
+        self.failures = []
+        self.saved_ms = []
+
+    def completed(self):
+        """Rows already written by an earlier (possibly crashed) run"""
+        if not os.path.exists(self.results_path):
+            return []
+        with open(self.results_path, newline="") as f:
+            return list(csv.DictReader(f, delimiter="\t"))
+
+    async def _call(self, agent_name, query):
+        limiter = self.limiters.get(self.providers.get(agent_name))
+        if limiter is not None:
+            await limiter.acquire()
+        agent = self.agents[agent_name]
+        if hasattr(agent, "aprocess"):
+            # Evaluation traffic queues behind interactive queries
+            with request_class("batch"):
+                return await agent.aprocess(query)
+        return await asyncio.to_thread(agent.process, query)
+
+    async def run(self, dataset):
+        done_rows = self.completed()
+        done = {(row["agent"], row["query_id"]) for row in done_rows}
+        pending = [
+            (agent_name, ex)
+            for ex in dataset
+            for agent_name in self.agents
+            if (agent_name, ex["query_id"]) not in done
+        ]
+        if done:
+            print(f"Resuming {self.run_id}: {len(done)} results on disk, {len(pending)} to go")
+
+        os.makedirs(self.out_dir, exist_ok=True)
+        is_new = not os.path.exists(self.results_path)
+        # A resumed run keeps the columns its file was started with
+        fieldnames = list(done_rows[0].keys()) if done_rows else RESULT_FIELDS
+        started = time.perf_counter()
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        with open(self.results_path, "a", newline="") as f:
+            writer = csv.DictWriter(
+                f, fieldnames=fieldnames, delimiter="\t", extrasaction="ignore"
+            )
+            if is_new:
+                writer.writeheader()
+
+            async def run_one(agent_name, ex):
+                async with semaphore:
+                    t0 = time.perf_counter()
+                    try:
+                        result = await self._call(agent_name, ex["query"])
+                    except Exception as e:
+                        # Left off the results file so a resumed run retries it
+                        self.failures.append((agent_name, ex["query_id"], str(e)))
+                        print(f"[{agent_name}] {ex['query_id']} failed: {e}")
+                        return None
+                    t1 = time.perf_counter()
+                    latency_ms = (t1 - t0) * 1000
+
+                stages = (result.get("timings") or {}).get("stages")
+                row = score_result(
+                    self.run_id, agent_name, ex, result, latency_ms, stages, self.scorer
+                )
+                writer.writerow(row)
+                f.flush()
+                print(f"[{agent_name}] {ex['query_id']} - {ex['query']} ({latency_ms:.0f} ms)")
+                return t0, t1
+
+            async def run_example(ex, agent_names):
+                spans = [s for s in await asyncio.gather(
+                    *(run_one(agent_name, ex) for agent_name in agent_names)
+                ) if s is not None]
+                if len(spans) > 1:
+                    # Sequential time minus the time the example actually took
+                    wall = max(t1 for _, t1 in spans) - min(t0 for t0, _ in spans)
+                    sequential = sum(t1 - t0 for t0, t1 in spans)
+                    self.saved_ms.append((sequential - wall) * 1000)
+
+            by_example = {}
+            for agent_name, ex in pending:
+                by_example.setdefault(ex["query_id"], (ex, []))[1].append(agent_name)
+            await asyncio.gather(*(run_example(ex, names) for ex, names in by_example.values()))
+
+        wall_clock = time.perf_counter() - started
+        summary = self.summarize(self.completed(), wall_clock, len(pending))
+        with open(os.path.join(self.out_dir, "summary.json"), "w") as f:
+            json.dump(summary, f, indent=2)
+        return summary
+
+    def summarize(self, rows, wall_clock, attempted):
+        """Per-agent micro precision/recall and latency percentiles, plus run throughput"""
+        agents = {}
+        for row in rows:
+            stats = agents.setdefault(
+                row["agent"],
+                {"TP": 0, "FP": 0, "FN": 0, "latencies": [], "stages": {}, "grounded": []},
+            )
+            predicted = set(filter(None, row["predicted_tables"].split(",")))
+            expected = set(filter(None, row["expected_tables"].split(",")))
+            stats["TP"] += len(predicted & expected)
+            stats["FP"] += len(predicted - expected)
+            stats["FN"] += len(expected - predicted)
+            if row.get("latency_ms"):
+                stats["latencies"].append(float(row["latency_ms"]))
+            if row.get("grounded") not in (None, ""):
+                stats["grounded"].append(int(row["grounded"]))
+            for stage, ms in json.loads(row.get("stages_ms") or "{}").items():
+                stats["stages"].setdefault(stage, []).append(ms)
+
+        summary = {"run_id": self.run_id, "agents": {}}
+        for agent_name, s in agents.items():
+            tp, fp, fn = s["TP"], s["FP"], s["FN"]
+            latencies = s["latencies"]
+            summary["agents"][agent_name] = {
+                "examples": len(latencies),
+                "precision": round(tp / (tp + fp), 3) if tp + fp else 0.0,
+                "recall": round(tp / (tp + fn), 3) if tp + fn else 0.0,
+                "grounded_rate": round(sum(s["grounded"]) / len(s["grounded"]), 3)
+                if s["grounded"] else None,
+                "latency_ms_p50": _round(percentile(latencies, 50)),
+                "latency_ms_p95": _round(percentile(latencies, 95)),
+                "latency_ms_p99": _round(percentile(latencies, 99)),
+                "stages_ms": {
+                    stage: {"p50": _round(percentile(v, 50)), "p95": _round(percentile(v, 95))}
+                    for stage, v in sorted(s["stages"].items())
+                },
+            }
+
+        completed = attempted - len(self.failures)
+        summary["wall_clock_s"] = round(wall_clock, 2)
+        summary["completed"] = completed
+        summary["failed"] = len(self.failures)
+        summary["throughput_qps"] = round(completed / wall_clock, 3) if wall_clock > 0 else 0.0
+        summary["parallel_saved_ms"] = {
+            "examples": len(self.saved_ms),
+            "total": _round(sum(self.saved_ms)),
+            "p50": _round(percentile(self.saved_ms, 50)),
+        }
+        return summary
+
+
+def _round(value):
+    return None if value is None else round(value, 1)
@@ -0,0 +1,294 @@
+"""Scale benchmark over synthetic schemas of growing size.
+
+For each size tier a seeded synthetic schema is generated (or reused). Each
+tier times:
+
+- the GraphBuilder load: the streamed parse and UNWIND row building always;
+  the Neo4j writes too with --neo4j;
+- the embedded snapshot build;
+- 1-hop and 2-hop retrieve_subgraph for hub tables (KNA1, MARA, T001) and a
+  sample of ordinary ones, on the embedded backend and, with --neo4j, on
+  Neo4jGraphBackend over the loaded graph;
+- context formatting of the retrieved subgraphs.
+
+--neo4j deletes every node in the NEO4J_URI database before each tier and
+again after the run, so it must be confirmed with --clear-neo4j. Point it at a
+scratch database, never at the one the API serves.
+
+The report gives each timing per tier and its scaling exponent between
+consecutive tiers (1.0 is linear in the table count, 0 flat):
+
+    python -m src.eval.scale_benchmark --tiers 1000,10000,100000
+"""
+import argparse
+import json
+import math
+import os
+import random
+import time
+from datetime import datetime
+
+from src.graph.backends import EmbeddedGraphBackend, Neo4jGraphBackend
+from src.graph.builder import field_rows, relationship_row, table_row
+from src.graph.embedded import SchemaGraph
+from src.graph.schema_stream import iter_schema
+from src.graph.synthetic_schema import generate_schema
+from src.rag.context_builder import ContextBuilder
+from src.rag.retrieval_plan import plan_for
+from src.rag.tracing import percentile
+
+HUBS = ("KNA1", "MARA", "T001")
+
+CLEAR_BATCH = """
+    MATCH (n) WITH n LIMIT $limit
+    DETACH DELETE n
+    RETURN count(*) AS deleted
+"""
+
+
+def builder_rows(schema_file):
+    """Rows GraphBuilder.bulk_load would write, built the same way but not sent"""
+    rows = 0
+    for kind, item in iter_schema(schema_file):
+        if kind == "table":
+            table_row(item)
+            rows += 1 + len(field_rows(item))
+        else:
+            relationship_row(item)
+            rows += 1
+    return rows
+
+
+def neo4j_settings():
+    return (
+        os.getenv("NEO4J_URI", "bolt://localhost:7687"),
+        os.getenv("NEO4J_USER", "neo4j"),
+        os.getenv("NEO4J_PASSWORD", "password"),
+    )
+
+
+def neo4j_clear(batch_size=10000):
+    """Delete every node of the NEO4J_URI database, in batches; returns the count"""
+    from src.graph.pool import get_pool
+
+    pool = get_pool(*neo4j_settings())
+    deleted = 0
+    while True:
+        rows = pool.write(CLEAR_BATCH, limit=batch_size)
+        if not rows or not rows[0]["deleted"]:
+            return deleted
+        deleted += rows[0]["deleted"]
+
+
+def neo4j_load(schema_file):
+    """Clear the database, then time GraphBuilder.bulk_load of `schema_file` into it"""
+    from src.graph.builder import GraphBuilder
+
+    neo4j_clear()
+    return timed(GraphBuilder(*neo4j_settings()).bulk_load, schema_file, verbose=False)
+
+
+def timed(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - t0) * 1000
+
+
+def sample_tables(graph, samples, seed):
+    rng = random.Random(seed)
+    ids = rng.sample(range(graph.num_tables), min(samples, graph.num_tables))
+    return [graph.table_name(tid) for tid in ids]
+
+
+def measure_queries(backend, tables, builder):
+    """Retrieval and context timings (ms) over single-table lookups"""
+    timings = {"retrieve_1hop_ms": [], "retrieve_2hop_ms": [], "fields_ms": [],
+               "context_ms": []}
+    edges, tokens = [], []
+    plan = plan_for("relationship")
+    for name in tables:
+        records, ms = timed(backend.retrieve_subgraph, [name])
+        timings["retrieve_1hop_ms"].append(ms)
+        edges.append(len(records))
+        _, ms = timed(backend.retrieve_khop, [name], 2)
+        timings["retrieve_2hop_ms"].append(ms)
+
+        names = {name} | {r[side]['name'] for r in records for side in ('t1', 't2')}
+        fields, ms = timed(backend.table_fields, sorted(names), plan.join_fields(records))
+        timings["fields_ms"].append(ms)
+        entities = {"tables": [name], "entities": [], "intent": "relationship"}
+        (_, report), ms = timed(builder.build, entities, records, fields=fields)
+        timings["context_ms"].append(ms)
+        tokens.append(report["tokens"])
+
+    result = {}
+    for metric, values in timings.items():
+        result[metric] = {"p50": round(percentile(values, 50), 3),
+                          "p95": round(percentile(values, 95), 3)}
+    result["edges"] = {"mean": round(sum(edges) / len(edges), 1), "max": max(edges)}
+    result["context_tokens_p50"] = percentile(tokens, 50)
+    return result
+
+
+def run_tier(num_tables, data_dir, seed=0, samples=50, neo4j=False, regenerate=False,
+             **generator_args):
+    # Generator settings are part of the name, so a reused file always matches them
+    suffix = "".join(f"_{k}{v}" for k, v in sorted(generator_args.items()))
+    path = os.path.join(data_dir, f"synthetic_{num_tables}_s{seed}{suffix}.json")
+    tier = {"tables": num_tables, "schema_file": path}
+    if regenerate or not os.path.exists(path):
+        stats = generate_schema(path, num_tables, seed=seed, **generator_args)
+        tier["generate_s"] = stats["seconds"]
+    tier["file_mb"] = round(os.path.getsize(path) / 2**20, 2)
+
+    tier["rows"], ms = timed(builder_rows, path)
+    tier["builder_rows_s"] = round(ms / 1000, 3)
+    if neo4j:
+        load, ms = neo4j_load(path)
+        tier["neo4j_load_s"] = round(ms / 1000, 3)
+        tier["neo4j_rows_per_sec"] = load.get("rows_per_sec")
+    graph, ms = timed(SchemaGraph.from_schema_file, path)
+    tier["embedded_load_s"] = round(ms / 1000, 3)
+    tier["fields"] = graph.num_fields
+    tier["relationships"] = graph.num_relationships
+
+    backend = EmbeddedGraphBackend(graph)
+    builder = ContextBuilder()
+    hubs = [name for name in HUBS if graph.table_id(name) is not None]
+    sample = sample_tables(graph, samples, seed)
+    tier["hubs"] = measure_queries(backend, hubs, builder) if hubs else None
+    tier["sample"] = measure_queries(backend, sample, builder)
+    if neo4j:
+        # The same tables over the graph just loaded
+        backend = Neo4jGraphBackend(*neo4j_settings())
+        tier["neo4j_hubs"] = measure_queries(backend, hubs, builder) if hubs else None
+        tier["neo4j_sample"] = measure_queries(backend, sample, builder)
+    return tier
+
+
+def scalar_metrics(tier):
+    """Flat {metric: value} of a tier's timings, for the scaling exponents"""
+    metrics = {k: tier[k] for k in ("builder_rows_s", "neo4j_load_s", "embedded_load_s")
+               if tier.get(k)}
+    for group in ("hubs", "sample", "neo4j_hubs", "neo4j_sample"):
+        for metric, value in (tier.get(group) or {}).items():
+            if metric.endswith("_ms"):
+                metrics[f"{group}.{metric}.p50"] = value["p50"]
+    return metrics
+
+
+def scaling(tiers):
+    """log-log slope of each metric between consecutive tiers"""
+    exponents = []
+    for small, large in zip(tiers, tiers[1:]):
+        ratio = math.log(large["tables"] / small["tables"])
+        a, b = scalar_metrics(small), scalar_metrics(large)
+        exponents.append({
+            "from": small["tables"],
+            "to": large["tables"],
+            "exponents": {
+                metric: round(math.log(b[metric] / a[metric]) / ratio, 2)
+                for metric in a if metric in b and a[metric] > 0 and b[metric] > 0
+            },
+        })
+    return exponents
+
+
+def run_scale_benchmark(tiers=(1000, 10000, 100000), data_dir="runs/scale/schemas", seed=0,
+                        samples=50, neo4j=False, regenerate=False, verbose=True,
+                        **generator_args):
+    results = []
+    try:
+        for num_tables in sorted(tiers):
+            if verbose:
+                print(f"[scale] {num_tables} tables ...")
+            results.append(run_tier(num_tables, data_dir, seed, samples, neo4j, regenerate,
+                                    **generator_args))
+    finally:
+        if neo4j:
+            from src.graph.pool import close_pools
+
+            # Leave no synthetic tables behind in the database
+            try:
+                neo4j_clear()
+            finally:
+                close_pools()
+    return {
+        "created": datetime.utcnow().isoformat(timespec="seconds"),
+        "config": {"seed": seed, "samples": samples, "neo4j": neo4j, **generator_args},
+        "tiers": results,
+        "scaling": scaling(results),
+    }
+
+
+def print_report(results):
+    backends = [("embedded", "")]
+    if results["config"].get("neo4j"):
+        backends.append(("neo4j", "neo4j_"))
+    for label, prefix in backends:
+        load = "neo4j_load_s" if prefix else "embedded_load_s"
+        print(f"retrieval on the {label} backend:")
+        print(f"{'tables':>8} {'fields':>9} {'rels':>8} {'rows s':>8} {'load s':>8} "
+              f"{'1hop p50':>9} {'2hop p50':>9} {'ctx p50':>8} {'hub 1hop':>9} "
+              f"{'hub edges':>9}")
+        for t in results["tiers"]:
+            sample, hubs = t[f"{prefix}sample"], t[f"{prefix}hubs"] or {}
+            print(f"{t['tables']:>8} {t['fields']:>9} {t['relationships']:>8} "
+                  f"{t['builder_rows_s']:>8} {t[load]:>8} "
+                  f"{sample['retrieve_1hop_ms']['p50']:>9} "
+                  f"{sample['retrieve_2hop_ms']['p50']:>9} "
+                  f"{sample['context_ms']['p50']:>8} "
+                  f"{hubs.get('retrieve_1hop_ms', {}).get('p50', '-')!s:>9} "
+                  f"{hubs.get('edges', {}).get('max', '-')!s:>9}")
+    for step in results["scaling"]:
+        print(f"scaling {step['from']} -> {step['to']} tables:")
+        for metric, exponent in sorted(step["exponents"].items()):
+            print(f"  {metric:<32} n^{exponent}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time loading, retrieval and context "
+                                                 "formatting on synthetic schemas")
+    parser.add_argument("--tiers", default="1000,10000,100000",
+                        help="comma-separated table counts")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--samples", type=int, default=50,
+                        help="ordinary tables queried per tier, besides the hubs")
+    parser.add_argument("--avg-fields", type=float, default=20)
+    parser.add_argument("--avg-degree", type=float, default=3.0)
+    parser.add_argument("--data-dir", default="runs/scale/schemas",
+                        help="where generated schemas are kept and reused")
+    parser.add_argument("--regenerate", action="store_true",
+                        help="regenerate schemas already in --data-dir")
+    parser.add_argument("--neo4j", action="store_true",
+                        help="also time GraphBuilder.bulk_load into NEO4J_URI and "
+                             "Neo4j retrieval; needs --clear-neo4j")
+    parser.add_argument("--clear-neo4j", action="store_true",
+                        help="confirm that every node in the NEO4J_URI database may be "
+                             "deleted, before each tier and after the run")
+    parser.add_argument("--out", default=None, help="results JSON (default runs/scale/<ts>.json)")
+    args = parser.parse_args(argv)
+    if args.neo4j and not args.clear_neo4j:
+        parser.error("--neo4j deletes every node in the NEO4J_URI database; "
+                     "pass --clear-neo4j to confirm")
+
+    results = run_scale_benchmark(
+        tiers=[int(t) for t in args.tiers.split(",") if t],
+        data_dir=args.data_dir,
+        seed=args.seed,
+        samples=args.samples,
+        neo4j=args.neo4j,
+        regenerate=args.regenerate,
+        avg_fields=args.avg_fields,
+        avg_degree=args.avg_degree,
+    )
+    out = args.out or os.path.join("runs", "scale", f"{datetime.utcnow():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Saved scale benchmark results to {out}")
+    print_report(results)
+
+
+if __name__ == "__main__":
+    main()
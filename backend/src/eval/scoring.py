@@ -0,0 +1,321 @@
+"""Graph-grounded answer scoring.
+
+Every table and field name in the schema is compiled into one word-boundary
+regex (a trie of alternatives, so it stays fast however many names there
+are). One scan of an answer finds the tables, fields, unknown table-like
+identifiers, relation words and sentence breaks. The mentions are then
+checked against the schema and against the subgraph that was retrieved for
+the question.
+
+    python -m src.eval.scoring runs/20251223_181846 runs/20251223_101934
+"""
+import argparse
+import csv
+import os
+import re
+import sys
+import threading
+import time
+
+from src.eval.evaluator import is_refusal, precision_recall
+from src.graph.schema_stream import iter_schema
+from src.rag.entity_extractor import ACRONYMS
+
+# Column types printed in schema context; upper-case but never table names
+DATA_TYPES = {
+    "CHAR", "NUMC", "CURR", "QUAN", "DATS", "TIMS", "DEC", "INT", "INT4", "UNIT",
+    "CUKY", "LANG", "CLNT", "STRING", "FLTP", "RAW",
+}
+RELATION_WORDS = (
+    r"join\w*|link\w*|referenc\w*|relat\w*|connect\w*|via|foreign keys?|points? to"
+)
+
+SCORE_FIELDS = [
+    "predicted_tables",
+    "table_precision",
+    "table_recall",
+    "predicted_answerable",
+    "grounded",
+    "ungrounded_tables",
+    "unsupported_relationships",
+    "unknown_identifiers",
+]
+
+
+def trie_pattern(words):
+    """Regex alternation of `words` factored into a prefix trie"""
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def emit(node):
+        branches = [re.escape(ch) + emit(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        ends = "" in node
+        if len(branches) == 1 and not ends:
+            return branches[0]
+        return "(?:" + "|".join(branches) + ")" + ("?" if ends else "")
+
+    return emit(trie)
+
+
+def _edge(a, b):
+    return (a, b) if a <= b else (b, a)
+
+
+def context_of(result):
+    """Tables and (unordered) edges a GraphRAG result retrieved, or None for other agents"""
+    if "graph_context" not in result:
+        return None
+    tables = set(result.get("entities", {}).get("tables", []))
+    edges = set()
+    for record in result.get("graph_context") or []:
+        a, b = record["t1"].get("name"), record["t2"].get("name")
+        tables.update((a, b))
+        edges.add(_edge(a, b))
+    for path in result.get("join_paths") or []:
+        prev = path["from"]
+        for step in path.get("path") or []:
+            tables.update((prev, step["to"]))
+            edges.add(_edge(prev, step["to"]))
+            prev = step["to"]
+    return {"tables": tables, "edges": edges}
+
+
+def format_context(context):
+    """context_tables / context_edges columns, so stored answers can be re-scored"""
+    if context is None:
+        return {"context_tables": "", "context_edges": ""}
+    return {
+        "context_tables": ",".join(sorted(context["tables"])),
+        "context_edges": ",".join(f"{a}-{b}" for a, b in sorted(context["edges"])),
+    }
+
+
+def parse_context(row):
+    if not row.get("context_tables") and not row.get("context_edges"):
+        return None
+    edges = set()
+    for item in filter(None, (row.get("context_edges") or "").split(",")):
+        a, _, b = item.partition("-")
+        edges.add(_edge(a, b))
+    return {"tables": set(filter(None, row["context_tables"].split(","))), "edges": edges}
+
+
+class AnswerScorer:
+    """Scores answers for table precision/recall and grounding in the schema graph.
+
+    A relationship is claimed when two tables are mentioned one after the
+    other in a sentence that also has a relation word ("joins", "via", ...)
+    or names a field both tables have. Claims are checked against the
+    schema's edges; mentioned tables and claimed edges are also checked
+    against the retrieved context when there is one.
+    """
+
+    def __init__(self, tables, fields=(), relationships=()):
+        self.tables = set(tables)
+        self.field_tables = {}
+        for field in fields:
+            self.field_tables.setdefault(field["name"], set()).add(field["table"])
+        self.edges = {_edge(rel["from"], rel["to"]) for rel in relationships}
+        names = sorted(self.tables | set(self.field_tables))
+        self.pattern = re.compile(
+            r"(?P<brk>[.!?](?=\s)|\n)"
+            rf"|(?<![\w/])(?P<name>{trie_pattern(names)})(?!\w)"
+            r"|(?<![\w/])(?P<ident>[A-Z][A-Z0-9_]{2,15})(?!\w)"
+            rf"|(?i:\b(?P<rel>{RELATION_WORDS})\b)"
+        )
+
+    @classmethod
+    def from_schema_file(cls, schema_file, extra_tables=()):
+        """Scorer over a schema JSON, for re-scoring stored runs offline.
+
+        `extra_tables` are scored as tables but have no edges. Relationships
+        to tables the schema does not declare are left out, as the loaders
+        leave them out of the graph.
+        """
+        declared, fields, relationships = [], [], []
+        for kind, item in iter_schema(schema_file):
+            if kind == "table":
+                declared.append(item["name"])
+                fields.extend({"name": f["name"], "table": item["name"]} for f in item["fields"])
+            else:
+                relationships.append(item)
+        names = set(declared)
+        relationships = [r for r in relationships if r["from"] in names and r["to"] in names]
+        return cls(declared + list(extra_tables), fields, relationships)
+
+    @classmethod
+    def from_backend(cls, backend, extra_tables=()):
+        """Scorer over the graph the agents retrieve from"""
+        tables = [t["name"] for t in backend.list_tables()]
+        relationships = [{"from": a, "to": b} for a, b in backend.relationship_pairs()]
+        return cls(tables + list(extra_tables), backend.list_fields(), relationships)
+
+    # -----------------------------
+    # Scanning
+    # -----------------------------
+    def scan(self, text):
+        """(tables in mention order, fields, unknown identifiers, claimed relationships)"""
+        tables, fields, unknown = [], [], []
+        claims = set()
+        sentence, related = [], False
+        sentence_fields = []
+
+        def close_sentence():
+            if len(sentence) > 1 and (related or self._shared_field(sentence, sentence_fields)):
+                for a, b in zip(sentence, sentence[1:]):
+                    if a != b:
+                        claims.add(_edge(a, b))
+
+        for match in self.pattern.finditer(text):
+            kind = match.lastgroup
+            if kind == "brk":
+                close_sentence()
+                sentence, related, sentence_fields = [], False, []
+            elif kind == "rel":
+                related = True
+            elif kind == "name":
+                name = match.group()
+                if name in self.tables:
+                    sentence.append(name)
+                    if name not in tables:
+                        tables.append(name)
+                else:
+                    sentence_fields.append(name)
+                    if name not in fields:
+                        fields.append(name)
+            else:
+                token = match.group()
+                if token not in ACRONYMS and token not in DATA_TYPES and token not in unknown:
+                    unknown.append(token)
+        close_sentence()
+        return tables, fields, unknown, sorted(claims)
+
+    def _shared_field(self, sentence, fields):
+        return any(
+            len(self.field_tables.get(field, set()) & set(sentence)) > 1 for field in fields
+        )
+
+    def tables_in(self, text):
+        return self.scan(text)[0]
+
+    def highlight(self, text, fmt=":green[{}]"):
+        """`text` with every table name wrapped in `fmt`, in one pass"""
+        def wrap(match):
+            if match.lastgroup == "name" and match.group() in self.tables:
+                return fmt.format(match.group())
+            return match.group()
+        return self.pattern.sub(wrap, text)
+
+    # -----------------------------
+    # Scoring
+    # -----------------------------
+    def score(self, answer, expected_tables=None, context=None):
+        """Scores of one answer; `context` is context_of(result) for the retrieved subgraph"""
+        tables, _, unknown, claims = self.scan(answer)
+        scores = {
+            "predicted_tables": tables,
+            "predicted_answerable": not is_refusal(answer),
+            "unknown_identifiers": unknown,
+            "unsupported_relationships": [f"{a}-{b}" for a, b in claims if (a, b) not in self.edges],
+            "ungrounded_tables": [],
+        }
+        if expected_tables is not None:
+            precision, recall = precision_recall(tables, expected_tables)
+            scores["table_precision"] = round(precision, 3)
+            scores["table_recall"] = round(recall, 3)
+        if context is not None:
+            scores["ungrounded_tables"] = [t for t in tables if t not in context["tables"]]
+            scores["unsupported_relationships"] += [
+                f"{a}-{b}" for a, b in claims
+                if (a, b) in self.edges and (a, b) not in context["edges"]
+            ]
+        scores["grounded"] = int(
+            not scores["ungrounded_tables"] and not scores["unsupported_relationships"]
+        )
+        return scores
+
+    def score_row(self, row):
+        """Re-score a stored results.tsv row; returns the SCORE_FIELDS columns"""
+        expected = list(filter(None, row.get("expected_tables", "").split(",")))
+        scores = self.score(row.get("answer") or "", expected, parse_context(row))
+        return {
+            key: ",".join(value) if isinstance(value, list) else value
+            for key, value in scores.items()
+        }
+
+
+_default_scorer = None
+_default_scorer_lock = threading.Lock()
+
+
+def dataset_tables():
+    """Tables the evaluation questions expect, whether or not the graph has them"""
+    from src.eval.dataset import BASE_QUERIES
+
+    return sorted({t for base in BASE_QUERIES for t in base["expected"]["tables"]})
+
+
+def get_scorer():
+    """Process-wide scorer over the configured graph backend (GRAPH_BACKEND)
+    plus the tables the evaluation dataset expects"""
+    from src.graph.backends import create_graph_backend
+
+    global _default_scorer
+    with _default_scorer_lock:
+        if _default_scorer is None:
+            backend = create_graph_backend()
+            try:
+                _default_scorer = AnswerScorer.from_backend(backend, dataset_tables())
+            finally:
+                backend.close()
+        return _default_scorer
+
+
+# ----- Bulk re-scoring of stored runs -----
+
+def rescore_run(run_dir, scorer):
+    """Re-score runs/<id>/results.tsv into rescored.tsv; returns (rows, seconds)"""
+    csv.field_size_limit(sys.maxsize)
+    with open(os.path.join(run_dir, "results.tsv"), newline="") as f:
+        rows = list(csv.DictReader(f, delimiter="\t"))
+
+    started = time.perf_counter()
+    rescored = [{**row, **scorer.score_row(row)} for row in rows]
+    elapsed = time.perf_counter() - started
+
+    if rescored:
+        fieldnames = list(rows[0].keys()) + [k for k in SCORE_FIELDS if k not in rows[0]]
+        with open(os.path.join(run_dir, "rescored.tsv"), "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames, delimiter="\t")
+            writer.writeheader()
+            writer.writerows(rescored)
+    return rescored, elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-score stored eval answers against the graph")
+    parser.add_argument("runs", nargs="+", help="run directories containing results.tsv")
+    parser.add_argument("--schema-file",
+                        default=os.getenv("EVAL_SCHEMA_FILE", "data/mock_sap_schema.json"))
+    args = parser.parse_args(argv)
+
+    scorer = AnswerScorer.from_schema_file(args.schema_file, dataset_tables())
+    total, seconds = 0, 0.0
+    for run_dir in args.runs:
+        rows, elapsed = rescore_run(run_dir, scorer)
+        total += len(rows)
+        seconds += elapsed
+        grounded = sum(int(r["grounded"]) for r in rows)
+        print(f"{run_dir}: {len(rows)} answers, {grounded} grounded -> rescored.tsv")
+    rate = total / seconds if seconds > 0 else 0.0
+    print(f"Scored {total} answers in {seconds:.3f}s ({rate:.0f} answers/s)")
+
+
+if __name__ == "__main__":
+    main()
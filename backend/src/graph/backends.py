@@ -0,0 +1,467 @@
+import json
+import logging
+import os
+import time
+
+import numpy as np
+
+from src.graph.embedded import SchemaGraph, snapshot_lock
+from src.graph.pool import get_pool
+from src.graph.schema_version import (
+    READ_SCHEMA_CHANGES,
+    READ_SCHEMA_VERSION,
+    changed_tables_between,
+    file_fingerprint,
+)
+from src.graph.traversal import TraversalMixin
+
+logger = logging.getLogger(__name__)
+
+TABLE_PROJECTION = "{.name, .description, .type, .documentation}"
+
+SUBGRAPH_QUERY = f"""
+    MATCH (t1:Table)-[r:RELATES_TO]->(t2:Table)
+    WHERE t1.name IN $table_names OR t2.name IN $table_names
+    RETURN t1 {TABLE_PROJECTION} AS t1,
+           r {{.via, .type, .description}} AS r,
+           t2 {TABLE_PROJECTION} AS t2
+"""
+
+# Directed retrieval plans: edges out of / into the given tables only
+SUBGRAPH_OUT_QUERY = f"""
+    MATCH (t1:Table)-[r:RELATES_TO]->(t2:Table)
+    WHERE t1.name IN $table_names
+    RETURN t1 {TABLE_PROJECTION} AS t1,
+           r {{.via, .type, .description}} AS r,
+           t2 {TABLE_PROJECTION} AS t2
+"""
+
+SUBGRAPH_IN_QUERY = f"""
+    MATCH (t1:Table)-[r:RELATES_TO]->(t2:Table)
+    WHERE t2.name IN $table_names
+    RETURN t1 {TABLE_PROJECTION} AS t1,
+           r {{.via, .type, .description}} AS r,
+           t2 {TABLE_PROJECTION} AS t2
+"""
+
+SUBGRAPH_QUERIES = {"both": SUBGRAPH_QUERY, "out": SUBGRAPH_OUT_QUERY, "in": SUBGRAPH_IN_QUERY}
+
+EDGE_RECORDS_QUERY = f"""
+    UNWIND $edges AS e
+    MATCH (t1:Table {{name: e[0]}})-[r:RELATES_TO {{via: e[2]}}]->(t2:Table {{name: e[1]}})
+    RETURN t1 {TABLE_PROJECTION} AS t1,
+           r {{.via, .type, .description}} AS r,
+           t2 {TABLE_PROJECTION} AS t2
+"""
+
+EXPAND_QUERY = """
+    UNWIND $names AS name
+    MATCH (t:Table {name: name})-[r:RELATES_TO]-(n:Table)
+    RETURN name, startNode(r).name AS from, endNode(r).name AS to, r.via AS via
+"""
+
+LIST_TABLES_QUERY = f"""
+    MATCH (t:Table)
+    RETURN t {TABLE_PROJECTION} AS t
+    ORDER BY t.name
+"""
+
+RELATIONSHIP_PAIRS_QUERY = """
+    MATCH (a:Table)-[:RELATES_TO]->(b:Table)
+    WHERE $names IS NULL OR a.name IN $names OR b.name IN $names
+    RETURN DISTINCT a.name AS from, b.name AS to
+"""
+
+LIST_FIELDS_QUERY = """
+    MATCH (t:Table)-[:HAS_FIELD]->(f:Field)
+    RETURN t.name AS table, f.name AS name, f.type AS type,
+           f.description AS description, f.is_key AS is_key
+"""
+
+# Field names that point at few tables, with those tables: key owners if any, else all
+IDENTIFYING_FIELDS_QUERY = """
+    MATCH (t:Table)-[:HAS_FIELD]->(f:Field)
+    WITH f.name AS name, collect(DISTINCT t.name) AS tables,
+         collect(DISTINCT CASE WHEN f.is_key THEN t.name END) AS keys
+    WITH name, CASE WHEN size(keys) > 0 THEN keys ELSE tables END AS owners
+    WHERE size(owners) <= $max_tables
+    RETURN name, owners
+"""
+
+TABLE_FIELDS_QUERY = """
+    UNWIND $names AS name
+    MATCH (t:Table {name: name})-[:HAS_FIELD]->(f:Field)
+    RETURN t.name AS table, f.name AS name, f.type AS type,
+           f.description AS description, f.is_key AS is_key
+"""
+
+TABLE_JOIN_FIELDS_QUERY = """
+    UNWIND $names AS name
+    MATCH (t:Table {name: name})-[:HAS_FIELD]->(f:Field)
+    WHERE f.is_key OR f.name IN $join_fields
+    RETURN t.name AS table, f.name AS name, f.type AS type,
+           f.description AS description, f.is_key AS is_key
+"""
+
+
+def _adjacency(rows):
+    adjacency = {}
+    for row in rows:
+        edge = (row["from"], row["to"], row["via"])
+        other = edge[1] if edge[0] == row["name"] else edge[0]
+        adjacency.setdefault(row["name"], []).append((edge, other))
+    return adjacency
+
+
+class Neo4jGraphBackend(TraversalMixin):
+    """Schema graph served from a Neo4j database.
+
+    Queries go through the process-wide pool for the server (see
+    src.graph.pool) as retried read transactions. Sync methods use the
+    blocking driver; their `a`-prefixed twins use the async driver so the
+    API's event loop is never blocked on Neo4j.
+    """
+
+    name = "neo4j"
+
+    # How long a read of the schema version is trusted before asking Neo4j again
+    version_ttl = 5.0
+
+    def __init__(self, uri, user, password):
+        self.pool = get_pool(uri, user, password)
+        self._version = None
+        self._version_read_at = 0.0
+
+    def close(self):
+        # The pool is shared with the rest of the process; close_pools() closes it
+        pass
+
+    async def aclose(self):
+        pass
+
+    def _query(self, query, **params):
+        return self.pool.read(query, **params)
+
+    async def _aquery(self, query, **params):
+        return await self.pool.aread(query, **params)
+
+    def _version_stale(self):
+        return time.monotonic() - self._version_read_at > self.version_ttl
+
+    def _set_version(self, rows):
+        self._version = rows[0]["epoch"] if rows else None
+        self._version_read_at = time.monotonic()
+        return self._version
+
+    def schema_version(self):
+        if self._version_stale():
+            self._set_version(self._query(READ_SCHEMA_VERSION))
+        return self._version
+
+    async def aschema_version(self):
+        if self._version_stale():
+            self._set_version(await self._aquery(READ_SCHEMA_VERSION))
+        return self._version
+
+    def changed_tables(self, since, until):
+        """Tables changed by syncs between two schema versions, or None if unknown"""
+        if not isinstance(since, int) or not isinstance(until, int):
+            return None
+        rows = self._query(READ_SCHEMA_CHANGES, since=since, until=until)
+        return changed_tables_between(rows, since, until)
+
+    async def achanged_tables(self, since, until):
+        if not isinstance(since, int) or not isinstance(until, int):
+            return None
+        rows = await self._aquery(READ_SCHEMA_CHANGES, since=since, until=until)
+        return changed_tables_between(rows, since, until)
+
+    def retrieve_subgraph(self, table_names, direction="both"):
+        """1-hop RELATES_TO edges touching any of the given tables.
+
+        direction="out" keeps edges from the tables, "in" edges into them.
+        """
+        return self._query(SUBGRAPH_QUERIES[direction], table_names=list(table_names))
+
+    async def aretrieve_subgraph(self, table_names, direction="both"):
+        return await self._aquery(SUBGRAPH_QUERIES[direction], table_names=list(table_names))
+
+    def list_tables(self):
+        return [row["t"] for row in self._query(LIST_TABLES_QUERY)]
+
+    async def alist_tables(self):
+        return [row["t"] for row in await self._aquery(LIST_TABLES_QUERY)]
+
+    def list_fields(self):
+        return self._query(LIST_FIELDS_QUERY)
+
+    def identifying_fields(self, max_tables):
+        """{field name: tables} for names owned by at most `max_tables` tables.
+
+        Owners are the tables keyed on the field, or every table with it when
+        none is. Aggregated in Neo4j, so only the qualifying names are sent.
+        """
+        rows = self._query(IDENTIFYING_FIELDS_QUERY, max_tables=max_tables)
+        return {row["name"]: row["owners"] for row in rows}
+
+    def relationship_pairs(self, table_names=None):
+        """(from, to) of every RELATES_TO edge, or of those touching `table_names`"""
+        names = None if table_names is None else list(table_names)
+        return [
+            (row["from"], row["to"])
+            for row in self._query(RELATIONSHIP_PAIRS_QUERY, names=names)
+        ]
+
+    def table_fields(self, table_names, join_fields=None):
+        """Field records of the given tables, in the list_fields shape.
+
+        With `join_fields`, only key fields and fields of those names are returned.
+        """
+        if not table_names:
+            return []
+        if join_fields is None:
+            return self._query(TABLE_FIELDS_QUERY, names=list(table_names))
+        return self._query(
+            TABLE_JOIN_FIELDS_QUERY, names=list(table_names), join_fields=sorted(join_fields)
+        )
+
+    async def atable_fields(self, table_names, join_fields=None):
+        if not table_names:
+            return []
+        if join_fields is None:
+            return await self._aquery(TABLE_FIELDS_QUERY, names=list(table_names))
+        return await self._aquery(
+            TABLE_JOIN_FIELDS_QUERY, names=list(table_names), join_fields=sorted(join_fields)
+        )
+
+    # Adjacency for TraversalMixin: nodes are table names, edges (from, to, via)
+    def resolve_tables(self, table_names):
+        return list(dict.fromkeys(table_names))
+
+    def expand(self, nodes):
+        return _adjacency(self._query(EXPAND_QUERY, names=list(nodes)))
+
+    async def aexpand(self, nodes):
+        return _adjacency(await self._aquery(EXPAND_QUERY, names=list(nodes)))
+
+    def edge_endpoints(self, edge):
+        return edge[0], edge[1]
+
+    def edge_via(self, edge):
+        return edge[2]
+
+    def node_name(self, node):
+        return node
+
+    def edge_records(self, edges):
+        if not edges:
+            return []
+        return self._query(EDGE_RECORDS_QUERY, edges=[list(edge) for edge in edges])
+
+    async def aedge_records(self, edges):
+        if not edges:
+            return []
+        return await self._aquery(EDGE_RECORDS_QUERY, edges=[list(edge) for edge in edges])
+
+
+def _distinct(values):
+    """Sorted distinct values of a 1-d array"""
+    values = np.sort(values)
+    return values[np.concatenate([[True], values[1:] != values[:-1]])] if len(values) else values
+
+
+class EmbeddedGraphBackend(TraversalMixin):
+    """Schema graph served in-process from a SchemaGraph.
+
+    Lookups are in-memory and short, so the async methods run them inline.
+    """
+
+    name = "embedded"
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def close(self):
+        pass
+
+    async def aclose(self):
+        pass
+
+    def schema_version(self):
+        return self.graph.schema_version
+
+    async def aschema_version(self):
+        return self.schema_version()
+
+    def changed_tables(self, since, until):
+        # A snapshot's version is a content hash with no change log: drop everything
+        return None
+
+    async def achanged_tables(self, since, until):
+        return None
+
+    async def aretrieve_subgraph(self, table_names, direction="both"):
+        return self.retrieve_subgraph(table_names, direction)
+
+    async def alist_tables(self):
+        return self.list_tables()
+
+    async def aexpand(self, nodes):
+        return self.expand(nodes)
+
+    async def aedge_records(self, edges):
+        return self.edge_records(edges)
+
+    async def atable_fields(self, table_names, join_fields=None):
+        return self.table_fields(table_names, join_fields)
+
+    def retrieve_subgraph(self, table_names, direction="both"):
+        """1-hop RELATES_TO edges touching any of the given tables ("out"/"in": one direction)"""
+        graph = self.graph
+        rel_ids = []
+        seen = set()
+        for name in table_names:
+            tid = graph.table_id(name)
+            if tid is None:
+                continue
+            rels = []
+            if direction in ("both", "out"):
+                rels += graph.out_rels(tid).tolist()
+            if direction in ("both", "in"):
+                rels += graph.in_rels(tid).tolist()
+            for rid in rels:
+                if rid not in seen:
+                    seen.add(rid)
+                    rel_ids.append(rid)
+        return [graph.record(rid) for rid in rel_ids]
+
+    def list_tables(self):
+        return sorted(self.graph.tables(), key=lambda t: t["name"])
+
+    def list_fields(self):
+        graph = self.graph
+        return [
+            {"table": graph.table_name(tid), **field}
+            for tid in range(graph.num_tables)
+            for field in graph.fields(tid)
+        ]
+
+    def identifying_fields(self, max_tables):
+        graph = self.graph
+        n = max(graph.num_tables, 1)
+        tables = np.repeat(np.arange(graph.num_tables, dtype=np.int64),
+                           np.diff(graph.field_offsets))
+        # (name, table) pairs as one int64 each, so deduplicating is a flat sort
+        pairs = graph.field_strings[:, 1].astype(np.int64) * n + tables
+        every = _distinct(pairs)
+        keyed = _distinct(pairs[np.asarray(graph.field_is_key)])
+        size = int(every[-1] // n) + 1 if len(every) else 1
+        key_count = np.bincount(keyed // n, minlength=size)
+        all_count = np.bincount(every // n, minlength=size)
+        owners = np.concatenate([
+            keyed[key_count[keyed // n] <= max_tables],
+            every[(key_count[every // n] == 0) & (all_count[every // n] <= max_tables)],
+        ])
+        names = {}
+        result = {}
+        for sid, tid in zip((owners // n).tolist(), (owners % n).tolist()):
+            if tid not in names:
+                names[tid] = graph.table_name(tid)
+            result.setdefault(graph.string(sid), []).append(names[tid])
+        return result
+
+    def relationship_pairs(self, table_names=None):
+        graph = self.graph
+        names = [graph.table_name(tid) for tid in range(graph.num_tables)]
+        pairs = {(names[a], names[b]) for a, b in graph.rel_strings[:, :2].tolist()}
+        if table_names is not None:
+            wanted = set(table_names)
+            pairs = {p for p in pairs if p[0] in wanted or p[1] in wanted}
+        return sorted(pairs)
+
+    def table_fields(self, table_names, join_fields=None):
+        graph = self.graph
+        return [
+            {"table": graph.table_name(tid), **field}
+            for tid in self.resolve_tables(table_names)
+            for field in graph.fields(tid)
+            if join_fields is None or field["is_key"] or field["name"] in join_fields
+        ]
+
+    # Adjacency for TraversalMixin: nodes are table ids, edges relationship ids
+    def resolve_tables(self, table_names):
+        ids = (self.graph.table_id(name) for name in table_names)
+        return list(dict.fromkeys(tid for tid in ids if tid is not None))
+
+    def expand(self, nodes):
+        graph = self.graph
+        adjacency = {}
+        for tid in nodes:
+            out_rels, in_rels = graph.out_rels(tid), graph.in_rels(tid)
+            adjacency[tid] = (
+                list(zip(out_rels.tolist(), graph.rel_strings[out_rels, 1].tolist()))
+                + list(zip(in_rels.tolist(), graph.rel_strings[in_rels, 0].tolist()))
+            )
+        return adjacency
+
+    def edge_endpoints(self, edge):
+        return self.graph.rel_endpoints(edge)
+
+    def edge_via(self, edge):
+        return self.graph.relationship(edge)["via"]
+
+    def node_name(self, node):
+        return self.graph.table_name(node)
+
+    def edge_records(self, edges):
+        return [self.graph.record(rid) for rid in edges]
+
+
+def snapshot_is_current(snapshot_path, schema_file):
+    """Whether the snapshot at `snapshot_path` was built from `schema_file` as it is now.
+
+    An unchanged size and mtime settle it without reading the file; otherwise
+    the file's content fingerprint is compared with the snapshot's version.
+    Snapshots exported from Neo4j are left alone.
+    """
+    try:
+        with open(os.path.join(snapshot_path, "meta.json")) as f:
+            meta = json.load(f)
+    except FileNotFoundError:
+        return False
+    if meta.get("source") == "neo4j" or not os.path.exists(schema_file):
+        return True
+    stat = os.stat(schema_file)
+    recorded = (meta.get("source"), meta.get("source_size"), meta.get("source_mtime"))
+    if recorded == (os.path.abspath(schema_file), stat.st_size, stat.st_mtime):
+        return True
+    return meta.get("schema_version") == file_fingerprint(schema_file)
+
+
+def load_schema_graph(snapshot_path=None, schema_file=None):
+    """Open a memory-mapped snapshot, (re)building it when missing or older than the schema file"""
+    snapshot_path = snapshot_path or os.getenv("GRAPH_SNAPSHOT", "data/schema_snapshot")
+    schema_file = schema_file or os.getenv("GRAPH_SCHEMA_FILE", "data/mock_sap_schema.json")
+
+    if not snapshot_is_current(snapshot_path, schema_file):
+        # Workers starting together build it once; the others wait and load it
+        with snapshot_lock(snapshot_path):
+            if not snapshot_is_current(snapshot_path, schema_file):
+                logger.info("building snapshot %s from %s", snapshot_path, schema_file)
+                SchemaGraph.from_schema_file(schema_file).save(snapshot_path)
+    return SchemaGraph.load(snapshot_path)
+
+
+def create_graph_backend(neo4j_uri=None, neo4j_user=None, neo4j_password=None, backend=None):
+    """Pick the graph backend from GRAPH_BACKEND (neo4j | embedded)"""
+    backend = backend or os.getenv("GRAPH_BACKEND", "neo4j")
+
+    if backend == "embedded":
+        return EmbeddedGraphBackend(load_schema_graph())
+    if backend == "neo4j":
+        return Neo4jGraphBackend(
+            neo4j_uri or os.getenv("NEO4J_URI", "bolt://localhost:7687"),
+            neo4j_user or os.getenv("NEO4J_USER", "neo4j"),
+            neo4j_password or os.getenv("NEO4J_PASSWORD", "password"),
+        )
+    raise ValueError(f"Unknown GRAPH_BACKEND: {backend}")
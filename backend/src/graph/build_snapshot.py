@@ -0,0 +1,35 @@
+import argparse
+import os
+
+from src.graph.embedded import SchemaGraph, snapshot_lock
+from src.graph.pool import close_pools, get_pool
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build a memory-mapped schema graph snapshot for GRAPH_BACKEND=embedded"
+    )
+    parser.add_argument("--schema-file", default="data/mock_sap_schema.json")
+    parser.add_argument("--from-neo4j", action="store_true",
+                        help="export the graph from Neo4j instead of reading the schema file")
+    parser.add_argument("--out", default=os.getenv("GRAPH_SNAPSHOT", "data/schema_snapshot"))
+    args = parser.parse_args()
+
+    if args.from_neo4j:
+        try:
+            graph = SchemaGraph.from_neo4j(get_pool().driver)
+        finally:
+            close_pools()
+    else:
+        graph = SchemaGraph.from_schema_file(args.schema_file)
+
+    with snapshot_lock(args.out):
+        graph.save(args.out)
+    print(
+        f"Saved snapshot to {args.out}: {graph.num_tables} tables, "
+        f"{graph.num_fields} fields, {graph.num_relationships} relationships"
+    )
+
+
+if __name__ == "__main__":
+    main()
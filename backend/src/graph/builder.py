@@ -1,69 +1,260 @@
-from neo4j import GraphDatabase
-import json
+import logging
+import time
+
+from src.graph.pool import get_pool
+from src.graph.schema_stream import iter_schema
+from src.graph.schema_version import (
+    bump_schema_version,
+    read_schema_version,
+    record_schema_change,
+)
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_CONSTRAINTS = [
+    "CREATE CONSTRAINT table_name IF NOT EXISTS FOR (t:Table) REQUIRE t.name IS UNIQUE",
+    "CREATE CONSTRAINT field_id IF NOT EXISTS FOR (f:Field) REQUIRE f.id IS UNIQUE",
+]
+
+MERGE_TABLES = """
+    UNWIND $rows AS row
+    MERGE (t:Table {name: row.name})
+    SET t.description = row.description,
+        t.type = row.type,
+        t.documentation = row.documentation
+"""
+
+MERGE_FIELDS = """
+    UNWIND $rows AS row
+    MATCH (t:Table {name: row.table})
+    MERGE (f:Field {id: row.id})
+    SET f.name = row.name,
+        f.table = row.table,
+        f.type = row.type,
+        f.is_key = row.is_key,
+        f.description = row.description
+    MERGE (t)-[:HAS_FIELD]->(f)
+"""
+
+# Both endpoints must already exist: a relationship to an undeclared table is
+# skipped (and counted) rather than creating a bare Table node
+MERGE_RELATIONSHIPS = """
+    UNWIND $rows AS row
+    MATCH (from:Table {name: row.from})
+    MATCH (to:Table {name: row.to})
+    MERGE (from)-[r:RELATES_TO {via: row.via}]->(to)
+    SET r.type = row.type,
+        r.description = row.description
+    RETURN count(r) AS written
+"""
+
+
+def write_batch(session, query, rows):
+    """Write one UNWIND batch in a managed transaction; returns the rows written.
+
+    Queries that RETURN `written` report it (rows they skipped are not
+    counted); others are taken to write every row.
+    """
+    def work(tx):
+        record = tx.run(query, rows=rows).single()
+        return len(rows) if record is None else record["written"]
+    return session.execute_write(work)
+
+
+def table_row(table):
+    return {
+        "name": table["name"],
+        "description": table.get("description"),
+        "type": table.get("type"),
+        "documentation": table.get("documentation"),
+    }
+
+
+def field_rows(table):
+    return [
+        {
+            "id": f"{table['name']}.{field['name']}",
+            "table": table["name"],
+            "name": field["name"],
+            "type": field.get("type"),
+            "is_key": field.get("key", False),
+            "description": field.get("description"),
+        }
+        for field in table.get("fields", [])
+    ]
+
+
+def relationship_row(rel):
+    return {
+        "from": rel["from"],
+        "to": rel["to"],
+        "via": rel["via"],
+        "type": rel.get("type"),
+        "description": rel.get("description"),
+    }
+
+
+class LoadStats:
+    """Row counters and throughput for a bulk load."""
+
+    def __init__(self, report_every=5.0):
+        self.counts = {"tables": 0, "fields": 0, "relationships": 0}
+        self.skipped = 0
+        self.batches = 0
+        self.started = time.perf_counter()
+        self.report_every = report_every
+        self._last_report = self.started
+
+    @property
+    def rows(self):
+        return sum(self.counts.values())
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def add(self, kind, n, skipped=0):
+        self.counts[kind] += n
+        self.skipped += skipped
+        self.batches += 1
+
+    def rate(self):
+        elapsed = self.elapsed
+        return self.rows / elapsed if elapsed > 0 else 0.0
+
+    def maybe_report(self):
+        now = time.perf_counter()
+        if now - self._last_report >= self.report_every:
+            self._last_report = now
+            self.report()
+
+    def report(self, prefix="load:"):
+        logger.info(
+            f"{prefix} tables={self.counts['tables']} "
+            f"fields={self.counts['fields']} "
+            f"relationships={self.counts['relationships']} "
+            f"batches={self.batches} "
+            f"{self.rate():.0f} rows/s"
+            + (f" skipped={self.skipped}" if self.skipped else "")
+        )
+
+    def as_dict(self):
+        return {
+            **self.counts,
+            "rows": self.rows,
+            "skipped_relationships": self.skipped,
+            "batches": self.batches,
+            "seconds": round(self.elapsed, 3),
+            "rows_per_sec": round(self.rate(), 1),
+        }
+
 
 class GraphBuilder:
     def __init__(self, uri, user, password):
-        self.driver = GraphDatabase.driver(uri, auth=(user, password))
-    
+        self.pool = get_pool(uri, user, password)
+
     def close(self):
-        self.driver.close()
-    
-    def create_schema_graph(self, schema_file):
-        with open(schema_file, 'r') as f:
-            schema = json.load(f)
-        
-        with self.driver.session() as session:
-            # Create table nodes
-            for table in schema['tables']:
-                session.run("""
-                    CREATE (t:Table {
-                        name: $name,
-                        description: $description,
-                        type: $type,
-                        documentation: $documentation
-                    })
-                """, 
-                name=table['name'],
-                description=table['description'],
-                type=table['type'],
-                documentation=table['documentation'])
-                
-                # Create field nodes
-                for field in table['fields']:
-                    session.run("""
-                        MATCH (t:Table {name: $table_name})
-                        CREATE (f:Field {
-                            name: $field_name,
-                            type: $field_type,
-                            is_key: $is_key,
-                            description: $description
-                        })
-                        CREATE (t)-[:HAS_FIELD]->(f)
-                    """,
-                    table_name=table['name'],
-                    field_name=field['name'],
-                    field_type=field['type'],
-                    is_key=field['key'],
-                    description=field['description'])
-            
-            # Create relationships
-            for rel in schema['relationships']:
-                session.run("""
-                    MATCH (from:Table {name: $from})
-                    MATCH (to:Table {name: $to})
-                    CREATE (from)-[:RELATES_TO {
-                        via: $via,
-                        type: $type,
-                        description: $description
-                    }]->(to)
-                """,
-                from_name=rel['from'],
-                to_name=rel['to'],
-                via=rel['via'],
-                type=rel['type'],
-                description=rel['description'])
+        # The pool is shared with the rest of the process; close_pools() closes it
+        pass
+
+    def create_constraints(self):
+        """Create uniqueness constraints (and their backing indexes) before loading"""
+        with self.pool.session(write=True) as session:
+            for statement in SCHEMA_CONSTRAINTS:
+                session.execute_write(lambda tx: tx.run(statement).consume())
+
+    def create_schema_graph(self, schema_file, batch_size=1000, verbose=True):
+        """Load a schema file into Neo4j. Safe to re-run: all writes are MERGEs."""
+        return self.bulk_load(schema_file, batch_size=batch_size, verbose=verbose)
+
+    def bulk_load(self, schema_file, batch_size=1000, verbose=True, report_every=5.0):
+        """Stream the schema file and write it in UNWIND-batched transactions.
+
+        Each transaction carries at most `batch_size` rows. Bumps the schema
+        version when done. Returns row counts, throughput and the new version.
+        """
+        self.create_constraints()
+        stats = LoadStats(report_every=report_every)
+
+        tables, fields, relationships = [], [], []
+
+        with self.pool.session(write=True) as session:
+            def flush(kind, query, rows):
+                for i in range(0, len(rows), batch_size):
+                    batch = rows[i:i + batch_size]
+                    written = write_batch(session, query, batch)
+                    stats.add(kind, written, skipped=len(batch) - written)
+                    if verbose:
+                        stats.maybe_report()
+                rows.clear()
+
+            def flush_tables():
+                # Fields MATCH their table, so the table batch must land first
+                flush("tables", MERGE_TABLES, tables)
+                flush("fields", MERGE_FIELDS, fields)
+
+            for kind, item in iter_schema(schema_file):
+                if kind == "table":
+                    tables.append(table_row(item))
+                    fields.extend(field_rows(item))
+                    if len(tables) >= batch_size or len(fields) >= batch_size:
+                        flush_tables()
+                else:
+                    relationships.append(relationship_row(item))
+                    if len(relationships) >= batch_size:
+                        # Relationships MATCH their endpoints: land pending tables first
+                        flush_tables()
+                        flush("relationships", MERGE_RELATIONSHIPS, relationships)
+
+            flush_tables()
+            flush("relationships", MERGE_RELATIONSHIPS, relationships)
+            schema_version = bump_schema_version(session)
+
+        if stats.skipped:
+            logger.warning("load skipped %d relationships to tables the schema does not declare",
+                           stats.skipped)
+        if verbose:
+            stats.report(prefix="load done:")
+        return {**stats.as_dict(), "schema_version": schema_version}
+
+    def sync(self, schema_file, previous=None, batch_size=1000, verbose=True):
+        """Apply only the differences between the graph and `schema_file`.
+
+        The graph side is read from Neo4j, or from `previous` (an older schema
+        file or snapshot directory) when given, which skips the read. Bumps the
+        schema version and records the changed tables only when something
+        changed. Returns the change-set summary and the resulting version.
+        """
+        from src.graph.schema_sync import ChangeSet, apply_changes, load_rows, neo4j_rows
+
+        started = time.perf_counter()
+        self.create_constraints()
+        new = load_rows(schema_file)
+
+        with self.pool.session(write=True) as session:
+            old = load_rows(previous) if previous else neo4j_rows(session)
+            changes = ChangeSet(old, new)
+            if changes:
+                written = apply_changes(session, changes, batch_size=batch_size)
+                schema_version = record_schema_change(session, changes.affected_tables())
+            else:
+                written = 0
+                schema_version = read_schema_version(session)
+
+        elapsed = time.perf_counter() - started
+        if verbose:
+            logger.info("sync: %s", changes.report())
+            logger.info("sync done: %d rows written in %.2fs, schema version %s",
+                        written, elapsed, schema_version)
+        return {
+            "changes": changes.summary(),
+            "tables": changes.affected_tables(),
+            "rows": written,
+            "seconds": round(elapsed, 3),
+            "schema_version": schema_version,
+        }
 
 # # Usage
 # builder = GraphBuilder("bolt://localhost:7687", "neo4j", "password")
-# builder.create_schema_graph("data/mock_sap_schema.json")
-# builder.close()
\ No newline at end of file
+# builder.create_schema_graph("data/mock_sap_schema.json", batch_size=5000)
+# builder.close()
@@ -0,0 +1,363 @@
+import bisect
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, single-worker use only
+    fcntl = None
+
+from src.graph.schema_stream import iter_schema
+from src.graph.schema_version import file_fingerprint, read_schema_version
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = 1
+
+TABLE_PROPS = ("name", "description", "type", "documentation")
+FIELD_PROPS = ("name", "type", "description")
+REL_PROPS = ("via", "type", "description")
+
+
+class _GraphAssembler:
+    """Interns schema items into integer ids and assembles the CSR arrays."""
+
+    def __init__(self):
+        self.strings = {}
+        self.table_ids = {}
+        self.tables = []          # [name, description, type, documentation] string ids
+        self.fields = []          # (table_id, name, type, description, is_key)
+        self.relationships = {}   # (from_id, to_id, via) -> [type, description]
+        self.declared = set()     # ids of tables added with add_table
+
+    def intern(self, s):
+        if s is None:
+            return -1
+        s = str(s)
+        sid = self.strings.get(s)
+        if sid is None:
+            sid = self.strings[s] = len(self.strings)
+        return sid
+
+    def table_id(self, name):
+        tid = self.table_ids.get(name)
+        if tid is None:
+            tid = self.table_ids[name] = len(self.tables)
+            self.tables.append([self.intern(name), -1, -1, -1])
+        return tid
+
+    def add_table(self, table):
+        tid = self.table_id(table["name"])
+        self.declared.add(tid)
+        row = self.tables[tid]
+        row[1] = self.intern(table.get("description"))
+        row[2] = self.intern(table.get("type"))
+        row[3] = self.intern(table.get("documentation"))
+        for field in table.get("fields", []):
+            self.add_field(table["name"], field)
+        return tid
+
+    def add_field(self, table_name, field):
+        self.fields.append((
+            self.table_id(table_name),
+            self.intern(field["name"]),
+            self.intern(field.get("type")),
+            self.intern(field.get("description")),
+            bool(field.get("key", False)),
+        ))
+
+    def add_relationship(self, rel):
+        key = (self.table_id(rel["from"]), self.table_id(rel["to"]), self.intern(rel["via"]))
+        self.relationships[key] = [self.intern(rel.get("type")), self.intern(rel.get("description"))]
+
+    def drop_undeclared(self):
+        """Drop tables only named by relationships, and those relationships, as the
+        Neo4j loader skips them; returns the number of relationships dropped"""
+        if len(self.declared) == len(self.tables):
+            return 0
+        keep = sorted(self.declared)
+        remap = {old: new for new, old in enumerate(keep)}
+        self.tables = [self.tables[tid] for tid in keep]
+        self.table_ids = {name: remap[tid] for name, tid in self.table_ids.items() if tid in remap}
+        self.fields = [(remap[f[0]],) + f[1:] for f in self.fields if f[0] in remap]
+        relationships = {
+            (remap[a], remap[b], via): value
+            for (a, b, via), value in self.relationships.items() if a in remap and b in remap
+        }
+        dropped = len(self.relationships) - len(relationships)
+        self.relationships = relationships
+        self.declared = set(range(len(keep)))
+        return dropped
+
+    def build(self):
+        n_tables = len(self.tables)
+        arrays = {}
+
+        encoded = [s.encode("utf-8") for s in self.strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        arrays["string_offsets"] = offsets
+        arrays["string_pool"] = np.frombuffer(b"".join(encoded), dtype=np.uint8).copy()
+
+        tables = np.array(self.tables, dtype=np.int32).reshape(n_tables, 4)
+        arrays["table_strings"] = tables
+        # Table ids ordered by name bytes, for binary-search lookup without a dict
+        arrays["table_name_order"] = np.array(
+            sorted(range(n_tables), key=lambda t: encoded[self.tables[t][0]]),
+            dtype=np.int32,
+        )
+
+        fields = np.array(
+            [f[:4] for f in self.fields], dtype=np.int32
+        ).reshape(len(self.fields), 4)
+        is_key = np.array([f[4] for f in self.fields], dtype=np.bool_)
+        order = np.argsort(fields[:, 0], kind="stable")
+        arrays["field_strings"] = fields[order]
+        arrays["field_is_key"] = is_key[order]
+        arrays["field_offsets"] = _csr_offsets(fields[:, 0], n_tables)
+
+        rels = np.array(
+            [list(k) + v for k, v in self.relationships.items()], dtype=np.int32
+        ).reshape(len(self.relationships), 5)
+        arrays["rel_strings"] = rels
+        arrays["out_offsets"] = _csr_offsets(rels[:, 0], n_tables)
+        arrays["out_edges"] = np.argsort(rels[:, 0], kind="stable").astype(np.int32)
+        arrays["in_offsets"] = _csr_offsets(rels[:, 1], n_tables)
+        arrays["in_edges"] = np.argsort(rels[:, 1], kind="stable").astype(np.int32)
+        return arrays
+
+
+@contextmanager
+def snapshot_lock(path):
+    """Exclusive lock, across processes, for (re)building the snapshot at `path`"""
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, ".lock"), "w") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _csr_offsets(ids, n):
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(ids, minlength=n), out=offsets[1:])
+    return offsets
+
+
+class SchemaGraph:
+    """In-process, read-only schema graph backed by flat numpy arrays.
+
+    Tables, fields and relationships are interned to integer ids. Fields are
+    grouped per table and RELATES_TO edges are indexed both ways in CSR form.
+    A saved snapshot is loaded memory-mapped, so worker processes share the
+    same pages and start without re-parsing the schema.
+    """
+
+    def __init__(self, arrays, meta=None):
+        self.arrays = arrays
+        self.meta = meta or {}
+        for name, array in arrays.items():
+            setattr(self, name, array)
+
+    # -----------------------------
+    # Construction
+    # -----------------------------
+    @classmethod
+    def from_schema_file(cls, schema_file):
+        assembler = _GraphAssembler()
+        for kind, item in iter_schema(schema_file):
+            if kind == "table":
+                assembler.add_table(item)
+            else:
+                assembler.add_relationship(item)
+        skipped = assembler.drop_undeclared()
+        if skipped:
+            logger.warning("skipped %d relationships to tables the schema does not declare",
+                           skipped)
+        stat = os.stat(schema_file)
+        return cls(assembler.build(), {
+            "source": os.path.abspath(schema_file),
+            "source_size": stat.st_size,
+            "source_mtime": stat.st_mtime,
+            "schema_version": file_fingerprint(schema_file),
+        })
+
+    @classmethod
+    def from_neo4j(cls, driver):
+        """Export the Table/Field/RELATES_TO graph from a Neo4j database"""
+        assembler = _GraphAssembler()
+        with driver.session() as session:
+            schema_version = read_schema_version(session)
+            for row in session.run("""
+                MATCH (t:Table)
+                RETURN t.name AS name, t.description AS description,
+                       t.type AS type, t.documentation AS documentation
+            """):
+                assembler.add_table(row.data())
+            for row in session.run("""
+                MATCH (t:Table)-[:HAS_FIELD]->(f:Field)
+                RETURN t.name AS table, f.name AS name, f.type AS type,
+                       f.is_key AS key, f.description AS description
+            """):
+                field = row.data()
+                assembler.add_field(field.pop("table"), field)
+            for row in session.run("""
+                MATCH (a:Table)-[r:RELATES_TO]->(b:Table)
+                RETURN a.name AS from, b.name AS to, r.via AS via,
+                       r.type AS type, r.description AS description
+            """):
+                assembler.add_relationship(row.data())
+        return cls(assembler.build(), {"source": "neo4j", "schema_version": schema_version})
+
+    # -----------------------------
+    # Snapshots
+    # -----------------------------
+    def save(self, path):
+        """Write the snapshot atomically.
+
+        Arrays go to new files named after this save, and meta.json, which
+        names them, is swapped in last. A reader sees one whole snapshot, old
+        or new; mapped readers keep their copy of the old files. Concurrent
+        writers should hold snapshot_lock(path).
+        """
+        os.makedirs(path, exist_ok=True)
+        generation = f"{time.time_ns():x}.{os.getpid()}"
+        files = {}
+        for name, array in self.arrays.items():
+            files[name] = f"{name}.{generation}.npy"
+            tmp = os.path.join(path, f"{name}.{generation}.tmp.npy")
+            np.save(tmp, np.ascontiguousarray(array))
+            os.replace(tmp, os.path.join(path, files[name]))
+        meta = {
+            **self.meta,
+            "format": SNAPSHOT_FORMAT,
+            "tables": self.num_tables,
+            "fields": self.num_fields,
+            "relationships": self.num_relationships,
+            "files": files,
+        }
+        tmp = os.path.join(path, f"meta.{generation}.tmp.json")
+        with open(tmp, "w") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp, os.path.join(path, "meta.json"))
+        # Arrays of earlier saves are no longer named by meta.json
+        for name in os.listdir(path):
+            if name.endswith(".npy") and name not in files.values() and ".tmp." not in name:
+                os.remove(os.path.join(path, name))
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        # A save that lands between reading meta.json and opening its files
+        # removes them; the meta.json read again then names the new ones
+        for attempt in range(3):
+            with open(os.path.join(path, "meta.json")) as f:
+                meta = json.load(f)
+            if meta.get("format") != SNAPSHOT_FORMAT:
+                raise ValueError(f"Unsupported snapshot format in {path}: {meta.get('format')}")
+            files = meta.get("files") or {
+                entry[:-4]: entry for entry in sorted(os.listdir(path))
+                if entry.endswith(".npy") and ".tmp." not in entry
+            }
+            try:
+                arrays = {
+                    name: np.load(os.path.join(path, filename), mmap_mode="r" if mmap else None)
+                    for name, filename in files.items()
+                }
+            except FileNotFoundError:
+                if attempt == 2:
+                    raise
+                continue
+            return cls(arrays, meta)
+
+    # -----------------------------
+    # Lookups
+    # -----------------------------
+    @property
+    def schema_version(self):
+        return self.meta.get("schema_version")
+
+    @property
+    def num_tables(self):
+        return len(self.table_strings)
+
+    @property
+    def num_fields(self):
+        return len(self.field_strings)
+
+    @property
+    def num_relationships(self):
+        return len(self.rel_strings)
+
+    def string(self, sid):
+        if sid < 0:
+            return None
+        start, end = self.string_offsets[sid], self.string_offsets[sid + 1]
+        return bytes(self.string_pool[start:end]).decode("utf-8")
+
+    def table_id(self, name):
+        """Return the id of a table by name, or None if it is not in the graph"""
+        target = name.encode("utf-8")
+        order = self.table_name_order
+        key = lambda t: bytes(self._name_bytes(t))
+        i = bisect.bisect_left(order, target, key=key)
+        if i < len(order) and key(order[i]) == target:
+            return int(order[i])
+        return None
+
+    def _name_bytes(self, tid):
+        sid = self.table_strings[tid, 0]
+        return self.string_pool[self.string_offsets[sid]:self.string_offsets[sid + 1]]
+
+    def table_name(self, tid):
+        return self.string(int(self.table_strings[tid, 0]))
+
+    def table(self, tid):
+        return {
+            prop: self.string(int(sid))
+            for prop, sid in zip(TABLE_PROPS, self.table_strings[tid])
+        }
+
+    def fields(self, tid):
+        start, end = self.field_offsets[tid], self.field_offsets[tid + 1]
+        result = []
+        for i in range(start, end):
+            field = {
+                prop: self.string(int(sid))
+                for prop, sid in zip(FIELD_PROPS, self.field_strings[i, 1:])
+            }
+            field["is_key"] = bool(self.field_is_key[i])
+            result.append(field)
+        return result
+
+    def relationship(self, rid):
+        row = self.rel_strings[rid]
+        return {
+            prop: self.string(int(sid))
+            for prop, sid in zip(REL_PROPS, row[2:])
+        }
+
+    def rel_endpoints(self, rid):
+        row = self.rel_strings[rid]
+        return int(row[0]), int(row[1])
+
+    def out_rels(self, tid):
+        return self.out_edges[self.out_offsets[tid]:self.out_offsets[tid + 1]]
+
+    def in_rels(self, tid):
+        return self.in_edges[self.in_offsets[tid]:self.in_offsets[tid + 1]]
+
+    def record(self, rid):
+        """Relationship as a {"t1", "r", "t2"} record, the shape Neo4j retrieval returns"""
+        src, dst = self.rel_endpoints(rid)
+        return {"t1": self.table(src), "r": self.relationship(rid), "t2": self.table(dst)}
+
+    def tables(self):
+        return [self.table(tid) for tid in range(self.num_tables)]
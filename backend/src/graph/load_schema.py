@@ -0,0 +1,62 @@
+import argparse
+import logging
+import os
+
+from src.graph.backends import Neo4jGraphBackend
+from src.graph.builder import GraphBuilder
+from src.graph.pool import close_pools
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk load an SAP schema JSON file into Neo4j")
+    parser.add_argument("schema_file", nargs="?", default="data/mock_sap_schema.json")
+    parser.add_argument("--batch-size", type=int, default=1000,
+                        help="rows per UNWIND transaction")
+    parser.add_argument("--quiet", action="store_true", help="disable progress reporting")
+    parser.add_argument("--sync", action="store_true",
+                        help="apply only the differences from the current graph")
+    parser.add_argument("--previous",
+                        help="with --sync, diff against this schema file or snapshot "
+                             "instead of reading the graph")
+    parser.add_argument("--vector-index", action="store_true",
+                        help="also build/refresh the description vector index (VECTOR_INDEX_PATH)")
+    args = parser.parse_args()
+    # Progress and summaries are logged; show them on stderr unless --quiet
+    logging.basicConfig(level=logging.WARNING if args.quiet else logging.INFO,
+                        format="%(message)s")
+
+    neo4j = (
+        os.getenv("NEO4J_URI", "bolt://localhost:7687"),
+        os.getenv("NEO4J_USER", "neo4j"),
+        os.getenv("NEO4J_PASSWORD", "password"),
+    )
+    try:
+        builder = GraphBuilder(*neo4j)
+        if args.sync:
+            builder.sync(
+                args.schema_file,
+                previous=args.previous,
+                batch_size=args.batch_size,
+                verbose=not args.quiet,
+            )
+        else:
+            builder.create_schema_graph(
+                args.schema_file,
+                batch_size=args.batch_size,
+                verbose=not args.quiet,
+            )
+
+        if args.vector_index:
+            from src.rag.vector_index import get_embedder, sync_index
+
+            sync_index(
+                Neo4jGraphBackend(*neo4j),
+                get_embedder(),
+                os.getenv("VECTOR_INDEX_PATH", "data/vector_index"),
+            )
+    finally:
+        close_pools()
+
+
+if __name__ == "__main__":
+    main()
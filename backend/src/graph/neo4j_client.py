@@ -1,26 +1,20 @@
 # backend/src/graph/neo4j_client.py
-import os
-from neo4j import GraphDatabase
+from src.graph.pool import get_pool
 
 class Neo4jClient:
     def __init__(self):
-        self.uri = os.getenv("NEO4J_URI")
-        self.user = os.getenv("NEO4J_USER")
-        self.password = os.getenv("NEO4J_PASSWORD")
-        self.driver = None
+        self.pool = None
 
     def connect(self):
-        if self.driver is None:
-            self.driver = GraphDatabase.driver(
-                self.uri,
-                auth=(self.user, self.password)
-            )
+        if self.pool is None:
+            self.pool = get_pool()
 
     def close(self):
-        if self.driver:
-            self.driver.close()
+        # The pool is shared with the rest of the process; close_pools() closes it
+        pass
 
-    def run(self, query, params=None):
+    def run(self, query, params=None, write=False):
         self.connect()
-        with self.driver.session() as session:
-            return session.run(query, params or {}).data()
+        if write:
+            return self.pool.write(query, **(params or {}))
+        return self.pool.read(query, **(params or {}))
@@ -0,0 +1,342 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from neo4j import READ_ACCESS, WRITE_ACCESS, AsyncGraphDatabase, GraphDatabase
+
+
+def driver_config():
+    """Driver settings shared by every pool, from the environment"""
+    return {
+        "max_connection_pool_size": int(os.getenv("NEO4J_POOL_SIZE", "50")),
+        "connection_acquisition_timeout": float(os.getenv("NEO4J_ACQUIRE_TIMEOUT", "30")),
+        "connection_timeout": float(os.getenv("NEO4J_CONNECTION_TIMEOUT", "15")),
+        "max_connection_lifetime": float(os.getenv("NEO4J_MAX_CONNECTION_LIFETIME", "3600")),
+        "max_transaction_retry_time": float(os.getenv("NEO4J_MAX_RETRY_TIME", "15")),
+        "keep_alive": True,
+    }
+
+
+def connection_settings(uri=None, user=None, password=None):
+    return (
+        uri or os.getenv("NEO4J_URI", "bolt://localhost:7687"),
+        user or os.getenv("NEO4J_USER", "neo4j"),
+        password or os.getenv("NEO4J_PASSWORD", "password"),
+    )
+
+
+class Neo4jPool:
+    """One sync driver (and one async driver per event loop) for a Neo4j server.
+
+    Reads and writes run as managed transactions, which the driver retries on
+    transient errors for up to NEO4J_MAX_RETRY_TIME seconds; reads are sent
+    with read access so a cluster routes them to followers. Before use after
+    NEO4J_LIVENESS_CHECK seconds idle, connectivity is verified and the driver
+    is replaced if the server went away. The old driver is closed once the
+    last session opened on it ends.
+    """
+
+    def __init__(self, uri, user, password, config=None, liveness_interval=None):
+        self.uri = uri
+        self.auth = (user, password)
+        self.config = config or driver_config()
+        if liveness_interval is None:
+            liveness_interval = float(os.getenv("NEO4J_LIVENESS_CHECK", "60"))
+        self.liveness_interval = liveness_interval
+        self._driver = None
+        self._async_drivers = {}
+        # Open sessions per driver, and replaced drivers waiting for theirs to end
+        self._users = {}
+        self._retired = set()
+        self._lock = threading.Lock()
+        self._last_used = time.monotonic()
+        self._stats = {
+            "sessions": 0, "in_use": 0, "peak_in_use": 0, "retries": 0,
+            "errors": 0, "liveness_checks": 0, "reconnects": 0,
+        }
+
+    # -----------------------------
+    # Drivers
+    # -----------------------------
+    @property
+    def driver(self):
+        with self._lock:
+            return self._current_driver()
+
+    @property
+    def async_driver(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            return self._current_async_driver(loop)
+
+    def _current_driver(self):
+        # Called with the lock held
+        if self._driver is None:
+            self._driver = GraphDatabase.driver(self.uri, auth=self.auth, **self.config)
+        return self._driver
+
+    def _current_async_driver(self, loop):
+        # Called with the lock held. The async driver binds to the loop it is first
+        # used on; drivers of loops that have since closed can never be used again
+        for closed in [other for other in self._async_drivers if other.is_closed()]:
+            self._retired.discard(self._async_drivers.pop(closed))
+        driver = self._async_drivers.get(loop)
+        if driver is None:
+            driver = AsyncGraphDatabase.driver(self.uri, auth=self.auth, **self.config)
+            self._async_drivers[loop] = driver
+        return driver
+
+    def _use(self, driver):
+        # Called with the lock held
+        self._users[driver] = self._users.get(driver, 0) + 1
+        return driver
+
+    def _unuse(self, driver):
+        """Release a session's hold on `driver`; True if it was replaced and can close now"""
+        with self._lock:
+            self._users[driver] -= 1
+            if self._users[driver]:
+                return False
+            del self._users[driver]
+            if driver in self._retired:
+                self._retired.discard(driver)
+                return True
+            return False
+
+    def _retire(self, driver):
+        """Called with the lock held once `driver` is replaced; True if it can close now"""
+        if self._users.get(driver):
+            self._retired.add(driver)
+            return False
+        return True
+
+    def _idle(self):
+        return (
+            self.liveness_interval > 0
+            and time.monotonic() - self._last_used > self.liveness_interval
+        )
+
+    def _check_liveness(self):
+        if not self._idle():
+            return
+        with self._lock:
+            self._stats["liveness_checks"] += 1
+        driver = self.driver
+        try:
+            driver.verify_connectivity()
+        except Exception:
+            with self._lock:
+                if self._driver is not driver:
+                    return  # another thread replaced it already
+                self._stats["reconnects"] += 1
+                # Sessions still open on the old driver finish on it; new ones get a new driver
+                self._driver = None
+                close_now = self._retire(driver)
+            if close_now:
+                driver.close()
+
+    async def _acheck_liveness(self):
+        if not self._idle():
+            return
+        with self._lock:
+            self._stats["liveness_checks"] += 1
+        loop = asyncio.get_running_loop()
+        driver = self.async_driver
+        try:
+            await driver.verify_connectivity()
+        except Exception:
+            with self._lock:
+                if self._async_drivers.get(loop) is not driver:
+                    return
+                self._stats["reconnects"] += 1
+                del self._async_drivers[loop]
+                close_now = self._retire(driver)
+            if close_now:
+                await driver.close()
+
+    # -----------------------------
+    # Sessions and transactions
+    # -----------------------------
+    def _acquired(self):
+        with self._lock:
+            self._stats["sessions"] += 1
+            self._stats["in_use"] += 1
+            self._stats["peak_in_use"] = max(self._stats["peak_in_use"], self._stats["in_use"])
+
+    def _released(self, failed):
+        with self._lock:
+            self._stats["in_use"] -= 1
+            if failed:
+                self._stats["errors"] += 1
+            else:
+                self._last_used = time.monotonic()
+
+    @contextmanager
+    def session(self, write=False):
+        self._check_liveness()
+        with self._lock:
+            driver = self._use(self._current_driver())
+        self._acquired()
+        failed = False
+        try:
+            with driver.session(
+                default_access_mode=WRITE_ACCESS if write else READ_ACCESS
+            ) as session:
+                yield session
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self._released(failed)
+            if self._unuse(driver):
+                driver.close()
+
+    @asynccontextmanager
+    async def asession(self, write=False):
+        await self._acheck_liveness()
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            driver = self._use(self._current_async_driver(loop))
+        self._acquired()
+        failed = False
+        try:
+            async with driver.session(
+                default_access_mode=WRITE_ACCESS if write else READ_ACCESS
+            ) as session:
+                yield session
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self._released(failed)
+            if self._unuse(driver):
+                await driver.close()
+
+    def _counted(self, work):
+        attempts = 0
+
+        def run(tx, *args):
+            nonlocal attempts
+            attempts += 1
+            if attempts > 1:
+                with self._lock:
+                    self._stats["retries"] += 1
+            return work(tx, *args)
+        return run
+
+    def _acounted(self, work):
+        attempts = 0
+
+        async def run(tx, *args):
+            nonlocal attempts
+            attempts += 1
+            if attempts > 1:
+                with self._lock:
+                    self._stats["retries"] += 1
+            return await work(tx, *args)
+        return run
+
+    def read(self, query, **params):
+        """Rows of a read query, as dicts"""
+        with self.session() as session:
+            return session.execute_read(
+                self._counted(lambda tx: tx.run(query, **params).data())
+            )
+
+    def write(self, query, **params):
+        with self.session(write=True) as session:
+            return session.execute_write(
+                self._counted(lambda tx: tx.run(query, **params).data())
+            )
+
+    async def aread(self, query, **params):
+        async def work(tx):
+            result = await tx.run(query, **params)
+            return await result.data()
+
+        async with self.asession() as session:
+            return await session.execute_read(self._acounted(work))
+
+    async def awrite(self, query, **params):
+        async def work(tx):
+            result = await tx.run(query, **params)
+            return await result.data()
+
+        async with self.asession(write=True) as session:
+            return await session.execute_write(self._acounted(work))
+
+    # -----------------------------
+    # Lifecycle
+    # -----------------------------
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["uri"] = self.uri
+        stats["max_pool_size"] = self.config["max_connection_pool_size"]
+        stats["utilization"] = round(stats["in_use"] / stats["max_pool_size"], 3)
+        stats["peak_utilization"] = round(stats["peak_in_use"] / stats["max_pool_size"], 3)
+        return stats
+
+    def close(self):
+        with self._lock:
+            driver, self._driver = self._driver, None
+            async_drivers, self._async_drivers = self._async_drivers, {}
+        if driver is not None:
+            driver.close()
+        for loop, adriver in async_drivers.items():
+            if not loop.is_closed() and not loop.is_running():
+                loop.run_until_complete(adriver.close())
+
+    async def aclose(self):
+        with self._lock:
+            driver, self._driver = self._driver, None
+            async_drivers, self._async_drivers = self._async_drivers, {}
+        current = asyncio.get_running_loop()
+        for loop, adriver in async_drivers.items():
+            if loop is current:
+                await adriver.close()
+        if driver is not None:
+            driver.close()
+
+
+# ----- Process-wide registry -----
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(uri=None, user=None, password=None):
+    """The shared pool for a server and credentials, created on first use"""
+    uri, user, password = connection_settings(uri, user, password)
+    # A changed password gets its own pool; only a hash of it is kept in the key
+    key = (uri, user, hashlib.sha256((password or "").encode("utf-8")).hexdigest())
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = Neo4jPool(uri, user, password)
+        return pool
+
+
+def pool_stats():
+    with _pools_lock:
+        pools = list(_pools.values())
+    return [pool.stats() for pool in pools]
+
+
+def close_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+async def aclose_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        await pool.aclose()
@@ -0,0 +1,334 @@
+"""Precomputed reachability over RELATES_TO, for impact questions.
+
+An edge A -> B means A references B (VBAK -> KNA1 via KUNNR). Tables
+*upstream* of X are the ones X references, directly or transitively; tables
+*downstream* of X reference it, so they are the ones impacted when X changes.
+
+The edges are held as numpy CSR arrays in both directions, so the index costs
+a few bytes per edge whatever the closure sizes are. A query is a BFS over
+those arrays that expands a whole frontier per numpy call, which yields hop
+distances and the closure together; results are memoised until the next
+change. Strongly connected components are numbered sinks first, which
+rules out most `reaches()` questions without any search.
+"""
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def _csr(keys, values, n):
+    """(offsets, values grouped by key) for keys in [0, n)"""
+    order = np.argsort(keys, kind="stable")
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=n), out=offsets[1:])
+    return offsets, values[order].astype(np.int32)
+
+
+def _neighbours(offsets, targets, frontier):
+    """Concatenated CSR rows of every node in `frontier`"""
+    starts = offsets[frontier]
+    counts = offsets[frontier + 1] - starts
+    total = int(counts.sum())
+    if not total:
+        return targets[:0]
+    shift = np.repeat(starts - np.cumsum(counts) + counts, counts)
+    return targets[np.arange(total) + shift]
+
+
+def _components(n, offsets, targets):
+    """Strongly connected components (iterative Tarjan), sinks first.
+
+    Returns comp: comp[node] is a component index, and a component can only
+    reach components with a smaller index.
+    """
+    offsets, targets = offsets.tolist(), targets.tolist()
+    index = [-1] * n
+    low = [0] * n
+    on_stack = [False] * n
+    stack = []
+    comp = [-1] * n
+    counter = components = 0
+
+    for root in range(n):
+        if index[root] != -1:
+            continue
+        work = [(root, offsets[root])]
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        while work:
+            node, i = work[-1]
+            end = offsets[node + 1]
+            while i < end:
+                other = targets[i]
+                i += 1
+                if index[other] == -1:
+                    work[-1] = (node, i)
+                    index[other] = low[other] = counter
+                    counter += 1
+                    stack.append(other)
+                    on_stack[other] = True
+                    work.append((other, offsets[other]))
+                    break
+                if on_stack[other] and index[other] < low[node]:
+                    low[node] = index[other]
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    if low[node] < low[parent]:
+                        low[parent] = low[node]
+                if low[node] == index[node]:
+                    while True:
+                        member = stack.pop()
+                        on_stack[member] = False
+                        comp[member] = components
+                        if member == node:
+                            break
+                    components += 1
+    return np.array(comp, dtype=np.int32), components
+
+
+class ReachabilityIndex:
+    """Transitive upstream/downstream sets of every table, over CSR edge arrays.
+
+    `update()` applies a schema change in place: only the edges touching the
+    changed tables are compared, then the arrays are re-sorted. No closures
+    are stored, so additions and removals cost the same.
+    """
+
+    def __init__(self, tables=(), edges=(), schema_version=None, cache_size=1024,
+                 cache_rows=2_000_000):
+        self.schema_version = schema_version
+        self.cache_size = cache_size
+        self.cache_rows = cache_rows
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._cached_rows = 0
+        self.stats = {"builds": 1, "incremental_updates": 0, "edges_added": 0}
+        self.names = []
+        self.ids = {}
+        for name in tables:
+            self._node(name)
+        pairs = [(self._node(a), self._node(b)) for a, b in edges]
+        self._build(np.array(pairs, dtype=np.int32).reshape(len(pairs), 2))
+
+    @classmethod
+    def from_backend(cls, backend):
+        from src.graph.embedded import SchemaGraph
+
+        graph = getattr(backend, "graph", None)
+        if isinstance(graph, SchemaGraph):
+            return cls.from_schema_graph(graph)
+        version = backend.schema_version()
+        tables = [t["name"] for t in backend.list_tables()]
+        return cls(tables, backend.relationship_pairs(), version)
+
+    @classmethod
+    def from_schema_graph(cls, graph):
+        """Index straight from a snapshot's arrays; table ids are the snapshot's"""
+        index = cls(schema_version=graph.schema_version)
+        index.names = [graph.table_name(tid) for tid in range(graph.num_tables)]
+        index.ids = {name: tid for tid, name in enumerate(index.names)}
+        index._build(np.asarray(graph.rel_strings[:, :2], dtype=np.int32))
+        return index
+
+    # -----------------------------
+    # Construction
+    # -----------------------------
+    def _build(self, edges):
+        n = len(self.names)
+        # One entry per (from, to), however many fields join the pair
+        edges = np.unique(edges, axis=0) if len(edges) else edges.reshape(0, 2)
+        self.edges = edges
+        src, dst = edges[:, 0], edges[:, 1]
+        self.out_offsets, self.out_targets = _csr(src, dst, n)
+        self.in_offsets, self.in_sources = _csr(dst, src, n)
+
+        self.comp, self.num_components = _components(n, self.out_offsets, self.out_targets)
+        sizes = np.bincount(self.comp, minlength=self.num_components)
+        loops = src[src == dst]
+        self.cyclic = sizes > 1
+        self.cyclic[self.comp[loops]] = True
+        self._cache.clear()
+        self._cached_rows = 0
+
+    def _node(self, name):
+        node = self.ids.get(name)
+        if node is None:
+            node = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return node
+
+    # -----------------------------
+    # Schema changes
+    # -----------------------------
+    def update(self, tables, edges, schema_version=None):
+        """Apply a change to `tables`: `edges` are all current (from, to) pairs touching them.
+
+        Returns "incremental", "rebuild" (an edge was removed) or "unchanged".
+        """
+        with self._lock:
+            self.schema_version = schema_version
+            changed = np.array(
+                [self.ids[t] for t in set(tables) if t in self.ids], dtype=np.int32
+            )
+            current = {(self._node(a), self._node(b)) for a, b in edges}
+            touching = np.isin(self.edges[:, 0], changed) | np.isin(self.edges[:, 1], changed)
+            old = set(map(tuple, self.edges[touching].tolist()))
+            removed = old - current
+            added = current - old
+            if not removed and not added and len(self.names) == len(self.comp):
+                return "unchanged"
+            keep = np.ones(len(self.edges), dtype=np.bool_)
+            if removed:
+                rows = np.flatnonzero(touching)
+                keep[rows] = [e not in removed for e in map(tuple, self.edges[rows].tolist())]
+            extra = np.array(sorted(added), dtype=np.int32).reshape(len(added), 2)
+            self._build(np.concatenate([self.edges[keep], extra]))
+            if removed:
+                self.stats["builds"] += 1
+                return "rebuild"
+            self.stats["incremental_updates"] += 1
+            self.stats["edges_added"] += len(added)
+            return "incremental"
+
+    # -----------------------------
+    # Queries
+    # -----------------------------
+    def __len__(self):
+        return len(self.names)
+
+    def _adjacency(self, direction):
+        if direction == "downstream":
+            return self.in_offsets, self.in_sources
+        if direction == "upstream":
+            return self.out_offsets, self.out_targets
+        raise ValueError(f"Unknown direction: {direction}")
+
+    def _search(self, node, direction, max_hops=None):
+        """(ids, hops) of every table reached from `node`, nearest first then by id"""
+        key = (node, direction, max_hops)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            return cached
+        offsets, targets = self._adjacency(direction)
+        hops = np.full(len(self.names), -1, dtype=np.int32)
+        hops[node] = 0
+        frontier = np.array([node], dtype=np.int32)
+        level = 0
+        while len(frontier) and (max_hops is None or level < max_hops):
+            level += 1
+            reached = _neighbours(offsets, targets, frontier)
+            frontier = np.unique(reached[hops[reached] < 0])
+            hops[frontier] = level
+        hops[node] = -1
+        ids = np.flatnonzero(hops > 0)
+        ids = ids[np.argsort(hops[ids], kind="stable")].astype(np.int32)
+        result = (ids, hops[ids])
+
+        self._cache[key] = result
+        self._cached_rows += len(ids)
+        while self._cache and (len(self._cache) > self.cache_size
+                               or self._cached_rows > self.cache_rows):
+            _, (evicted, _) = self._cache.popitem(last=False)
+            self._cached_rows -= len(evicted)
+        return result
+
+    def reaches(self, source, target):
+        """True if `source` references `target` through some RELATES_TO path"""
+        a, b = self.ids.get(source), self.ids.get(target)
+        if a is None or b is None:
+            return False
+        with self._lock:
+            if self.comp[a] == self.comp[b]:
+                return a != b or bool(self.cyclic[self.comp[a]])
+            # Components are numbered sinks first: a path only leads to lower numbers
+            if self.comp[b] > self.comp[a]:
+                return False
+            ids, _ = self._search(a, "upstream")
+            return bool(np.isin(b, ids))
+
+    def count(self, name, direction="downstream"):
+        node = self.ids.get(name)
+        if node is None:
+            return 0
+        with self._lock:
+            return len(self._search(node, direction)[0])
+
+    def distances(self, name, direction="downstream", max_hops=None):
+        """{table: hops} of every table upstream/downstream of `name`, nearest first"""
+        self._adjacency(direction)
+        node = self.ids.get(name)
+        if node is None:
+            return {}
+        with self._lock:
+            ids, hops = self._search(node, direction, max_hops)
+            names = self.names
+            return {names[i]: h for i, h in zip(ids.tolist(), hops.tolist())}
+
+    def downstream(self, name, max_hops=None):
+        """Tables impacted by a change to `name`: those referencing it, directly or not"""
+        return self.distances(name, "downstream", max_hops)
+
+    def upstream(self, name, max_hops=None):
+        """Tables `name` depends on"""
+        return self.distances(name, "upstream", max_hops)
+
+    def impact(self, table_names, max_hops=None, max_tables=50):
+        """Impact sets of the given tables, in the shape results and contexts carry"""
+        impact = []
+        for name in dict.fromkeys(table_names):
+            node = self.ids.get(name)
+            if node is None:
+                continue
+            with self._lock:
+                ids, hops = self._search(node, "downstream", max_hops)
+            impact.append({
+                "table": name,
+                "max_hops": max_hops,
+                "total": len(ids),
+                "impacted": [
+                    {"table": self.names[i], "hops": h}
+                    for i, h in zip(ids[:max_tables].tolist(), hops[:max_tables].tolist())
+                ],
+            })
+        return impact
+
+    def summary(self):
+        return {
+            "tables": len(self.names),
+            "edges": len(self.edges),
+            "components": self.num_components,
+            "schema_version": self.schema_version,
+            **self.stats,
+        }
+
+
+def sync_reachability(backend, current=None):
+    """Index matching the backend's schema version.
+
+    Reuses `current` when it is up to date. When the backend knows which
+    tables changed since `current` was built, only their edges are re-read
+    and applied; otherwise the index is rebuilt.
+    """
+    version = backend.schema_version()
+    if current is not None and current.schema_version == version:
+        return current
+    if current is not None:
+        changed = backend.changed_tables(current.schema_version, version)
+        if changed is not None:
+            mode = current.update(changed, backend.relationship_pairs(changed), version)
+            logger.info("reachability %s update for schema version %s: %d changed tables",
+                        mode, version, len(changed))
+            return current
+    index = ReachabilityIndex.from_backend(backend)
+    logger.info("reachability index built over %d tables, %d components",
+                len(index), index.num_components)
+    return index
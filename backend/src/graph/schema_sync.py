@@ -0,0 +1,215 @@
+"""Diff a schema against the current graph and apply only the changes.
+
+Tables, fields and relationships are compared as the rows GraphBuilder
+writes (table_row / field_rows / relationship_row), keyed by table name,
+field id and (from, to, via).
+"""
+import logging
+import os
+
+from src.graph.builder import (
+    MERGE_FIELDS,
+    MERGE_RELATIONSHIPS,
+    MERGE_TABLES,
+    field_rows,
+    relationship_row,
+    table_row,
+    write_batch,
+)
+from src.graph.schema_stream import iter_schema
+
+logger = logging.getLogger(__name__)
+
+KINDS = ("tables", "fields", "relationships")
+
+CURRENT_TABLES_QUERY = """
+    MATCH (t:Table)
+    RETURN t.name AS name, t.description AS description,
+           t.type AS type, t.documentation AS documentation
+"""
+
+CURRENT_FIELDS_QUERY = """
+    MATCH (t:Table)-[:HAS_FIELD]->(f:Field)
+    RETURN t.name + '.' + f.name AS id, t.name AS table, f.name AS name, f.type AS type,
+           coalesce(f.is_key, false) AS is_key, f.description AS description
+"""
+
+CURRENT_RELATIONSHIPS_QUERY = """
+    MATCH (a:Table)-[r:RELATES_TO]->(b:Table)
+    RETURN a.name AS from, b.name AS to, r.via AS via,
+           r.type AS type, r.description AS description
+"""
+
+DELETE_RELATIONSHIPS = """
+    UNWIND $rows AS row
+    MATCH (:Table {name: row.from})-[r:RELATES_TO {via: row.via}]->(:Table {name: row.to})
+    DELETE r
+"""
+
+DELETE_FIELDS = """
+    UNWIND $rows AS row
+    MATCH (f:Field {id: row.id})
+    DETACH DELETE f
+"""
+
+DELETE_TABLES = """
+    UNWIND $rows AS row
+    MATCH (t:Table {name: row.name})
+    OPTIONAL MATCH (t)-[:HAS_FIELD]->(f:Field)
+    DETACH DELETE f, t
+"""
+
+
+def _key(kind, row):
+    if kind == "tables":
+        return row["name"]
+    if kind == "fields":
+        return row["id"]
+    return row["from"], row["to"], row["via"]
+
+
+def _index(kind, rows):
+    return {_key(kind, row): row for row in rows}
+
+
+def _declared_relationships(tables, relationships):
+    # MERGE_RELATIONSHIPS skips edges to undeclared tables; leave them out of the diff too
+    kept = [rel for rel in relationships if rel["from"] in tables and rel["to"] in tables]
+    if len(kept) < len(relationships):
+        logger.warning("sync skipped %d relationships to tables the schema does not declare",
+                       len(relationships) - len(kept))
+    return kept
+
+
+def schema_file_rows(schema_file):
+    """{kind: {key: row}} for a schema JSON file"""
+    tables, fields, relationships = [], [], []
+    for kind, item in iter_schema(schema_file):
+        if kind == "table":
+            tables.append(table_row(item))
+            fields.extend(field_rows(item))
+        else:
+            relationships.append(relationship_row(item))
+    tables = _index("tables", tables)
+    return {
+        "tables": tables,
+        "fields": _index("fields", fields),
+        "relationships": _index("relationships", _declared_relationships(tables, relationships)),
+    }
+
+
+def schema_graph_rows(graph):
+    """{kind: {key: row}} for an embedded SchemaGraph snapshot"""
+    tables, fields, relationships = [], [], []
+    for tid in range(graph.num_tables):
+        table = graph.table(tid)
+        tables.append(table_row(table))
+        for field in graph.fields(tid):
+            fields.append({"id": f"{table['name']}.{field['name']}", "table": table["name"], **field})
+    for rid in range(graph.num_relationships):
+        src, dst = graph.rel_endpoints(rid)
+        relationships.append({
+            "from": graph.table_name(src), "to": graph.table_name(dst), **graph.relationship(rid)
+        })
+    return {
+        "tables": _index("tables", tables),
+        "fields": _index("fields", fields),
+        "relationships": _index("relationships", relationships),
+    }
+
+
+def neo4j_rows(session):
+    """{kind: {key: row}} for the graph currently in Neo4j"""
+    return {
+        "tables": _index("tables", session.run(CURRENT_TABLES_QUERY).data()),
+        "fields": _index("fields", session.run(CURRENT_FIELDS_QUERY).data()),
+        "relationships": _index("relationships", session.run(CURRENT_RELATIONSHIPS_QUERY).data()),
+    }
+
+
+def load_rows(source):
+    """Rows of a schema JSON file or a saved SchemaGraph snapshot directory"""
+    if os.path.isdir(source):
+        from src.graph.embedded import SchemaGraph
+
+        return schema_graph_rows(SchemaGraph.load(source))
+    return schema_file_rows(source)
+
+
+class ChangeSet:
+    """Added, removed and changed rows per kind between two schemas."""
+
+    def __init__(self, old, new):
+        self.changes = {}
+        for kind in KINDS:
+            before, after = old[kind], new[kind]
+            self.changes[kind] = {
+                "added": [row for key, row in after.items() if key not in before],
+                "removed": [row for key, row in before.items() if key not in after],
+                "changed": [
+                    row for key, row in after.items() if key in before and before[key] != row
+                ],
+            }
+
+    def __bool__(self):
+        return any(rows for kind in self.changes.values() for rows in kind.values())
+
+    def upserts(self, kind):
+        return self.changes[kind]["added"] + self.changes[kind]["changed"]
+
+    def removals(self, kind):
+        return self.changes[kind]["removed"]
+
+    def affected_tables(self):
+        """Names of every table whose node, fields or relationships changed"""
+        tables = set()
+        for kind, changes in self.changes.items():
+            for rows in changes.values():
+                for row in rows:
+                    if kind == "tables":
+                        tables.add(row["name"])
+                    elif kind == "fields":
+                        tables.add(row["table"])
+                    else:
+                        tables.update((row["from"], row["to"]))
+        return sorted(tables)
+
+    def summary(self):
+        return {
+            kind: {change: len(rows) for change, rows in changes.items()}
+            for kind, changes in self.changes.items()
+        }
+
+    def report(self, limit=20):
+        """Readable change-set report, listing at most `limit` keys per change"""
+        lines = []
+        for kind, changes in self.changes.items():
+            for change, rows in changes.items():
+                if not rows:
+                    continue
+                keys = [_key(kind, row) for row in rows]
+                keys = [".".join(k) if isinstance(k, tuple) else k for k in keys]
+                more = f" (+{len(keys) - limit} more)" if len(keys) > limit else ""
+                lines.append(f"{kind} {change}: {len(rows)}: {', '.join(keys[:limit])}{more}")
+        return "\n".join(lines) or "no changes"
+
+
+def apply_changes(session, changes, batch_size=1000):
+    """Write a ChangeSet in UNWIND-batched transactions; returns the number of rows written.
+
+    Removals run first (relationships, then fields, then tables), then
+    upserts in the order bulk_load uses (tables, fields, relationships).
+    """
+    steps = [
+        (DELETE_RELATIONSHIPS, changes.removals("relationships")),
+        (DELETE_FIELDS, changes.removals("fields")),
+        (DELETE_TABLES, changes.removals("tables")),
+        (MERGE_TABLES, changes.upserts("tables")),
+        (MERGE_FIELDS, changes.upserts("fields")),
+        (MERGE_RELATIONSHIPS, changes.upserts("relationships")),
+    ]
+    written = 0
+    for query, rows in steps:
+        for i in range(0, len(rows), batch_size):
+            written += write_batch(session, query, rows[i:i + batch_size])
+    return written
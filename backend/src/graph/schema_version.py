@@ -0,0 +1,70 @@
+import hashlib
+
+
+# A single (:SchemaVersion) node holds the graph's epoch. Writers bump it so
+# caches keyed on the schema can tell when their entries went stale.
+BUMP_SCHEMA_VERSION = """
+    MERGE (v:SchemaVersion {id: 'schema'})
+    SET v.epoch = coalesce(v.epoch, 0) + 1,
+        v.updated_at = datetime()
+    RETURN v.epoch AS epoch
+"""
+
+READ_SCHEMA_VERSION = """
+    OPTIONAL MATCH (v:SchemaVersion {id: 'schema'})
+    RETURN v.epoch AS epoch
+"""
+
+
+# Incremental syncs also record which tables an epoch touched, so caches can
+# drop only the entries that mention them. Full loads record nothing.
+RECORD_SCHEMA_CHANGE = """
+    CREATE (:SchemaChange {epoch: $epoch, tables: $tables, at: datetime()})
+    WITH 1 AS done
+    MATCH (c:SchemaChange) WHERE c.epoch <= $epoch - $keep
+    DETACH DELETE c
+"""
+
+READ_SCHEMA_CHANGES = """
+    MATCH (c:SchemaChange) WHERE c.epoch > $since AND c.epoch <= $until
+    RETURN c.epoch AS epoch, c.tables AS tables
+"""
+
+
+def bump_schema_version(session):
+    return session.execute_write(lambda tx: tx.run(BUMP_SCHEMA_VERSION).single()["epoch"])
+
+
+def read_schema_version(session):
+    return session.execute_read(lambda tx: tx.run(READ_SCHEMA_VERSION).single()["epoch"])
+
+
+def record_schema_change(session, tables, keep=100):
+    """Bump the version and store the tables changed in it, in one transaction.
+
+    Keeps the last `keep` records; returns the new epoch.
+    """
+    def work(tx):
+        epoch = tx.run(BUMP_SCHEMA_VERSION).single()["epoch"]
+        tx.run(RECORD_SCHEMA_CHANGE, epoch=epoch, tables=list(tables), keep=keep).consume()
+        return epoch
+    return session.execute_write(work)
+
+
+def changed_tables_between(rows, since, until):
+    """Union of tables changed in epochs (since, until], or None if any epoch is unrecorded"""
+    if since is None or until is None or until < since:
+        return None
+    by_epoch = {row["epoch"]: row["tables"] for row in rows}
+    if any(epoch not in by_epoch for epoch in range(since + 1, until + 1)):
+        return None
+    return {table for tables in by_epoch.values() for table in tables}
+
+
+def file_fingerprint(path, chunk_size=1 << 20):
+    """Content hash of a schema file, used as the version of graphs built from it"""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
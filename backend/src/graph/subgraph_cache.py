@@ -0,0 +1,109 @@
+import json
+import threading
+from collections import OrderedDict
+
+
+def subgraph_key(table_names, hops, direction="both"):
+    return tuple(sorted(set(table_names))), hops, direction
+
+
+def _record_tables(key, records):
+    tables = set(key[0])
+    for record in records:
+        for side in ('t1', 't2'):
+            if record.get(side):
+                tables.add(record[side].get('name'))
+    return tables
+
+
+def _approx_bytes(records):
+    return len(json.dumps(records, default=str))
+
+
+class SubgraphCache:
+    """LRU of retrieved subgraphs, keyed on (sorted tables, hops, direction).
+
+    Entries belong to one schema version (the epoch GraphBuilder bumps on
+    every load). The first lookup under a newer version drops them all,
+    unless advance() was told which tables changed, in which case only the
+    entries mentioning those tables are dropped.
+    """
+
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        self.version = None
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0,
+                       "partial_invalidations": 0, "invalidated_entries": 0}
+
+    def _check_version(self, version):
+        if version != self.version:
+            if self._data:
+                self._stats["invalidations"] += 1
+            self._data.clear()
+            self._bytes = 0
+            self.version = version
+
+    def advance(self, version, changed_tables=None):
+        """Move to `version`, dropping entries that mention any of `changed_tables`.
+
+        With changed_tables=None every entry is dropped.
+        """
+        with self._lock:
+            if version == self.version:
+                return
+            if changed_tables is None or self.version is None:
+                self._check_version(version)
+                return
+            changed = set(changed_tables)
+            stale = [key for key, item in self._data.items() if item[2] & changed]
+            for key in stale:
+                self._bytes -= self._data.pop(key)[1]
+            self._stats["partial_invalidations"] += 1
+            self._stats["invalidated_entries"] += len(stale)
+            self.version = version
+
+    def get(self, key, version):
+        with self._lock:
+            self._check_version(version)
+            item = self._data.get(key)
+            if item is None:
+                self._stats["misses"] += 1
+                return None
+            self._data.move_to_end(key)
+            self._stats["hits"] += 1
+            return item[0]
+
+    def set(self, key, records, version):
+        size = _approx_bytes(records)
+        with self._lock:
+            self._check_version(version)
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._data[key] = (records, size, _record_tables(key, records))
+            self._bytes += size
+            while len(self._data) > self.maxsize:
+                _, (_, evicted, _) = self._data.popitem(last=False)
+                self._bytes -= evicted
+                self._stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._data)
+            stats["approx_bytes"] = self._bytes
+            stats["schema_version"] = self.version
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        return stats
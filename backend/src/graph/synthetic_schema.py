@@ -0,0 +1,294 @@
+"""Seeded generator of large SAP-like schemas, for scale testing.
+
+The schema starts from a handful of real hub tables (T001, KNA1, LFA1, MARA,
+...), then adds synthetic tables module by module (SD, MM, FI, ...). Each new
+table references some earlier tables through their key field, the way VBAK
+carries KUNNR to KNA1. References are picked by preferential attachment,
+which seeds the hubs with a large weight and mostly stays inside the table's
+own module. This yields a few very highly referenced master tables, a long
+tail of lightly referenced ones and module clusters.
+
+Tables are written to disk as they are generated, in the format of
+data/mock_sap_schema.json, so memory does not grow with the field count:
+
+    python -m src.graph.synthetic_schema --tables 100000 --out data/synthetic_100k.json
+"""
+import argparse
+import json
+import math
+import os
+import random
+import tempfile
+import time
+
+MODULES = {
+    "SD": ("Sales Document", "Delivery", "Billing Document", "Pricing Condition",
+           "Customer Partner", "Shipment"),
+    "MM": ("Purchase Order", "Material Valuation", "Goods Movement", "Vendor Evaluation",
+           "Inventory Document", "Storage Location"),
+    "FI": ("Accounting Document", "G/L Account", "Payment Run", "Tax Code",
+           "Bank Statement", "Asset"),
+    "CO": ("Cost Center", "Internal Order", "Profit Center", "Activity Type",
+           "Settlement Rule", "Cost Element"),
+    "PP": ("Production Order", "Bill of Material", "Routing", "Work Center",
+           "Planned Order", "Capacity"),
+    "HR": ("Personnel Action", "Payroll Result", "Time Event", "Organizational Unit",
+           "Position", "Benefit Plan"),
+    "QM": ("Inspection Lot", "Quality Notification", "Inspection Characteristic", "Sample",
+           "Usage Decision", "Certificate"),
+    "PM": ("Maintenance Order", "Equipment", "Functional Location", "Maintenance Plan",
+           "Measurement Point", "Notification"),
+    "WM": ("Transfer Order", "Storage Bin", "Warehouse Stock", "Quant", "Handling Unit",
+           "Putaway Strategy"),
+    "PS": ("Project Definition", "WBS Element", "Network", "Milestone", "Project Budget",
+           "Activity"),
+}
+SUFFIXES = ("Header Data", "Item Data", "Status", "Texts", "History", "Assignment",
+            "Schedule Lines", "Change Log")
+
+# (name, module, description, type, fields, references); the first field is the key
+HUB_TABLES = [
+    ("T001", "FI", "Company Codes", "master",
+     [("BUKRS", "CHAR(4)", "Company Code"), ("BUTXT", "CHAR(25)", "Name of Company Code"),
+      ("WAERS", "CUKY(5)", "Currency Key")], []),
+    ("KNA1", "SD", "Customer Master (General Data)", "master",
+     [("KUNNR", "CHAR(10)", "Customer Number"), ("NAME1", "CHAR(35)", "Name 1"),
+      ("LAND1", "CHAR(3)", "Country Key")], []),
+    ("LFA1", "MM", "Vendor Master (General Section)", "master",
+     [("LIFNR", "CHAR(10)", "Account Number of Vendor"), ("NAME1", "CHAR(35)", "Name 1"),
+      ("LAND1", "CHAR(3)", "Country Key")], []),
+    ("MARA", "MM", "General Material Data", "master",
+     [("MATNR", "CHAR(18)", "Material Number"), ("MTART", "CHAR(4)", "Material Type"),
+      ("MEINS", "UNIT(3)", "Base Unit of Measure")], []),
+    ("BKPF", "FI", "Accounting Document Header", "transactional",
+     [("BELNR", "CHAR(10)", "Accounting Document Number"), ("BUKRS", "CHAR(4)", "Company Code"),
+      ("GJAHR", "NUMC(4)", "Fiscal Year")], ["T001"]),
+    ("VBAK", "SD", "Sales Document: Header Data", "transactional",
+     [("VBELN", "CHAR(10)", "Sales Document"), ("KUNNR", "CHAR(10)", "Sold-to party"),
+      ("VKORG", "CHAR(4)", "Sales Organization"), ("NETWR", "CURR(15,2)", "Net Value")],
+     ["KNA1"]),
+    ("EKKO", "MM", "Purchasing Document Header", "transactional",
+     [("EBELN", "CHAR(10)", "Purchasing Document Number"), ("LIFNR", "CHAR(10)", "Vendor"),
+      ("BUKRS", "CHAR(4)", "Company Code")], ["LFA1", "T001"]),
+    ("CSKS", "CO", "Cost Center Master Data", "master",
+     [("KOSTL", "CHAR(10)", "Cost Center"), ("BUKRS", "CHAR(4)", "Company Code")], ["T001"]),
+    ("PA0001", "HR", "HR Master Record: Organizational Assignment", "master",
+     [("PERNR", "NUMC(8)", "Personnel Number"), ("BUKRS", "CHAR(4)", "Company Code"),
+      ("KOSTL", "CHAR(10)", "Cost Center")], ["T001", "CSKS"]),
+]
+
+COMMON_FIELDS = [
+    ("MANDT", "CLNT(3)", "Client"), ("ERDAT", "DATS(8)", "Created On"),
+    ("ERNAM", "CHAR(12)", "Created By"), ("AEDAT", "DATS(8)", "Changed On"),
+    ("WAERS", "CUKY(5)", "Currency Key"), ("MENGE", "QUAN(13,3)", "Quantity"),
+    ("MEINS", "UNIT(3)", "Base Unit of Measure"), ("NETWR", "CURR(15,2)", "Net Value"),
+    ("WERKS", "CHAR(4)", "Plant"), ("LGORT", "CHAR(4)", "Storage Location"),
+    ("SPRAS", "LANG(1)", "Language Key"), ("STATU", "CHAR(1)", "Status"),
+    ("LOEKZ", "CHAR(1)", "Deletion Indicator"), ("BUDAT", "DATS(8)", "Posting Date"),
+    ("POSNR", "NUMC(6)", "Item Number"), ("TEXT1", "CHAR(40)", "Text"),
+    ("PRCTR", "CHAR(10)", "Profit Center"), ("VKORG", "CHAR(4)", "Sales Organization"),
+]
+CUSTOM_TYPES = ("CHAR(10)", "CHAR(40)", "NUMC(6)", "DATS(8)", "DEC(15,2)", "INT4(10)")
+
+
+def _field(name, ftype, description, key=False):
+    return {"name": name, "type": ftype, "key": key, "description": description}
+
+
+class SchemaGenerator:
+    """Generates one schema; see generate_schema() for the parameters"""
+
+    def __init__(self, num_tables, avg_fields=20, avg_degree=3.0, intra_module=0.8,
+                 hub_weight=200, max_degree=25, max_fields=400, seed=0):
+        self.num_tables = num_tables
+        self.avg_fields = avg_fields
+        self.avg_degree = avg_degree
+        self.intra_module = intra_module
+        self.hub_weight = hub_weight
+        self.max_degree = max_degree
+        self.max_fields = max_fields
+        self.rng = random.Random(seed)
+        # Lognormal field counts with mean avg_fields
+        self._sigma = 0.6
+        self._mu = math.log(max(avg_fields, 1)) - self._sigma ** 2 / 2
+        self.keys = {}      # table -> key field
+        self.fields = {}    # key field -> (type, description)
+        self.modules = {}   # table -> module
+        # Preferential attachment: a table appears once per unit of weight
+        self.pool = []
+        self.module_pools = {module: [] for module in MODULES}
+
+    def _attach(self, name, module, weight):
+        self.modules[name] = module
+        self.pool.extend([name] * weight)
+        self.module_pools[module].extend([name] * weight)
+
+    def _targets(self, module, count):
+        targets = []
+        for _ in range(count * 3):
+            if len(targets) == count:
+                break
+            pool = self.module_pools[module]
+            if not pool or self.rng.random() >= self.intra_module:
+                pool = self.pool
+            target = self.rng.choice(pool)
+            if target not in targets:
+                targets.append(target)
+        return targets
+
+    def _relationship(self, source, target):
+        return {
+            "from": source,
+            "to": target,
+            "via": self.keys[target],
+            "type": "explicit",
+            "description": f"{source} references {target}",
+        }
+
+    def hubs(self):
+        """Yield (table, relationships) for the real hub tables"""
+        for name, module, description, ttype, fields, references in HUB_TABLES:
+            self.keys[name] = fields[0][0]
+            self.fields[fields[0][0]] = fields[0][1:]
+            table = {
+                "name": name,
+                "description": description,
+                "type": ttype,
+                "fields": [_field(*f, key=(i == 0)) for i, f in enumerate(fields)],
+                "documentation": f"{MODULES[module][0]} hub table of the {module} module",
+            }
+            self._attach(name, module, self.hub_weight)
+            yield table, [self._relationship(name, target) for target in references]
+
+    def table(self, index):
+        """(table, relationships) for the index-th synthetic table"""
+        rng = self.rng
+        module = rng.choice(list(MODULES))
+        name = f"Z{module}{index:06d}"
+        key = f"{module}K{index:06d}"
+        noun = rng.choice(MODULES[module])
+        description = f"{noun}: {rng.choice(SUFFIXES)}"
+
+        degree = min(int(round(rng.expovariate(1 / self.avg_degree))), self.max_degree) \
+            if self.avg_degree > 0 else 0
+        targets = self._targets(module, degree)
+
+        fields = [_field(key, "CHAR(10)", f"{noun} Number", key=True)]
+        seen = {key}
+        for target in targets:
+            via = self.keys[target]
+            if via not in seen:
+                seen.add(via)
+                fields.append(_field(via, *self.fields[via]))
+        count = min(max(int(rng.lognormvariate(self._mu, self._sigma)), 2), self.max_fields)
+        for fname, ftype, fdesc in rng.sample(COMMON_FIELDS, min(count // 2, len(COMMON_FIELDS))):
+            if len(fields) >= count:
+                break
+            if fname not in seen:
+                seen.add(fname)
+                fields.append(_field(fname, ftype, fdesc))
+        custom = 1
+        while len(fields) < count:
+            fields.append(_field(f"ZZ{custom:04d}", rng.choice(CUSTOM_TYPES),
+                                 f"Custom field {custom}"))
+            custom += 1
+
+        self.keys[name] = key
+        self.fields[key] = ("CHAR(10)", f"{noun} Number")
+        self._attach(name, module, 1)
+        # Referenced tables become more likely to be referenced again
+        for target in targets:
+            self.pool.append(target)
+            self.module_pools[self.modules[target]].append(target)
+        table = {
+            "name": name,
+            "description": description,
+            "type": "master" if rng.random() < 0.3 else "transactional",
+            "fields": fields,
+            "documentation": f"{description} in {module} ({MODULES[module][0]} area)",
+        }
+        return table, [self._relationship(name, target) for target in targets]
+
+    def items(self):
+        """(table, relationships) for every table, hubs first"""
+        yield from self.hubs()
+        for index in range(max(self.num_tables - len(HUB_TABLES), 0)):
+            yield self.table(index)
+
+
+def generate_schema(out, num_tables, avg_fields=20, avg_degree=3.0, intra_module=0.8,
+                    hub_weight=200, max_degree=25, max_fields=400, seed=0, verbose=False):
+    """Write a schema of `num_tables` tables to `out`, streaming; returns counts and timings.
+
+    avg_fields: mean fields per table (lognormal, capped at max_fields).
+    avg_degree: mean tables each new table references (capped at max_degree).
+    intra_module: share of references kept inside the table's own module.
+    hub_weight: initial attachment weight of each hub, against 1 for other tables.
+    The same arguments and seed always produce the same file.
+    """
+    started = time.perf_counter()
+    generator = SchemaGenerator(num_tables, avg_fields, avg_degree, intra_module, hub_weight,
+                                max_degree, max_fields, seed)
+    counts = {"tables": 0, "fields": 0, "relationships": 0}
+    if os.path.dirname(out):
+        os.makedirs(os.path.dirname(out), exist_ok=True)
+
+    # Relationships follow all the tables in the file, so they are spooled meanwhile
+    with open(out, "w") as f, tempfile.TemporaryFile("w+") as spool:
+        f.write('{\n  "tables": [\n')
+        for table, relationships in generator.items():
+            if counts["tables"]:
+                f.write(",\n")
+            f.write("    " + json.dumps(table))
+            counts["tables"] += 1
+            counts["fields"] += len(table["fields"])
+            for rel in relationships:
+                spool.write((",\n" if counts["relationships"] else "") + "    " + json.dumps(rel))
+                counts["relationships"] += 1
+            if verbose and counts["tables"] % 10000 == 0:
+                print(f"[generate] {counts['tables']}/{num_tables} tables, "
+                      f"{counts['fields']} fields, {counts['relationships']} relationships")
+        f.write('\n  ],\n  "relationships": [\n')
+        spool.seek(0)
+        while True:
+            chunk = spool.read(1 << 20)
+            if not chunk:
+                break
+            f.write(chunk)
+        f.write('\n  ]\n}\n')
+
+    return {
+        **counts,
+        "bytes": os.path.getsize(out),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic SAP-like schema file")
+    parser.add_argument("--tables", type=int, default=10000)
+    parser.add_argument("--avg-fields", type=float, default=20)
+    parser.add_argument("--avg-degree", type=float, default=3.0,
+                        help="mean number of tables each table references")
+    parser.add_argument("--intra-module", type=float, default=0.8,
+                        help="share of references inside the table's module")
+    parser.add_argument("--hub-weight", type=int, default=200,
+                        help="initial attachment weight of hub tables (KNA1, MARA, ...)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None,
+                        help="output JSON (default data/synthetic_<tables>.json)")
+    args = parser.parse_args(argv)
+
+    out = args.out or os.path.join("data", f"synthetic_{args.tables}.json")
+    stats = generate_schema(
+        out, args.tables, avg_fields=args.avg_fields, avg_degree=args.avg_degree,
+        intra_module=args.intra_module, hub_weight=args.hub_weight, seed=args.seed,
+        verbose=True,
+    )
+    print(f"Wrote {out}: {stats['tables']} tables, {stats['fields']} fields, "
+          f"{stats['relationships']} relationships, {stats['bytes'] / 2**20:.1f} MB "
+          f"in {stats['seconds']} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""Bounded traversals over RELATES_TO shared by the graph backends.
+
+Backends expose a level-wise adjacency:
+
+    expand(nodes)        -> {node: [(edge, other_node), ...]}  (both directions)
+    aexpand(nodes)       -> same, awaitable
+    edge_endpoints(edge) -> (from_node, to_node)
+    edge_via(edge)       -> join key of the edge
+    node_name(node)      -> table name
+
+so each BFS level costs one adjacency lookup (one CSR slice per node in
+memory, one indexed UNWIND query in Neo4j) instead of a variable-length
+pattern match.
+
+The algorithms are generators that yield the frontier they need expanded and
+receive its adjacency back, so the same code runs on the sync and the async
+adjacency. `batched_steps` runs several of them in lockstep, so the join-path
+searches of every table pair share one adjacency lookup per level.
+"""
+import heapq
+from itertools import combinations
+
+
+def run_steps(steps, expand):
+    """Drive a traversal generator with a synchronous expand()"""
+    try:
+        frontier = next(steps)
+        while True:
+            frontier = steps.send(expand(frontier))
+    except StopIteration as done:
+        return done.value
+
+
+async def arun_steps(steps, aexpand):
+    """Drive a traversal generator with an awaitable expand()"""
+    try:
+        frontier = next(steps)
+        while True:
+            frontier = steps.send(await aexpand(frontier))
+    except StopIteration as done:
+        return done.value
+
+
+def batched_steps(traversals):
+    """Run traversal generators together; returns their results in order.
+
+    Each round yields the union of their frontiers once, and nodes expanded
+    in an earlier round are not asked for again.
+    """
+    results = [None] * len(traversals)
+    pending = {}
+    for i, steps in enumerate(traversals):
+        try:
+            pending[i] = next(steps)
+        except StopIteration as done:
+            results[i] = done.value
+
+    adjacency = {}
+    while pending:
+        missing = list(dict.fromkeys(
+            node for frontier in pending.values() for node in frontier if node not in adjacency
+        ))
+        if missing:
+            fetched = yield missing
+            for node in missing:
+                adjacency[node] = fetched.get(node, [])
+        for i in list(pending):
+            try:
+                pending[i] = traversals[i].send(adjacency)
+            except StopIteration as done:
+                results[i] = done.value
+                del pending[i]
+    return results
+
+
+def expand_neighbourhood_steps(seeds, max_hops=2, max_nodes=50, hub_degree=200):
+    """Breadth-first expansion from `seeds`, bounded by hops and node count.
+
+    Neighbours linked to more of the current frontier are kept first. Nodes
+    with more than `hub_degree` edges are kept but not expanded through
+    (seeds are always expanded), so hubs like KNA1 do not flood the result.
+    Returns (nodes, edges) with nodes in discovery order.
+    """
+    visited = dict.fromkeys(seeds)
+    frontier = list(visited)
+    edges = set()
+
+    for hop in range(max_hops):
+        if not frontier or len(visited) >= max_nodes:
+            break
+        adjacency = yield frontier
+
+        links = {}
+        for node in frontier:
+            neighbours = adjacency.get(node, [])
+            if hop > 0 and len(neighbours) > hub_degree:
+                continue
+            for edge, other in neighbours:
+                if other in visited:
+                    edges.add(edge)
+                else:
+                    links.setdefault(other, []).append(edge)
+
+        frontier = []
+        budget = max_nodes - len(visited)
+        for other in heapq.nlargest(budget, links, key=lambda n: len(links[n])):
+            visited[other] = None
+            frontier.append(other)
+            edges.update(links[other])
+
+    return list(visited), edges
+
+
+def shortest_join_path_steps(source, target, max_hops=4):
+    """Bidirectional BFS for the shortest undirected RELATES_TO path.
+
+    Returns a list of (from_node, edge, to_node) steps in source→target
+    order, [] if source == target, or None if there is no path within
+    `max_hops`.
+    """
+    if source == target:
+        return []
+
+    # node -> (previous node, edge, depth), one tree grown from each end
+    parents = ({source: (None, None, 0)}, {target: (None, None, 0)})
+    frontiers = ([source], [target])
+    hops = 0
+
+    while frontiers[0] and frontiers[1] and hops < max_hops:
+        side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+        own, other_side = parents[side], parents[1 - side]
+        adjacency = yield frontiers[side]
+
+        next_frontier = []
+        best = None
+        for node in frontiers[side]:
+            depth = own[node][2]
+            for edge, other in adjacency.get(node, []):
+                if other in own:
+                    continue
+                own[other] = (node, edge, depth + 1)
+                next_frontier.append(other)
+                if other in other_side:
+                    length = depth + 1 + other_side[other][2]
+                    if best is None or length < best[0]:
+                        best = (length, other)
+
+        hops += 1
+        if best is not None:
+            return _join_path(best[1], parents[0], parents[1])
+        frontiers = (next_frontier, frontiers[1]) if side == 0 else (frontiers[0], next_frontier)
+
+    return None
+
+
+def expand_neighbourhood(adj, seeds, max_hops=2, max_nodes=50, hub_degree=200):
+    return run_steps(expand_neighbourhood_steps(seeds, max_hops, max_nodes, hub_degree), adj.expand)
+
+
+def shortest_join_path(adj, source, target, max_hops=4):
+    return run_steps(shortest_join_path_steps(source, target, max_hops), adj.expand)
+
+
+def _join_path(meet, from_source, from_target):
+    steps = []
+    node = meet
+    while from_source[node][0] is not None:
+        prev, edge, _ = from_source[node]
+        steps.append((prev, edge, node))
+        node = prev
+    steps.reverse()
+
+    node = meet
+    while from_target[node][0] is not None:
+        nxt, edge, _ = from_target[node]
+        steps.append((node, edge, nxt))
+        node = nxt
+    return steps
+
+
+def describe_path(adj, steps):
+    """Path steps as {"from", "to", "via", "direction"} dicts of table names"""
+    described = []
+    for a, edge, b in steps:
+        src, _ = adj.edge_endpoints(edge)
+        described.append({
+            "from": adj.node_name(a),
+            "to": adj.node_name(b),
+            "via": adj.edge_via(edge),
+            "direction": "->" if src == a else "<-",
+        })
+    return described
+
+
+class TraversalMixin:
+    """k-hop retrieval and join-path search on top of a backend's adjacency"""
+
+    def retrieve_khop(self, table_names, max_hops=2, max_nodes=50, hub_degree=200):
+        """RELATES_TO records within `max_hops` of the given tables, capped at `max_nodes` tables"""
+        steps = expand_neighbourhood_steps(
+            self.resolve_tables(table_names), max_hops, max_nodes, hub_degree
+        )
+        _, edges = run_steps(steps, self.expand)
+        return self.edge_records(sorted(edges))
+
+    async def aretrieve_khop(self, table_names, max_hops=2, max_nodes=50, hub_degree=200):
+        steps = expand_neighbourhood_steps(
+            self.resolve_tables(table_names), max_hops, max_nodes, hub_degree
+        )
+        _, edges = await arun_steps(steps, self.aexpand)
+        return await self.aedge_records(sorted(edges))
+
+    def find_join_paths(self, table_names, max_hops=4, max_tables=6):
+        """Shortest join path between every pair of the given tables.
+
+        Returns (paths, records): one {"from", "to", "hops", "path"} dict per
+        pair (hops/path are None when no path exists within `max_hops`), and
+        the RELATES_TO records of every edge used by a path. All pairs are
+        searched together: one adjacency lookup per level, not per pair.
+        """
+        pairs = self._join_pairs(table_names, max_tables)
+        found = run_steps(self._join_path_steps(pairs, max_hops), self.expand)
+        paths, edges = self._describe_join_paths(pairs, found)
+        return paths, self.edge_records(edges)
+
+    async def afind_join_paths(self, table_names, max_hops=4, max_tables=6):
+        pairs = self._join_pairs(table_names, max_tables)
+        found = await arun_steps(self._join_path_steps(pairs, max_hops), self.aexpand)
+        paths, edges = self._describe_join_paths(pairs, found)
+        return paths, await self.aedge_records(edges)
+
+    def _join_pairs(self, table_names, max_tables):
+        return list(combinations(self.resolve_tables(table_names)[:max_tables], 2))
+
+    @staticmethod
+    def _join_path_steps(pairs, max_hops):
+        return batched_steps([shortest_join_path_steps(a, b, max_hops) for a, b in pairs])
+
+    def _describe_join_paths(self, pairs, found):
+        paths = []
+        edges = set()
+        for (a, b), steps in zip(pairs, found):
+            if steps is not None:
+                edges.update(edge for _, edge, _ in steps)
+            paths.append({
+                "from": self.node_name(a),
+                "to": self.node_name(b),
+                "hops": None if steps is None else len(steps),
+                "path": None if steps is None else describe_path(self, steps),
+            })
+        return paths, sorted(edges)
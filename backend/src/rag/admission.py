@@ -0,0 +1,228 @@
+"""Admission control for the async pipeline.
+
+Each stage (LLM calls, graph lookups) runs at most a fixed number of requests
+at once. Requests beyond that wait in a bounded queue, interactive before
+batch and oldest first, until their deadline. A full queue or a missed
+deadline raises Overloaded at once, which the API answers with 429/503 and a
+Retry-After hint, instead of letting work pile up until everything times out.
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import math
+import os
+import statistics
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+
+# Lower rank is served first
+PRIORITIES = {"interactive": 0, "batch": 1}
+
+_priority = contextvars.ContextVar("admission_priority", default="interactive")
+_deadline = contextvars.ContextVar("admission_deadline", default=None)
+
+
+class Overloaded(Exception):
+    """A stage could not take the request on in time.
+
+    status is 429 when the queue was full on arrival and 503 when the request
+    waited past its deadline or was shed for an interactive one.
+    """
+
+    def __init__(self, stage, reason, status, retry_after):
+        super().__init__(f"{stage} stage overloaded: {reason}")
+        self.stage = stage
+        self.reason = reason
+        self.status = status
+        self.retry_after = retry_after
+
+
+@contextmanager
+def request_class(priority="interactive", timeout=None):
+    """Queue the stages run inside the block with `priority`.
+
+    With `timeout`, the block's waits in all stage queues together end at
+    most `timeout` seconds from now. Tasks started inside inherit both.
+    """
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown priority {priority!r}; expected one of {sorted(PRIORITIES)}")
+    deadline = time.monotonic() + timeout if timeout else None
+    tokens = (_priority.set(priority), _deadline.set(deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(tokens[1])
+        _priority.reset(tokens[0])
+
+
+class StageLimiter:
+    """At most `limit` concurrent holders (0 = unlimited), `queue_size` waiters, `timeout` s waits"""
+
+    def __init__(self, stage, limit, queue_size, timeout, tracer=None):
+        self.stage = stage
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.tracer = tracer
+        self.active = 0
+        self._waiters = []  # heap of (rank, arrival, future)
+        self._arrivals = itertools.count()
+        self._wait_ms = deque(maxlen=1000)
+        self._hold_s = deque(maxlen=1000)
+        self._stats = {"admitted": 0, "queued": 0, "rejected": 0, "timed_out": 0, "shed": 0}
+
+    def _count(self, outcome, priority):
+        self._stats[outcome] += 1
+        if self.tracer is not None:
+            self.tracer.admissions.inc(stage=self.stage, priority=priority, outcome=outcome)
+
+    def _admitted(self, priority, waited):
+        self._count("admitted", priority)
+        self._wait_ms.append(waited * 1000)
+        if self.tracer is not None:
+            self.tracer.admission_wait.observe(waited, stage=self.stage, priority=priority)
+
+    def retry_after(self):
+        """Whole seconds until the queue is likely to have drained, at least 1"""
+        hold = statistics.median(self._hold_s) if self._hold_s else 1.0
+        batches = (len(self._waiters) + 1) / max(self.limit, 1)
+        return max(1, math.ceil(hold * batches))
+
+    def _reject(self, priority, reason, status, outcome):
+        self._count(outcome, priority)
+        return Overloaded(self.stage, reason, status, self.retry_after())
+
+    def _shed_for(self, rank):
+        """Make room for a waiter of `rank` by failing the newest lower-priority waiter"""
+        if not self._waiters:
+            return False
+        victim = max(self._waiters)
+        if victim[0] <= rank:
+            return False
+        self._waiters.remove(victim)
+        heapq.heapify(self._waiters)
+        priority = next(p for p, r in PRIORITIES.items() if r == victim[0])
+        victim[2].set_exception(
+            self._reject(priority, "shed for interactive requests", 503, "shed")
+        )
+        return True
+
+    def _discard(self, entry):
+        if entry in self._waiters:
+            self._waiters.remove(entry)
+            heapq.heapify(self._waiters)
+
+    def try_acquire(self):
+        """Take a slot only if one is free now, without queueing; True if taken"""
+        if self.limit > 0 and (self.active >= self.limit or self._waiters):
+            return False
+        self.active += 1
+        self._admitted(_priority.get(), 0.0)
+        return True
+
+    async def acquire(self):
+        """Take a slot, queueing if none is free; returns the seconds spent waiting"""
+        priority = _priority.get()
+        if self.limit <= 0 or (self.active < self.limit and not self._waiters):
+            self.active += 1
+            self._admitted(priority, 0.0)
+            return 0.0
+
+        rank = PRIORITIES[priority]
+        if len(self._waiters) >= self.queue_size and not self._shed_for(rank):
+            raise self._reject(priority, "queue full", 429, "rejected")
+        timeout = self.timeout
+        deadline = _deadline.get()
+        if deadline is not None:
+            timeout = min(timeout, deadline - time.monotonic())
+        if timeout <= 0:
+            raise self._reject(priority, "request deadline passed", 503, "timed_out")
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (rank, next(self._arrivals), future)
+        heapq.heappush(self._waiters, entry)
+        self._count("queued", priority)
+        t0 = time.perf_counter()
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self._discard(entry)
+            raise self._reject(priority, "queue wait deadline passed", 503, "timed_out") from None
+        except asyncio.CancelledError:
+            self._discard(entry)
+            # Handed a slot just as the caller went away: pass it on
+            if future.done() and not future.cancelled() and future.exception() is None:
+                self.release()
+            raise
+        waited = time.perf_counter() - t0
+        self._admitted(priority, waited)
+        return waited
+
+    def release(self):
+        """Hand the slot to the next waiter, or free it"""
+        while self._waiters:
+            future = heapq.heappop(self._waiters)[2]
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._hold_s.append(time.perf_counter() - t0)
+            self.release()
+
+    def stats(self):
+        waits = sorted(self._wait_ms)
+        by_priority = {name: 0 for name in PRIORITIES}
+        for rank, _, _ in self._waiters:
+            by_priority[next(p for p, r in PRIORITIES.items() if r == rank)] += 1
+        return {
+            "limit": self.limit,
+            "queue_size": self.queue_size,
+            "active": self.active,
+            "waiting": len(self._waiters),
+            "waiting_by_priority": by_priority,
+            **self._stats,
+            "wait_ms": {
+                "p50": round(waits[len(waits) // 2], 2) if waits else 0.0,
+                "p95": round(waits[int(len(waits) * 0.95)], 2) if waits else 0.0,
+                "max": round(waits[-1], 2) if waits else 0.0,
+            },
+        }
+
+
+class Admission:
+    """Stage limiters for the LLM and graph stages of GraphRAGProcessor.
+
+    LLM_CONCURRENCY (default 16) and GRAPH_CONCURRENCY (default 32) bound each
+    stage, 0 disabling the limit; ADMISSION_QUEUE_SIZE (default 64) waiters
+    per stage wait at most ADMISSION_TIMEOUT_S (default 10) seconds.
+    """
+
+    def __init__(self, llm_limit=None, graph_limit=None, queue_size=None, timeout=None,
+                 tracer=None):
+        llm_limit = int(os.getenv("LLM_CONCURRENCY", "16")) if llm_limit is None else llm_limit
+        graph_limit = int(os.getenv("GRAPH_CONCURRENCY", "32")) if graph_limit is None \
+            else graph_limit
+        self.queue_size = int(os.getenv("ADMISSION_QUEUE_SIZE", "64")) if queue_size is None \
+            else queue_size
+        self.timeout = float(os.getenv("ADMISSION_TIMEOUT_S", "10")) if timeout is None \
+            else timeout
+        self.stages = {
+            "llm": StageLimiter("llm", llm_limit, self.queue_size, self.timeout, tracer),
+            "graph": StageLimiter("graph", graph_limit, self.queue_size, self.timeout, tracer),
+        }
+
+    def slot(self, stage):
+        return self.stages[stage].slot()
+
+    def stats(self):
+        return {name: limiter.stats() for name, limiter in self.stages.items()}
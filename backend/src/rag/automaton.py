@@ -0,0 +1,85 @@
+from collections import deque
+
+
+def _is_word_char(ch):
+    return ch.isalnum() or ch == "_"
+
+
+class KeywordAutomaton:
+    """Aho-Corasick multi-pattern matcher with word-boundary filtering.
+
+    Patterns are matched case-insensitively in one pass over the text,
+    however many patterns there are. Each pattern carries a payload that is
+    returned with its matches.
+    """
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._own = [[]]
+        self._out = [[]]
+        self._built = False
+
+    def __len__(self):
+        return sum(len(own) for own in self._own)
+
+    def add(self, pattern, payload):
+        pattern = pattern.lower()
+        if not pattern:
+            return
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._own.append([])
+                self._goto[node][ch] = nxt
+            node = nxt
+        self._own[node].append((len(pattern), payload))
+        self._built = False
+
+    def build(self):
+        """Compute failure links; must run after the last add()"""
+        self._out = [list(own) for own in self._own]
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                # Suffix matches are reported from this node as well
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+        self._built = True
+        return self
+
+    def iter_matches(self, text):
+        """Yield (start, end, payload) for every whole-word pattern occurrence"""
+        if not self._built:
+            self.build()
+        # Offsets index the lowercased text, which matches `text` for ASCII input
+        lowered = text.lower()
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        n = len(lowered)
+        for i, ch in enumerate(lowered):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if not out[node]:
+                continue
+            after_ok = i + 1 == n or not _is_word_char(lowered[i + 1])
+            if not after_ok:
+                continue
+            for length, payload in out[node]:
+                start = i - length + 1
+                if start == 0 or not _is_word_char(lowered[start - 1]):
+                    yield start, i + 1, payload
+
+    def find(self, text):
+        return list(self.iter_matches(text))
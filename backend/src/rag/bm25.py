@@ -0,0 +1,288 @@
+import hashlib
+import json
+import os
+import re
+from collections.abc import Sequence
+
+import numpy as np
+
+from src.graph.schema_stream import iter_schema
+from src.graph.schema_version import file_fingerprint
+from src.rag.context_builder import estimate_tokens
+
+INDEX_FORMAT = 2
+ARRAYS = ("post_offsets", "post_docs", "post_tfs", "doc_lens", "terms", "chunk_offsets",
+          "chunk_bytes")
+
+
+def tokenize(text):
+    """Lowercased alphanumeric terms, plural 's' stripped so "documents" matches "Document" """
+    terms = []
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        if len(word) > 3 and word.endswith("s"):
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+
+def chunk_schema_text(schema_text, max_tokens=200):
+    """Split flattened schema text into chunks of about `max_tokens`.
+
+    A chunk starts at an unindented line ("Table KNA1: ...") and takes the
+    indented lines under it. Long tables are split, and every piece repeats
+    the table line so it stays self-describing.
+    """
+    blocks = []
+    for line in schema_text.splitlines():
+        if not line.strip():
+            continue
+        if not line[:1].isspace() or not blocks:
+            blocks.append([line])
+        else:
+            blocks[-1].append(line)
+
+    chunks = []
+    for header, *body in blocks:
+        piece = [header]
+        size = estimate_tokens(header)
+        for line in body:
+            cost = estimate_tokens("\n" + line)
+            if len(piece) > 1 and size + cost > max_tokens:
+                chunks.append("\n".join(piece))
+                piece, size = [header], estimate_tokens(header)
+            piece.append(line)
+            size += cost
+        chunks.append("\n".join(piece))
+    return chunks
+
+
+def table_text(table):
+    """A table and its fields as schema text: "Table KNA1: ..." then "  - KUNNR: ..." lines"""
+    lines = [f"Table {table['name']}: {table.get('description') or ''}"]
+    lines.extend(f"  - {f['name']}: {f.get('description') or ''}" for f in table["fields"])
+    return "\n".join(lines)
+
+
+def schema_file_text(schema_file):
+    """Schema text of every table in a schema JSON file, streamed"""
+    return "\n".join(table_text(item) for kind, item in iter_schema(schema_file)
+                     if kind == "table")
+
+
+def text_fingerprint(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def index_fingerprint(schema_text, chunk_tokens):
+    """Identifies an index by the text and chunk size it was built from"""
+    return text_fingerprint(f"{INDEX_FORMAT}:{chunk_tokens}:{schema_text}")
+
+
+def file_index_fingerprint(schema_file, chunk_tokens):
+    """Identifies an index by the schema file and chunk size it was built from"""
+    return text_fingerprint(f"{INDEX_FORMAT}:{chunk_tokens}:{file_fingerprint(schema_file)}")
+
+
+class TextArray(Sequence):
+    """Strings stored as one UTF-8 byte array and CSR offsets; decoded on access"""
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, strings):
+        encoded = [s.encode("utf-8") for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        return cls(np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self.data[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+
+class BM25Index:
+    """Okapi BM25 over text chunks with a CSR inverted index.
+
+    Postings for term i are post_docs/post_tfs[post_offsets[i]:post_offsets[i + 1]].
+    Terms are a sorted byte-string array searched by bisection, and chunks
+    are one UTF-8 byte array with offsets, so a saved index is only numpy
+    files, loaded memory-mapped. It lives in a directory named after the
+    fingerprint of the text (or schema file) and chunk size it was built from.
+    """
+
+    def __init__(self, chunks, terms, post_offsets, post_docs, post_tfs, doc_lens,
+                 fingerprint=None, k1=1.5, b=0.75):
+        self.chunks = chunks
+        self.terms = terms
+        self.post_offsets = post_offsets
+        self.post_docs = post_docs
+        self.post_tfs = post_tfs
+        self.doc_lens = doc_lens
+        self.fingerprint = fingerprint
+        self.k1 = k1
+        self.b = b
+        self.avg_len = float(doc_lens.mean()) if len(doc_lens) else 0.0
+        df = np.diff(post_offsets)
+        n = len(chunks)
+        self.idf = np.log(1 + (n - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+    # -----------------------------
+    # Construction
+    # -----------------------------
+    @classmethod
+    def build(cls, chunks, fingerprint=None):
+        postings = {}
+        doc_lens = np.zeros(len(chunks), dtype=np.int32)
+        for doc, chunk in enumerate(chunks):
+            terms = tokenize(chunk)
+            doc_lens[doc] = len(terms)
+            counts = {}
+            for term in terms:
+                counts[term] = counts.get(term, 0) + 1
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((doc, tf))
+
+        # Terms are ASCII, so str order is byte order and searchsorted finds them
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum([len(postings[t]) for t in terms], out=offsets[1:])
+        docs = np.array([d for t in terms for d, _ in postings[t]], dtype=np.int32)
+        tfs = np.array([tf for t in terms for _, tf in postings[t]], dtype=np.float32)
+        keys = np.array([t.encode("ascii") for t in terms], dtype=np.bytes_)
+        return cls(TextArray.from_strings(chunks), keys, offsets, docs, tfs, doc_lens,
+                   fingerprint)
+
+    @classmethod
+    def from_schema_text(cls, schema_text, chunk_tokens=200):
+        chunks = chunk_schema_text(schema_text, chunk_tokens)
+        return cls.build(chunks, index_fingerprint(schema_text, chunk_tokens))
+
+    def term_id(self, term):
+        """Row of `term` in the postings, or None"""
+        key = term.encode("ascii", "ignore")
+        i = int(np.searchsorted(self.terms, key))
+        if i < len(self.terms) and self.terms[i] == key:
+            return i
+        return None
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        arrays = {
+            "post_offsets": self.post_offsets,
+            "post_docs": self.post_docs,
+            "post_tfs": self.post_tfs,
+            "doc_lens": self.doc_lens,
+            "terms": self.terms,
+            "chunk_offsets": self.chunks.offsets,
+            "chunk_bytes": self.chunks.data,
+        }
+        # Replaced atomically so a process mapping the old files keeps its copy
+        for name, array in arrays.items():
+            tmp = os.path.join(path, f"{name}.tmp.npy")
+            np.save(tmp, np.ascontiguousarray(array))
+            os.replace(tmp, os.path.join(path, f"{name}.npy"))
+        tmp = os.path.join(path, "meta.tmp.json")
+        with open(tmp, "w") as f:
+            json.dump({
+                "format": INDEX_FORMAT,
+                "fingerprint": self.fingerprint,
+                "chunks": len(self.chunks),
+                "terms": len(self.terms),
+            }, f)
+        os.replace(tmp, os.path.join(path, "meta.json"))
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        if meta.get("format") != INDEX_FORMAT:
+            raise ValueError(f"Unsupported BM25 index format in {path}: {meta.get('format')}")
+        arrays = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r" if mmap else None)
+            for name in ARRAYS
+        }
+        chunks = TextArray(arrays.pop("chunk_bytes"), arrays.pop("chunk_offsets"))
+        return cls(chunks, fingerprint=meta["fingerprint"], **arrays)
+
+    @classmethod
+    def _cached(cls, fingerprint, path, build):
+        """The index saved under path/<fingerprint>, else build() saved there"""
+        path = os.path.join(path, fingerprint) if path else None
+        if path and os.path.exists(os.path.join(path, "meta.json")):
+            try:
+                index = cls.load(path)
+            except ValueError:
+                index = None  # an older format: rebuilt below
+            if index is not None and index.fingerprint == fingerprint:
+                return index
+        index = build()
+        if path:
+            index.save(path)
+        return index
+
+    @classmethod
+    def for_schema_text(cls, schema_text, path=None, chunk_tokens=200):
+        """Load the index for this text and chunk size from under `path`, else build and save it.
+
+        Each (text, chunk size) pair gets its own subdirectory, so callers with
+        different schemas or settings can share `path` without clobbering each other.
+        """
+        return cls._cached(index_fingerprint(schema_text, chunk_tokens), path,
+                           lambda: cls.from_schema_text(schema_text, chunk_tokens))
+
+    @classmethod
+    def for_schema_file(cls, schema_file, path=None, chunk_tokens=200):
+        """As for_schema_text, keyed by the file's content hash.
+
+        The schema is only parsed and flattened when no saved index matches,
+        so a warm start reads the numpy files and nothing else.
+        """
+        fingerprint = file_index_fingerprint(schema_file, chunk_tokens)
+
+        def build():
+            chunks = chunk_schema_text(schema_file_text(schema_file), chunk_tokens)
+            return cls.build(chunks, fingerprint)
+        return cls._cached(fingerprint, path, build)
+
+    # -----------------------------
+    # Search
+    # -----------------------------
+    def search(self, query, k=8):
+        """Top-k (chunk index, score) with score > 0, best first"""
+        scores = np.zeros(len(self.chunks), dtype=np.float32)
+        norm = self.k1 * (1 - self.b + self.b * self.doc_lens / (self.avg_len or 1.0))
+        for term in set(tokenize(query)):
+            i = self.term_id(term)
+            if i is None:
+                continue
+            start, end = self.post_offsets[i], self.post_offsets[i + 1]
+            docs, tfs = self.post_docs[start:end], self.post_tfs[start:end]
+            scores[docs] += self.idf[i] * tfs * (self.k1 + 1) / (tfs + norm[docs])
+        hits = np.flatnonzero(scores)
+        top = hits[np.argsort(-scores[hits], kind="stable")][:k]
+        return [(int(doc), float(scores[doc])) for doc in top]
+
+    def top_chunks(self, query, k=8, token_budget=1500):
+        """Best-scoring chunks that fit in `token_budget`, best first"""
+        selected = []
+        used = 0
+        for doc, _ in self.search(query, k):
+            cost = estimate_tokens(self.chunks[doc]) + 1  # blank line between chunks
+            if used + cost > token_budget:
+                continue
+            selected.append(self.chunks[doc])
+            used += cost
+        return selected
@@ -0,0 +1,243 @@
+import os
+
+
+def estimate_tokens(text):
+    """Rough token count: ~4 characters per token for English text and SAP identifiers"""
+    return (len(text) + 3) // 4
+
+
+# Rendered section headers, charged when a section gets its first item
+SECTION_HEADERS = {
+    "table": "Tables:",
+    "impact": "Impacted by a change (tables referencing it, hops away):",
+    "path": "Join paths:",
+    "edge": "Relationships:",
+    "field": "Fields (* = key):",
+}
+
+
+def _line_tokens(line):
+    # One extra token for the bullet/separator and newline around each item
+    return estimate_tokens(line) + 1
+
+
+def _edge_key(record):
+    return record['t1'].get('name'), record['t2'].get('name'), record['r'].get('via')
+
+
+def path_edges(join_paths):
+    """(from, to, via) of every RELATES_TO edge walked by the join paths, in stored direction"""
+    edges = set()
+    for path in join_paths or []:
+        prev = path['from']
+        for step in path['path'] or []:
+            if step['direction'] == "->":
+                edges.add((prev, step['to'], step['via']))
+            else:
+                edges.add((step['to'], prev, step['via']))
+            prev = step['to']
+    return edges
+
+
+def path_tables(join_paths):
+    tables = []
+    for path in join_paths or []:
+        if path['path']:
+            tables.append(path['from'])
+            tables.extend(step['to'] for step in path['path'])
+    return list(dict.fromkeys(tables))
+
+
+class ContextBuilder:
+    """Packs retrieved tables, relationships, join paths and fields into a token budget.
+
+    Candidates are ranked by relevance to the extracted tables and intent and
+    added greedily while they fit. Each table is described once, paid for by
+    the first item that mentions it. Sections are laid out in a fixed order,
+    so the same retrieval always yields the same prompt.
+    """
+
+    def __init__(self, token_budget=None):
+        self.token_budget = token_budget or int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+
+    def build(self, entities, records, join_paths=None, fields=None, impact=None):
+        """Return (context text, report) for the answer prompt"""
+        seeds = list(dict.fromkeys(entities.get('tables', []) + entities.get('seed_tables', [])))
+        candidates, tables = self._candidates(
+            seeds, entities.get('intent'), records, join_paths or [], fields or [], impact or []
+        )
+
+        included = {"table": [], "impact": [], "path": [], "edge": [], "field": []}
+        dropped = {"impact": 0, "path": 0, "edge": 0, "field": 0}
+        described = set()
+        used = 0
+        dropped_tokens = 0
+
+        for _, _, kind, item, line, requires in sorted(candidates, key=lambda c: c[:2]):
+            needed = [t for t in requires if t not in described]
+            cost = self._cost(kind, item, line, needed, tables, included)
+            if kind != "table" and used + cost > self.token_budget:
+                dropped[kind] += 1
+                dropped_tokens += _line_tokens(line)
+                continue
+            if kind == "table" and used + cost > self.token_budget:
+                # Seed tables are always named, even when their description doesn't fit
+                tables[item] = item
+                cost = self._cost(kind, item, line, needed, tables, included)
+            used += cost
+            for t in needed:
+                described.add(t)
+                included["table"].append(t)
+            if kind != "table":
+                included[kind].append((item, line))
+
+        text = self._render(included, tables)
+        report = {
+            "tokens": estimate_tokens(text),
+            "budget": self.token_budget,
+            "dropped_tokens": dropped_tokens,
+            "tables": len(included["table"]),
+            "impact": len(included["impact"]),
+            "join_paths": len(included["path"]),
+            "edges": len(included["edge"]),
+            "fields": len(included["field"]),
+            "dropped": dropped,
+        }
+        return text, report
+
+    def _cost(self, kind, item, line, needed, tables, included):
+        """Tokens an item adds: its line, new table lines, and any section header it opens"""
+        cost = sum(_line_tokens(tables[t]) for t in needed)
+        if needed and not included["table"]:
+            cost += _line_tokens(SECTION_HEADERS["table"])
+        if kind == "table":
+            return cost
+        cost += _line_tokens(line)
+        if not included[kind]:
+            cost += _line_tokens(SECTION_HEADERS[kind])
+        if kind == "field" and all(table != item[0] for (table, _), _ in included["field"]):
+            cost += _line_tokens(item[0])
+        return cost
+
+    def _candidates(self, seeds, intent, records, join_paths, fields, impact=()):
+        """(score, tiebreak, kind, item, line, tables it requires) for everything retrieved"""
+        seed_set = set(seeds)
+        tables = {}
+        for record in records:
+            for t in (record['t1'], record['t2']):
+                name = t.get('name')
+                if name not in tables:
+                    tables[name] = self._table_line(t, documented=name in seed_set)
+        for name in seeds + [f['table'] for f in fields] + path_tables(join_paths):
+            tables.setdefault(name, name)
+
+        candidates = []
+        for rank, name in enumerate(seeds):
+            candidates.append((-1000, rank, "table", name, "", [name]))
+
+        # Exact impact sets from the reachability index come before any edge
+        for rank, entry in enumerate(impact):
+            line = self._impact_line(entry)
+            candidates.append((-200, rank, "impact", entry['table'], line, [entry['table']]))
+
+        for path in join_paths:
+            if path['path'] is None:
+                line = f"none between {path['from']} and {path['to']}"
+                candidates.append((-90, line, "path", (path['from'], path['to']), line, []))
+                continue
+            steps = " ".join(
+                f"{step['direction']} {step['to']} (via {step['via']})" for step in path['path']
+            )
+            line = f"{path['from']} {steps}"
+            requires = [path['from']] + [step['to'] for step in path['path']]
+            candidates.append((-100 + path['hops'], line, "path", line, line, requires))
+
+        on_path = path_edges(join_paths)
+        vias = set()
+        seen = set()
+        for record in records:
+            key = _edge_key(record)
+            if key in seen:
+                continue
+            seen.add(key)
+            t1, t2, via = key
+            vias.add(via)
+            score = 20 * ((t1 in seed_set) + (t2 in seed_set)) + 40
+            if key in on_path:
+                score += 15
+            if intent == "impact" and t2 in seed_set:
+                # Tables that reference the seed are the ones affected by a change
+                score += 10
+            line = f"{t1} -> {t2} via {via}"
+            if record['r'].get('description'):
+                line += f": {record['r']['description']}"
+            candidates.append((-score, line, "edge", key, line, [t1, t2]))
+
+        field_tables = set(path_tables(join_paths))
+        for f in fields:
+            in_seed = f['table'] in seed_set
+            if not in_seed and f['table'] not in field_tables:
+                continue
+            if f.get('is_key'):
+                score = 70 if in_seed else 50
+            elif f['name'] in vias:
+                score = 65 if in_seed else 45
+            elif in_seed:
+                score = 75 if intent == "field_listing" else 30
+            else:
+                score = 10
+            line = self._field_text(f)
+            item = (f['table'], f['name'])
+            tiebreak = f"{f['table']}.{f['name']}"
+            candidates.append((-score, tiebreak, "field", item, line, [f['table']]))
+
+        return candidates, tables
+
+    def _table_line(self, table, documented=False):
+        line = table.get('name')
+        if table.get('type'):
+            line += f" ({table['type']})"
+        if table.get('description'):
+            line += f": {table['description']}"
+        if documented and table.get('documentation'):
+            line += f". {table['documentation']}"
+        return line
+
+    def _impact_line(self, entry):
+        if not entry['impacted']:
+            return f"{entry['table']}: no table references it"
+        line = f"{entry['table']}: " + ", ".join(
+            f"{item['table']} ({item['hops']})" for item in entry['impacted']
+        )
+        if entry['total'] > len(entry['impacted']):
+            line += f", +{entry['total'] - len(entry['impacted'])} more"
+        return line
+
+    def _field_text(self, field):
+        text = field['name'] + ("*" if field.get('is_key') else "")
+        if field.get('type'):
+            text += f" {field['type']}"
+        if field.get('description'):
+            text += f" {field['description']}"
+        return text
+
+    def _render(self, included, tables):
+        sections = []
+        if included["table"]:
+            sections.append(SECTION_HEADERS["table"] + "\n" + "\n".join(
+                f"- {tables[t]}" for t in included["table"]
+            ))
+        for kind in ("impact", "path", "edge"):
+            if included[kind]:
+                sections.append(SECTION_HEADERS[kind] + "\n" + "\n".join(
+                    f"- {line}" for _, line in included[kind]
+                ))
+        if included["field"]:
+            by_table = {}
+            for (table, _), text in included["field"]:
+                by_table.setdefault(table, []).append(text)
+            ordered = [t for t in included["table"] if t in by_table]
+            sections.append(SECTION_HEADERS["field"] + "\n" + "\n".join(
+                f"- {t}: " + "; ".join(by_table[t]) for t in ordered
+            ))
+        return "\n\n".join(sections)
@@ -0,0 +1,203 @@
+import re
+
+from src.rag.automaton import KeywordAutomaton
+
+
+# Everyday names for core SAP tables. Only tables present in the graph are used.
+SAP_SYNONYMS = {
+    "customer": ["KNA1"],
+    "customer master": ["KNA1"],
+    "sold-to party": ["KNA1"],
+    "sales order": ["VBAK"],
+    "sales document": ["VBAK"],
+    "sales order item": ["VBAP"],
+    "sales document item": ["VBAP"],
+    "order item": ["VBAP"],
+    "material": ["MARA"],
+    "material master": ["MARA"],
+    "vendor": ["LFA1"],
+    "supplier": ["LFA1"],
+    "delivery": ["LIKP"],
+    "delivery item": ["LIPS"],
+    "billing document": ["VBRK"],
+    "invoice": ["VBRK"],
+    "billing item": ["VBRP"],
+    "purchase order": ["EKKO"],
+    "purchase order item": ["EKPO"],
+    "accounting document": ["BKPF"],
+}
+
+STOPWORDS = {
+    "a", "an", "the", "of", "for", "and", "or", "to", "in", "on", "at", "by",
+    "with", "from", "all", "any", "this", "that", "is", "are", "be", "its",
+    "data", "general", "contains", "stores", "information", "table", "tables",
+}
+
+# Upper-case words that look like table names but are not
+ACRONYMS = {"SAP", "HANA", "ERP", "SQL", "API", "JSON", "ABAP", "FK", "PK", "ID"}
+IDENTIFIER = re.compile(r"\b[A-Z][A-Z0-9_]{2,15}\b")
+
+# First matching rule wins, so the more specific intents come first. Flow words
+# beat impact ("How do order changes flow to billing?"), and join words beat
+# field words ("Which field joins VBAK to KNA1?")
+INTENT_RULES = [
+    ("join_check", [r"\bdirect(ly)?\b", r"\bwithout\b", r"\bforeign keys?\b"]),
+    ("data_flow", [r"\bflows?\b", r"\bto-(cash|pay)\b", r"\bprocess\b", r"\blifecycle\b",
+                   r"\bend[- ]to[- ]end\b"]),
+    ("impact", [r"\bimpact", r"\baffect", r"\bdepend", r"\brel(y|ies)\b", r"\bchanges?\b",
+                r"\b(which|what) tables? (reference|use|point to)\b"]),
+    ("relationship", [r"\bconnect", r"\brelat", r"\blink", r"\bjoin", r"\breferenc"]),
+    ("field_listing", [r"\bfields?\b", r"\bcolumns?\b", r"\battributes?\b"]),
+    ("entity_lookup", [r"\b(which|what)( sap)? tables?\b", r"\bwhere\b", r"\bstored?\b",
+                       r"\bcontain", r"\brepresent"]),
+]
+_INTENT_PATTERNS = [
+    (intent, [re.compile(p, re.IGNORECASE) for p in patterns]) for intent, patterns in INTENT_RULES
+]
+DEFAULT_INTENT = "relationship"
+
+# Weight of one match, by how the term identifies a table
+TABLE_NAME_WEIGHT = 1.0
+SYNONYM_WEIGHT = 0.9
+FIELD_WEIGHT = 0.6
+KEYWORD_WEIGHT = 0.5
+
+# Field names shared by more tables than this (MANDT, ...) identify nothing
+MAX_FIELD_TABLES = 20
+# Keywords shared by more tables than this still name an entity, but their
+# per-table weight is too small to matter and would cost a score update each
+MAX_KEYWORD_TABLES = 50
+
+
+def classify_intent(query):
+    """Rule-based intent; returns (intent, matched) where matched is False for the default"""
+    for intent, patterns in _INTENT_PATTERNS:
+        if any(p.search(query) for p in patterns):
+            return intent, True
+    return DEFAULT_INTENT, False
+
+
+def description_terms(text):
+    """Content unigrams and bigrams of a description, lowercased"""
+    words = re.findall(r"[a-z][a-z0-9\-]+", (text or "").lower())
+    content = [w for w in words if w not in STOPWORDS and len(w) > 2]
+    return set(content) | {f"{a} {b}" for a, b in zip(content, content[1:])}
+
+
+def field_owners(fields, max_tables=MAX_FIELD_TABLES):
+    """{field name: tables} as the backends' identifying_fields() returns it"""
+    field_tables = {}
+    for field in fields:
+        entry = field_tables.setdefault(field["name"], {"keys": set(), "all": set()})
+        entry["all"].add(field["table"])
+        if field.get("is_key"):
+            entry["keys"].add(field["table"])
+    owners = {name: sorted(e["keys"] or e["all"]) for name, e in field_tables.items()}
+    return {name: tables for name, tables in owners.items() if len(tables) <= max_tables}
+
+
+def _variants(term):
+    return [term] if term.endswith("s") else [term, term + "s"]
+
+
+class LexicalEntityExtractor:
+    """Finds tables, entity keywords and intent in a question without an LLM.
+
+    One automaton holds table names, identifying field names, description
+    keywords and SAP synonyms. A question is scanned once; every match adds
+    weight to the tables behind it, and the best-scoring tables are returned
+    in the same {"tables", "entities", "intent"} shape the LLM produces, with
+    a confidence score.
+    """
+
+    def __init__(self, automaton, schema_version=None):
+        self.automaton = automaton
+        self.schema_version = schema_version
+
+    @classmethod
+    def from_schema(cls, tables, fields, schema_version=None):
+        return cls.from_field_owners(tables, field_owners(fields), schema_version)
+
+    @classmethod
+    def from_field_owners(cls, tables, fields, schema_version=None):
+        """`fields` maps identifying field names to the tables they point at"""
+        automaton = KeywordAutomaton()
+        names = {t["name"] for t in tables}
+
+        for name in names:
+            automaton.add(name, ("table", name, {name: TABLE_NAME_WEIGHT}))
+
+        for term, targets in SAP_SYNONYMS.items():
+            present = {t: SYNONYM_WEIGHT for t in targets if t in names}
+            if present:
+                for variant in _variants(term):
+                    automaton.add(variant, ("keyword", term, present))
+
+        keyword_tables = {}
+        for table in tables:
+            text = f"{table.get('description') or ''} {table.get('documentation') or ''}"
+            for term in description_terms(text):
+                keyword_tables.setdefault(term, set()).add(table["name"])
+        for term, owners in keyword_tables.items():
+            # Rarer keywords say more about which table is meant
+            weight = KEYWORD_WEIGHT / len(owners)
+            weights = {t: weight for t in owners} if len(owners) <= MAX_KEYWORD_TABLES else {}
+            for variant in _variants(term):
+                automaton.add(variant, ("keyword", term, weights))
+
+        for name, owners in fields.items():
+            if name in names or len(name) < 4 or len(owners) > MAX_FIELD_TABLES:
+                continue
+            weight = FIELD_WEIGHT / len(owners)
+            automaton.add(name, ("field", name, {t: weight for t in owners}))
+
+        return cls(automaton.build(), schema_version)
+
+    @classmethod
+    def from_backend(cls, backend):
+        return cls.from_field_owners(
+            backend.list_tables(), backend.identifying_fields(MAX_FIELD_TABLES),
+            backend.schema_version(),
+        )
+
+    def extract(self, query, max_tables=6):
+        """Return ({"tables", "entities", "intent"}, confidence in [0, 1])"""
+        scores = {}
+        first_seen = {}
+        entities = []
+
+        for start, end, (kind, term, weights) in self.automaton.iter_matches(query):
+            # Field names are only trusted when written as identifiers (KUNNR, not "kunnr")
+            if kind == "field" and not query[start:end].isupper():
+                continue
+            if kind == "keyword" and term not in entities:
+                entities.append(term)
+            for table, weight in weights.items():
+                scores[table] = scores.get(table, 0.0) + weight
+                first_seen.setdefault(table, start)
+
+        intent, intent_matched = classify_intent(query)
+
+        # Table-like identifiers the graph doesn't know are passed through as
+        # named, so retrieval and the answer can report them as missing
+        unknown = []
+        for match in IDENTIFIER.finditer(query):
+            token = match.group()
+            if token not in ACRONYMS and token not in scores and token not in unknown \
+                    and not self.automaton.find(token):
+                unknown.append(token)
+
+        if not scores:
+            return {"tables": unknown[:max_tables], "entities": entities, "intent": intent}, 0.0
+
+        top = max(scores.values())
+        cutoff = max(0.3, top / 2)
+        ranked = sorted(
+            (t for t, score in scores.items() if score >= cutoff),
+            key=lambda t: (-scores[t], first_seen[t]),
+        )[:max_tables]
+        tables = sorted(ranked, key=lambda t: first_seen[t])
+        tables += unknown[:max(0, max_tables - len(tables))]
+
+        confidence = min(1.0, top) * (1.0 if intent_matched else 0.7)
+        return {"tables": tables, "entities": entities, "intent": intent}, round(confidence, 3)
@@ -0,0 +1,253 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+
+def normalize_prompt(prompt):
+    """Collapse whitespace so indentation-only differences share a cache entry"""
+    return re.sub(r"\s+", " ", prompt).strip()
+
+
+def llm_params(llm):
+    """Model name and sampling parameters that affect an LLM's output"""
+    return {
+        name: getattr(llm, name)
+        for name in ("model", "max_tokens", "temperature", "top_p", "top_k")
+        if getattr(llm, name, None) is not None
+    }
+
+
+def make_key(prompt, params):
+    payload = json.dumps([normalize_prompt(prompt), params], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """Thread-safe in-memory LRU with a per-entry TTL"""
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires is not None and expires < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires = time.time() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteStore:
+    """Disk tier: one row per cached LLM response"""
+
+    def __init__(self, path):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                namespace TEXT NOT NULL,
+                version TEXT,
+                value TEXT NOT NULL,
+                created REAL NOT NULL
+            )
+        """)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT value, version, created FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+
+    def set(self, key, namespace, version, value):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?, ?)",
+                (key, namespace, version, value, time.time()),
+            )
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+
+    def close(self):
+        self._conn.close()
+
+
+class LLMCache:
+    """Two-tier cache for LLM responses: in-memory LRU in front of SQLite.
+
+    Entries live in a namespace ("entities", "answers", ...). Entries stored
+    with a schema version are only served while that version is current.
+    """
+
+    def __init__(self, path=None, maxsize=1024, ttl=24 * 3600):
+        self.ttl = ttl
+        self.memory = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.disk = SQLiteStore(path) if path else None
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _count(self, namespace, outcome):
+        with self._lock:
+            counts = self._stats.setdefault(
+                namespace, {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+            )
+            counts[outcome] += 1
+
+    def get(self, namespace, key, version=None):
+        item = self.memory.get(key)
+        if item is not None:
+            value, stored_version = item
+            if stored_version == version:
+                self._count(namespace, "memory_hits")
+                return value
+            self.memory.delete(key)
+
+        if self.disk is not None:
+            row = self.disk.get(key)
+            if row is not None:
+                value, stored_version, created = row
+                fresh = not self.ttl or created + self.ttl >= time.time()
+                if fresh and stored_version == version:
+                    self.memory.set(key, (value, version))
+                    self._count(namespace, "disk_hits")
+                    return value
+                self.disk.delete(key)
+
+        self._count(namespace, "misses")
+        return None
+
+    def set(self, namespace, key, value, version=None):
+        self.memory.set(key, (value, version))
+        if self.disk is not None:
+            self.disk.set(key, namespace, version, value)
+
+    def stats(self):
+        with self._lock:
+            stats = {ns: dict(counts) for ns, counts in self._stats.items()}
+        for counts in stats.values():
+            lookups = sum(counts.values())
+            hits = counts["memory_hits"] + counts["disk_hits"]
+            counts["hit_ratio"] = round(hits / lookups, 3) if lookups else 0.0
+        return {"namespaces": stats, "memory_entries": len(self.memory)}
+
+
+class CachedLLM:
+    """Wraps a chat model so `invoke`/`ainvoke`/`astream` are answered from an LLMCache
+    when possible.
+
+    `version` is an optional callable returning the current schema version;
+    entries written under an older version are treated as misses.
+    """
+
+    def __init__(self, llm, cache, namespace, version=None):
+        self.llm = llm
+        self.cache = cache
+        self.namespace = namespace
+        self.version = version
+
+    def _lookup(self, prompt):
+        key = make_key(prompt, {"namespace": self.namespace, **llm_params(self.llm)})
+        version = self.version() if self.version else None
+        version = None if version is None else str(version)
+        return key, version, self.cache.get(self.namespace, key, version)
+
+    def invoke(self, prompt):
+        key, version, cached = self._lookup(prompt)
+        if cached is not None:
+            return AIMessage(content=cached, response_metadata={"cached": True})
+        response = self.llm.invoke(prompt)
+        self.cache.set(self.namespace, key, response.content, version)
+        return response
+
+    async def ainvoke(self, prompt):
+        key, version, cached = self._lookup(prompt)
+        if cached is not None:
+            return AIMessage(content=cached, response_metadata={"cached": True})
+        response = await self.llm.ainvoke(prompt)
+        self.cache.set(self.namespace, key, response.content, version)
+        return response
+
+    async def astream(self, prompt):
+        """Yield message chunks; a cached reply arrives as a single chunk.
+
+        A fresh reply is cached only once the stream has completed.
+        """
+        key, version, cached = self._lookup(prompt)
+        if cached is not None:
+            yield AIMessageChunk(content=cached, response_metadata={"cached": True})
+            return
+        parts = []
+        async for chunk in self.llm.astream(prompt):
+            parts.append(chunk.content)
+            yield chunk
+        self.cache.set(self.namespace, key, "".join(parts), version)
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_llm_cache():
+    """Process-wide LLM cache configured from the environment, or None if disabled.
+
+    LLM_CACHE=0 disables caching; LLM_CACHE_PATH sets the SQLite file (empty for
+    memory only); LLM_CACHE_SIZE and LLM_CACHE_TTL size the in-memory tier.
+    """
+    global _default_cache
+    if os.getenv("LLM_CACHE", "1") == "0":
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = LLMCache(
+                path=os.getenv("LLM_CACHE_PATH", "data/llm_cache.sqlite") or None,
+                maxsize=int(os.getenv("LLM_CACHE_SIZE", "1024")),
+                ttl=float(os.getenv("LLM_CACHE_TTL", str(24 * 3600))),
+            )
+        return _default_cache
+
+
+def cached_llm(llm, namespace, version=None, cache=None):
+    """Wrap `llm` with the given (or process-wide) cache; returns `llm` if caching is off"""
+    cache = cache or get_llm_cache()
+    if cache is None:
+        return llm
+    return CachedLLM(llm, cache, namespace, version)
@@ -0,0 +1,411 @@
+"""Deadlines, retries and hedged requests around chat model calls.
+
+ResilientLLM wraps a chat model for one pipeline stage ("extract" or
+"generate"). Each attempt gets a deadline; attempts that time out or fail
+with a transient error (connection errors, 429, 5xx) are retried after a
+jittered exponential backoff. With hedging on, an attempt still running past
+the stage's HEDGE_PERCENTILE latency gets a duplicate call, and whichever
+finishes first wins.
+
+A request's end-to-end LLM budget (latency_budget) is split across the
+stages still to run, so a slow extraction cannot use up the answer's time.
+"""
+import asyncio
+import contextvars
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager, nullcontext
+
+# Stages in pipeline order and their share of the request budget
+STAGE_WEIGHTS = {"extract": 1, "generate": 3}
+
+# Errors without an HTTP status that are still worth retrying (anthropic/httpx names)
+TRANSIENT_ERRORS = {"APIConnectionError", "APITimeoutError", "TimeoutException", "NetworkError"}
+
+_budget_deadline = contextvars.ContextVar("llm_budget_deadline", default=None)
+
+
+@contextmanager
+def latency_budget(ms):
+    """Give the LLM calls made inside the block `ms` milliseconds in total (0 = unbounded)"""
+    with budget_until(time.monotonic() + ms / 1000 if ms else None):
+        yield
+
+
+@contextmanager
+def budget_until(deadline):
+    """Give the LLM calls made inside the block until monotonic `deadline` (None = unbounded)"""
+    token = _budget_deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _budget_deadline.reset(token)
+
+
+def budget_deadline():
+    """Monotonic deadline of the enclosing latency budget, or None"""
+    return _budget_deadline.get()
+
+
+def is_transient(error):
+    """Timeouts, connection errors, 429 and 5xx are retried; other errors (4xx, auth) are not"""
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    return any(cls.__name__ in TRANSIENT_ERRORS for cls in type(error).__mro__)
+
+
+def stage_deadline(stage):
+    """Monotonic time by which `stage` must finish, or None without a budget.
+
+    A stage gets its weight's share of what is left, counting itself and the
+    stages after it; the last stage gets everything that is left.
+    """
+    deadline = _budget_deadline.get()
+    if deadline is None:
+        return None
+    stages = list(STAGE_WEIGHTS)
+    later = sum(STAGE_WEIGHTS[s] for s in stages[stages.index(stage):])
+    now = time.monotonic()
+    return now + max(deadline - now, 0.0) * STAGE_WEIGHTS[stage] / later
+
+
+class ResilientLLM:
+    """Chat model wrapper adding per-attempt deadlines, retries and hedging.
+
+    `hedge_llm` answers the duplicate calls (the wrapped model by default).
+    With a `limiter` (an admission StageLimiter), every async attempt takes
+    its own slot, so backoff sleeps hold none; a hedge runs only if a slot is
+    free at once. Streams are admitted by the caller for their whole length.
+
+    Per stage, the environment sets LLM_<STAGE>_TIMEOUT_MS (0 = none). By
+    default extraction gets 8000 ms and generation 10000 ms plus the wrapped
+    model's max_tokens at LLM_MIN_TOKENS_PER_S (25) tokens per second. For
+    all stages it sets LLM_RETRIES (2), LLM_BACKOFF_MS (200),
+    LLM_HEDGE_PERCENTILE (0, hedging off; e.g. 95 hedges past p95) and
+    LLM_HEDGE_MIN_SAMPLES (20).
+
+    Synchronous calls run on the stage's own threads, as many as the limiter
+    admits (SYNC_WORKERS without one), so they can be timed out and hedged.
+    An abandoned call keeps its thread until it returns, and new attempts wait
+    within their deadline for a free one: timed-out work cannot pile up.
+    """
+
+    DEFAULT_TIMEOUT_MS = {"extract": 8000, "generate": 10000}
+    SYNC_WORKERS = 32
+    # Stages whose default timeout also covers decoding max_tokens
+    TOKEN_SCALED_STAGES = {"generate"}
+
+    def __init__(self, llm, stage, timeout_ms=None, retries=None, backoff_ms=None,
+                 hedge_percentile=None, hedge_min_samples=None, hedge_llm=None, tracer=None,
+                 limiter=None):
+        self.llm = llm
+        self.stage = stage
+        self.hedge_llm = hedge_llm or llm
+        if timeout_ms is None:
+            timeout_ms = float(os.getenv(
+                f"LLM_{stage.upper()}_TIMEOUT_MS", str(self.default_timeout_ms(llm, stage))
+            ))
+        self.timeout = timeout_ms / 1000 if timeout_ms else None
+        self.retries = int(os.getenv("LLM_RETRIES", "2")) if retries is None else retries
+        self.backoff = (float(os.getenv("LLM_BACKOFF_MS", "200")) if backoff_ms is None
+                        else backoff_ms) / 1000
+        self.hedge_percentile = float(os.getenv("LLM_HEDGE_PERCENTILE", "0")) \
+            if hedge_percentile is None else hedge_percentile
+        self.hedge_min_samples = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20")) \
+            if hedge_min_samples is None else hedge_min_samples
+        self.tracer = tracer
+        self.limiter = limiter
+        self._latencies = deque(maxlen=500)
+        self._lock = threading.Lock()
+        self._executor = None
+        self.sync_workers = limiter.limit if limiter is not None and limiter.limit > 0 \
+            else self.SYNC_WORKERS
+        # Taken when a sync call starts and given back when it returns, even if abandoned
+        self._workers = threading.Semaphore(self.sync_workers)
+        self._stats = {"calls": 0, "attempts": 0, "retries": 0, "timeouts": 0, "errors": 0,
+                       "hedged": 0, "hedge_wins": 0, "failed": 0, "abandoned": 0}
+
+    @classmethod
+    def default_timeout_ms(cls, llm, stage):
+        """Stage allowance, plus max_tokens at LLM_MIN_TOKENS_PER_S for token-scaled stages"""
+        timeout_ms = cls.DEFAULT_TIMEOUT_MS.get(stage, 30000)
+        if stage not in cls.TOKEN_SCALED_STAGES:
+            return timeout_ms
+        max_tokens = getattr(llm, "max_tokens", None)
+        if not isinstance(max_tokens, (int, float)) or max_tokens <= 0:
+            # Reply length unknown: a flat allowance
+            return 30000
+        return timeout_ms + max_tokens * 1000 / float(os.getenv("LLM_MIN_TOKENS_PER_S", "25"))
+
+    def __getattr__(self, name):
+        # Model name and sampling parameters (for cache keys) come from the wrapped model
+        if name == "llm" or name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.llm, name)
+
+    def _count(self, outcome):
+        with self._lock:
+            self._stats[outcome] += 1
+        if self.tracer is not None:
+            self.tracer.llm_calls.inc(stage=self.stage, outcome=outcome)
+
+    def hedge_delay(self):
+        """Seconds after which an attempt is duplicated, or None while hedging is off"""
+        if self.hedge_percentile <= 0:
+            return None
+        with self._lock:
+            if len(self._latencies) < max(self.hedge_min_samples, 1):
+                return None
+            latencies = sorted(self._latencies)
+        index = min(int(len(latencies) * self.hedge_percentile / 100), len(latencies) - 1)
+        return latencies[index]
+
+    def _backoff(self, attempt):
+        """Full jitter: uniform in [0, backoff * 2^attempt]"""
+        return random.uniform(0, self.backoff * 2 ** attempt)
+
+    def _attempt_timeout(self, deadline):
+        if deadline is None:
+            return self.timeout
+        remaining = deadline - time.monotonic()
+        return remaining if self.timeout is None else min(self.timeout, remaining)
+
+    def _finished(self, started, hedged, winner_is_hedge):
+        with self._lock:
+            self._latencies.append(time.perf_counter() - started)
+        if hedged and winner_is_hedge:
+            self._count("hedge_wins")
+
+    def _failed(self, error):
+        self._count("timeouts" if isinstance(error, TimeoutError) else "errors")
+
+    def _give_up(self, error):
+        self._count("failed")
+        raise error
+
+    def _slot(self):
+        return self.limiter.slot() if self.limiter is not None else nullcontext()
+
+    def _hedge_slot(self):
+        """Take a slot for a hedge if one is free now; False means skip the hedge"""
+        return self.limiter is None or self.limiter.try_acquire()
+
+    def _release_hedge_slot(self):
+        if self.limiter is not None:
+            self.limiter.release()
+
+    # ----- async -----
+
+    async def _aattempt(self, prompt, timeout):
+        started = time.perf_counter()
+        hedge_after = self.hedge_delay()
+        tasks = {asyncio.ensure_future(self.llm.ainvoke(prompt)): False}
+        pending = set(tasks)
+        error = None
+        hedge_slot = False
+        try:
+            while pending:
+                elapsed = time.perf_counter() - started
+                hedge_due = hedge_after is not None and len(tasks) == 1
+                limits = [t - elapsed for t in (timeout, hedge_after if hedge_due else None)
+                          if t is not None]
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(min(limits), 0) if limits else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                for task in done:
+                    if task.exception() is None:
+                        self._finished(started, len(tasks) > 1, tasks[task])
+                        return task.result()
+                    error = task.exception()
+                if done:
+                    continue
+                if hedge_due and (timeout is None or hedge_after < timeout):
+                    if not self._hedge_slot():
+                        # The stage is busy: wait for the first attempt alone
+                        hedge_after = None
+                        continue
+                    hedge_slot = True
+                    self._count("hedged")
+                    hedge = asyncio.ensure_future(self.hedge_llm.ainvoke(prompt))
+                    tasks[hedge] = True
+                    pending.add(hedge)
+                    continue
+                raise TimeoutError(f"{self.stage} LLM call timed out after {timeout:.2f}s")
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+            if hedge_slot:
+                self._release_hedge_slot()
+
+    async def ainvoke(self, prompt):
+        self._count("calls")
+        deadline = stage_deadline(self.stage)
+        error = TimeoutError(f"{self.stage} LLM budget exhausted")
+        for attempt in range(self.retries + 1):
+            # One admission slot per attempt, released before the backoff sleep
+            async with self._slot():
+                timeout = self._attempt_timeout(deadline)
+                if timeout is not None and timeout <= 0:
+                    break
+                self._count("attempts")
+                try:
+                    return await self._aattempt(prompt, timeout)
+                except Exception as e:
+                    error = e
+                    self._failed(e)
+            delay = self._backoff(attempt)
+            if not is_transient(error) or attempt == self.retries or (
+                deadline is not None and time.monotonic() + delay >= deadline
+            ):
+                break
+            self._count("retries")
+            await asyncio.sleep(delay)
+        self._give_up(error)
+
+    async def astream(self, prompt):
+        """Stream chunks; the first chunk is held to the attempt deadline and retried.
+
+        Once a chunk has been yielded the stream is passed through as is.
+        """
+        self._count("calls")
+        deadline = stage_deadline(self.stage)
+        error = TimeoutError(f"{self.stage} LLM budget exhausted")
+        for attempt in range(self.retries + 1):
+            timeout = self._attempt_timeout(deadline)
+            if timeout is not None and timeout <= 0:
+                break
+            self._count("attempts")
+            started = time.perf_counter()
+            stream = self.llm.astream(prompt).__aiter__()
+            try:
+                first = await asyncio.wait_for(stream.__anext__(), timeout)
+            except StopAsyncIteration:
+                return
+            except Exception as e:
+                if hasattr(stream, "aclose"):
+                    await stream.aclose()
+                error = TimeoutError(f"{self.stage} LLM stream timed out") \
+                    if isinstance(e, asyncio.TimeoutError) else e
+                self._failed(error)
+            else:
+                self._finished(started, False, False)
+                yield first
+                async for chunk in stream:
+                    yield chunk
+                return
+            delay = self._backoff(attempt)
+            if not is_transient(error) or attempt == self.retries or (
+                deadline is not None and time.monotonic() + delay >= deadline
+            ):
+                break
+            self._count("retries")
+            await asyncio.sleep(delay)
+        self._give_up(error)
+
+    # ----- sync -----
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.sync_workers, thread_name_prefix=f"llm-{self.stage}"
+                )
+            return self._executor
+
+    def _submit(self, llm, prompt, blocking=True, timeout=None):
+        """Start llm.invoke(prompt) on a free stage worker; None if none frees up in time"""
+        if not (self._workers.acquire(timeout=timeout) if blocking
+                else self._workers.acquire(blocking=False)):
+            return None
+        try:
+            future = self._pool().submit(llm.invoke, prompt)
+        except BaseException:
+            self._workers.release()
+            raise
+        future.add_done_callback(lambda _: self._workers.release())
+        return future
+
+    def _attempt(self, prompt, timeout):
+        started = time.perf_counter()
+        hedge_after = self.hedge_delay()
+        first = self._submit(self.llm, prompt, timeout=timeout)
+        if first is None:
+            raise TimeoutError(f"{self.stage} LLM call timed out after {timeout:.2f}s waiting "
+                               f"for one of {self.sync_workers} workers")
+        futures = {first: False}
+        pending = set(futures)
+        error = None
+        while pending:
+            elapsed = time.perf_counter() - started
+            hedge_due = hedge_after is not None and len(futures) == 1
+            limits = [t - elapsed for t in (timeout, hedge_after if hedge_due else None)
+                      if t is not None]
+            done, pending = wait(
+                pending, timeout=max(min(limits), 0) if limits else None,
+                return_when=FIRST_COMPLETED,
+            )
+            for future in done:
+                if future.exception() is None:
+                    self._finished(started, len(futures) > 1, futures[future])
+                    return future.result()
+                error = future.exception()
+            if done:
+                continue
+            if hedge_due and (timeout is None or hedge_after < timeout):
+                hedge = self._submit(self.hedge_llm, prompt, blocking=False)
+                if hedge is None:
+                    # Every worker is busy: wait for the first attempt alone
+                    hedge_after = None
+                    continue
+                self._count("hedged")
+                futures[hedge] = True
+                pending.add(hedge)
+                continue
+            for future in futures:
+                if not future.cancel() and not future.done():
+                    # Still running: it keeps its worker until it returns
+                    self._count("abandoned")
+            raise TimeoutError(f"{self.stage} LLM call timed out after {timeout:.2f}s")
+        raise error
+
+    def invoke(self, prompt):
+        self._count("calls")
+        deadline = stage_deadline(self.stage)
+        error = TimeoutError(f"{self.stage} LLM budget exhausted")
+        for attempt in range(self.retries + 1):
+            timeout = self._attempt_timeout(deadline)
+            if timeout is not None and timeout <= 0:
+                break
+            self._count("attempts")
+            try:
+                return self._attempt(prompt, timeout)
+            except Exception as e:
+                error = e
+                self._failed(e)
+            delay = self._backoff(attempt)
+            if not is_transient(error) or attempt == self.retries or (
+                deadline is not None and time.monotonic() + delay >= deadline
+            ):
+                break
+            self._count("retries")
+            time.sleep(delay)
+        self._give_up(error)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        delay = self.hedge_delay()
+        stats["hedge_after_ms"] = None if delay is None else round(delay * 1000, 1)
+        stats["timeout_ms"] = None if self.timeout is None else round(self.timeout * 1000)
+        return stats
@@ -1,20 +1,47 @@
 from langchain_anthropic import ChatAnthropic
 import os
 
+from src.rag.bm25 import BM25Index
+from src.rag.llm_cache import cached_llm
+from src.rag.tracing import get_tracer, record_llm_usage
+
 class PlainRAGProcessor:
-    def __init__(self, schema_text: str):
+    def __init__(self, schema_text: str = None, llm_cache=None, index_path=None, top_k=None,
+                 token_budget=None, tracer=None, schema_file=None):
         self.schema_text = schema_text
+        # Only the best-matching schema chunks go into the prompt, not the whole schema.
+        # BM25 indexes are kept under PLAIN_RAG_INDEX_PATH, one per schema (text or
+        # file) and chunk size; a schema file is only read again when its hash changes.
+        if index_path is None:
+            index_path = os.getenv("PLAIN_RAG_INDEX_PATH", "data/plain_rag_index") or None
+        chunk_tokens = int(os.getenv("PLAIN_RAG_CHUNK_TOKENS", "200"))
+        if schema_file is not None:
+            self.index = BM25Index.for_schema_file(schema_file, index_path, chunk_tokens)
+        else:
+            self.index = BM25Index.for_schema_text(schema_text, index_path, chunk_tokens)
+        self.top_k = top_k or int(os.getenv("PLAIN_RAG_TOP_K", "8"))
+        self.token_budget = token_budget or int(os.getenv("PLAIN_RAG_TOKEN_BUDGET", "1500"))
         self.llm = ChatAnthropic(
             model="claude-sonnet-4-20250514",
             max_tokens=1000
         )
+        # The retrieved chunks are part of the prompt, so a schema change changes the key
+        self.answer_llm = cached_llm(self.llm, "plain_answers", cache=llm_cache)
+        self.tracer = tracer or get_tracer()
 
-    def process(self, query: str):
-        prompt = f"""
+    def retrieve(self, query: str):
+        """Top-k BM25 chunks of the schema text within the token budget"""
+        return self.index.top_chunks(query, self.top_k, self.token_budget)
+
+    def _prompt(self, query: str, chunks=None):
+        if chunks is None:
+            chunks = self.retrieve(query)
+        schema_docs = "\n\n".join(chunks)
+        return f"""
 You are an SAP HANA expert.
 
 Schema documentation:
-{self.schema_text}
+{schema_docs}
 
 Question:
 {query}
@@ -22,7 +49,31 @@ Question:
 Answer concisely.
 If you are unsure, say so.
 """
-        response = self.llm.invoke(prompt)
+
+    def _retrieve_prompt(self, query, trace):
+        with trace.span("retrieve") as span:
+            chunks = self.retrieve(query)
+            span["chunks"] = len(chunks)
+        return self._prompt(query, chunks)
+
+    def process(self, query: str):
+        with self.tracer.trace("plain_rag", query) as trace:
+            prompt = self._retrieve_prompt(query, trace)
+            with trace.span("generate"):
+                response = self.answer_llm.invoke(prompt)
+                record_llm_usage(prompt, response)
+        return {
+            "answer": response.content,
+            "timings": trace.as_dict()
+        }
+
+    async def aprocess(self, query: str):
+        with self.tracer.trace("plain_rag", query) as trace:
+            prompt = self._retrieve_prompt(query, trace)
+            with trace.span("generate"):
+                response = await self.answer_llm.ainvoke(prompt)
+                record_llm_usage(prompt, response)
         return {
-            "answer": response.content
+            "answer": response.content,
+            "timings": trace.as_dict()
         }
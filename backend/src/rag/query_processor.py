@@ -1,53 +1,653 @@
 from langchain_anthropic import ChatAnthropic
-from neo4j import GraphDatabase
+from langchain_core.messages import AIMessage
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import json
-import re
+import logging
+import os
+import threading
+import time
+
+from src.graph.backends import create_graph_backend
+from src.graph.reachability import sync_reachability
+from src.graph.subgraph_cache import SubgraphCache, subgraph_key
+from src.rag.admission import Admission
+from src.rag.context_builder import ContextBuilder, path_tables
+from src.rag.entity_extractor import LexicalEntityExtractor
+from src.rag.llm_cache import cached_llm
+from src.rag.llm_resilience import ResilientLLM, budget_deadline, budget_until, latency_budget
+from src.rag.retrieval_plan import plan_for
+from src.rag.single_flight import SingleFlight
+from src.rag.tracing import get_tracer, record_llm_usage
+from src.rag.vector_index import get_embedder, sync_index
+
+logger = logging.getLogger(__name__)
+
+
+def parse_entities(raw):
+    """Decode the first JSON object in an LLM reply (```json fences and trailing text are fine)"""
+    start = raw.find("{")
+    if start == -1:
+        raise ValueError(f"LLM did not return JSON:\n{raw}")
+    try:
+        entities, _ = json.JSONDecoder().raw_decode(raw, start)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"LLM did not return valid JSON ({e}):\n{raw}")
+    return entities
+
+
+def merge_records(records, extra):
+    """Append records from `extra` whose edge is not already in `records`"""
+    seen = {
+        (rec['t1'].get('name'), rec['r'].get('via'), rec['t2'].get('name')) for rec in records
+    }
+    merged = list(records)
+    for rec in extra:
+        key = (rec['t1'].get('name'), rec['r'].get('via'), rec['t2'].get('name'))
+        if key not in seen:
+            seen.add(key)
+            merged.append(rec)
+    return merged
+
+
+def carve_subgraph(records, table_names, direction="both"):
+    """Records of a shared 1-hop retrieval that touch any of `table_names`.
+
+    direction="out" keeps edges from those tables, "in" edges into them.
+    """
+    names = set(table_names)
+    return [
+        rec for rec in records
+        if (direction != "in" and rec['t1'].get('name') in names)
+        or (direction != "out" and rec['t2'].get('name') in names)
+    ]
+
+
+class Speculation:
+    """A subgraph prefetched for the lexical guess while the LLM extracts entities"""
+
+    def __init__(self, guess):
+        self.guess = guess
+        self.records = None
+        self.prefetch_ms = 0.0
+        self.llm_ms = 0.0
+        self.outcome = None
+        self.saved_ms = 0.0
+
+    def settle(self, outcome):
+        """Record whether the prefetch was used; its time counts as saved only if it was"""
+        self.outcome = outcome
+        if outcome != "miss":
+            self.saved_ms = round(min(self.prefetch_ms, self.llm_ms), 2)
 
 
 class GraphRAGProcessor:
-    def __init__(self, neo4j_uri, neo4j_user, neo4j_password, anthropic_api_key):
-        self.graph_driver = GraphDatabase.driver(neo4j_uri, auth=(neo4j_user, neo4j_password))
+    def __init__(self, neo4j_uri, neo4j_user, neo4j_password, anthropic_api_key, graph_backend=None,
+                 retrieval_hops=None, max_nodes=None, join_path_hops=None, llm_cache=None,
+                 lexical_min_confidence=None, batch_concurrency=None, subgraph_cache=None,
+                 context_token_budget=None, embedder=None, vector_seeds=None, tracer=None,
+                 impact_max_hops=None, speculative=None, admission=None, latency_budget_ms=None):
+        # GRAPH_BACKEND=neo4j|embedded selects where the schema graph is served from
+        self.graph = graph_backend or create_graph_backend(neo4j_uri, neo4j_user, neo4j_password)
+        # 1 hop keeps the original direct-neighbour retrieval
+        self.retrieval_hops = retrieval_hops or int(os.getenv("RETRIEVAL_HOPS", "1"))
+        self.max_nodes = max_nodes or int(os.getenv("RETRIEVAL_MAX_NODES", "50"))
+        self.join_path_hops = join_path_hops or int(os.getenv("JOIN_PATH_MAX_HOPS", "4"))
+        # Lexical extraction answers first; the LLM is asked only below this confidence.
+        # LEXICAL_MIN_CONFIDENCE above 1 sends every query to the LLM.
+        self.lexical_min_confidence = lexical_min_confidence or float(
+            os.getenv("LEXICAL_MIN_CONFIDENCE", "0.7")
+        )
+        # LLM calls in flight at once in process_batch
+        self.batch_concurrency = batch_concurrency or int(os.getenv("BATCH_CONCURRENCY", "8"))
+        # Retrieved subgraphs, dropped when the schema version moves; SUBGRAPH_CACHE_SIZE=0 disables
+        cache_size = int(os.getenv("SUBGRAPH_CACHE_SIZE", "512"))
+        if subgraph_cache is None and cache_size > 0:
+            subgraph_cache = SubgraphCache(cache_size)
+        self.subgraph_cache = subgraph_cache
+        # CONTEXT_TOKEN_BUDGET bounds the schema context sent with each question
+        self.context_builder = ContextBuilder(context_token_budget)
+        # Per-stage timings and token counts, exported on the API's /metrics
+        self.tracer = tracer or get_tracer()
+        # Concurrent misses for the same subgraph share one backend lookup
+        self.subgraph_flight = SingleFlight("subgraph", self.tracer.singleflight_calls)
+        # Concurrency limits and bounded wait queues for the async LLM and graph stages
+        self.admission = admission or Admission(tracer=self.tracer)
+        # Tables retrieved besides the extracted ones, from the description vector index;
+        # opt-in (VECTOR_SEEDS=0 disables)
+        self.vector_seeds = int(os.getenv("VECTOR_SEEDS", "0")) if vector_seeds is None \
+            else vector_seeds
+        self.vector_min_score = float(os.getenv("VECTOR_MIN_SCORE", "0.35"))
+        self.vector_index_path = os.getenv("VECTOR_INDEX_PATH", "data/vector_index") or None
+        self._embedder = embedder
+        # Impact questions get the exact transitive set of referencing tables;
+        # IMPACT_MAX_HOPS=0 (default) follows references all the way
+        self.impact_max_hops = int(os.getenv("IMPACT_MAX_HOPS", "0")) if impact_max_hops is None \
+            else impact_max_hops
+        self.impact_max_tables = int(os.getenv("IMPACT_MAX_TABLES", "50"))
+        self._reachability = None
+        # While the LLM extracts entities, prefetch the subgraph of the lexical guess
+        # (SPECULATIVE_RETRIEVAL=0 disables)
+        self.speculative = os.getenv("SPECULATIVE_RETRIEVAL", "1") == "1" if speculative is None \
+            else speculative
+        self._speculation_executor = None
+        # LLM time allowed per query, split between extraction and the answer; 0 = unbounded
+        self.latency_budget_ms = float(os.getenv("LLM_LATENCY_BUDGET_MS", "0")) \
+            if latency_budget_ms is None else latency_budget_ms
+        self._reachability_lock = threading.Lock()
+        self._vector_index = None
+        self._vector_lock = threading.Lock()
+        self._lexical = None
+        self._lexical_lock = threading.Lock()
+        self._lexical_refresh = None
+        self._tier_lock = threading.Lock()
+        self.extraction_tiers = Counter()
         self.llm = ChatAnthropic(
             model="claude-sonnet-4-20250514",
             # api_key=anthropic_api_key,
             max_tokens=2000
         )
+        # EXTRACTION_MODEL puts entity extraction on a cheaper, faster model
+        extraction_model = os.getenv("EXTRACTION_MODEL")
+        extraction_llm = ChatAnthropic(model=extraction_model, max_tokens=500) \
+            if extraction_model else self.llm
+        # Deadlines, retries and hedged duplicates for slow calls, per stage; each
+        # async attempt takes its own LLM admission slot
+        llm_limiter = self.admission.stages["llm"]
+        self.llm_stages = {
+            "extract": ResilientLLM(extraction_llm, "extract", tracer=self.tracer,
+                                    limiter=llm_limiter),
+            "generate": ResilientLLM(self.llm, "generate", tracer=self.tracer,
+                                     limiter=llm_limiter),
+        }
+        # Extractions don't depend on the graph; answers are dropped when the schema version moves
+        self.entity_llm = cached_llm(self.llm_stages["extract"], "entities", cache=llm_cache)
+        self.answer_llm = cached_llm(
+            self.llm_stages["generate"], "answers", version=self.graph.schema_version,
+            cache=llm_cache,
+        )
     
-    def extract_entities(self, query):
-        """Use LLM to extract table names and entities from query"""
-        prompt = f"""
+    def close(self):
+        """Stop the speculative prefetch threads and close the graph backend"""
+        with self._tier_lock:
+            executor, self._speculation_executor = self._speculation_executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        self.graph.close()
+    
+    def _extraction_prompt(self, query):
+        return f"""
         Extract SAP table names and entities from this query: "{query}"
         
         Return as JSON:
         {{
             "tables": ["TABLE1", "TABLE2"],
             "entities": ["customer", "order"],
-            "intent": "relationship|impact|data_flow"
+            "intent": "entity_lookup|field_listing|relationship|impact|data_flow|join_check"
         }}
         """
-        
-        response = self.llm.invoke(prompt)
+    
+    def extract_entities(self, query):
+        """Use LLM to extract table names and entities from query"""
+        prompt = self._extraction_prompt(query)
+        response = self.entity_llm.invoke(prompt)
+        record_llm_usage(prompt, response)
         # Parse JSON from response
         return response.content
     
+    async def aextract_entities(self, query):
+        prompt = self._extraction_prompt(query)
+        response = await self.entity_llm.ainvoke(prompt)
+        record_llm_usage(prompt, response)
+        return response.content
+    
+    def lexical_extractor(self):
+        """Extractor built from the graph (the API builds it at startup).
+
+        When the schema version moves, the new extractor is built on a
+        background thread and the current one keeps serving until it is ready.
+        """
+        lexical = self._lexical
+        if lexical is None:
+            with self._lexical_lock:
+                if self._lexical is None:
+                    self._lexical = LexicalEntityExtractor.from_backend(self.graph)
+                return self._lexical
+        if lexical.schema_version != self.graph.schema_version():
+            self._refresh_lexical()
+        return lexical
+    
+    async def alexical_extractor(self):
+        lexical = self._lexical
+        if lexical is None:
+            # The first build reads the whole schema; keep it off the event loop
+            return await asyncio.to_thread(self.lexical_extractor)
+        if lexical.schema_version != await self.graph.aschema_version():
+            self._refresh_lexical()
+        return lexical
+    
+    def _refresh_lexical(self):
+        with self._lexical_lock:
+            if self._lexical_refresh is not None and self._lexical_refresh.is_alive():
+                return
+            self._lexical_refresh = threading.Thread(
+                target=self._rebuild_lexical, name="lexical-refresh", daemon=True
+            )
+            self._lexical_refresh.start()
+    
+    def _rebuild_lexical(self):
+        try:
+            lexical = LexicalEntityExtractor.from_backend(self.graph)
+        except Exception:
+            logger.warning("lexical extractor refresh failed; keeping the current one",
+                           exc_info=True)
+            return
+        self._lexical = lexical
+        logger.info("lexical extractor rebuilt for schema version %s", lexical.schema_version)
+    
+    def vector_index(self):
+        """Description index, refreshed incrementally when the schema version changes"""
+        version = self.graph.schema_version()
+        with self._vector_lock:
+            if self._embedder is None:
+                self._embedder = get_embedder()
+            index = self._vector_index
+            if index is None or index.schema_version != version:
+                self._vector_index = sync_index(
+                    self.graph, self._embedder, self.vector_index_path, current=index
+                )
+            return self._vector_index
+    
+    def seed_entities(self, query, entities):
+        """Hybrid seeding: the tables closest to the query in the vector index, as "seed_tables".
+
+        Seeds widen the retrieved neighbourhood only; "tables" keeps the
+        extracted ones, which alone are joined and asked about.
+        """
+        if self.vector_seeds <= 0:
+            return entities
+        index = self.vector_index()
+        tables = entities.get('tables', [])
+        hits = index.search_tables(
+            query, self._embedder, k=self.vector_seeds + len(tables),
+            min_score=self.vector_min_score,
+        )
+        extra = [t for t in hits if t not in tables][:self.vector_seeds]
+        if not extra:
+            return entities
+        return {**entities, "seed_tables": extra}
+    
+    async def aseed_entities(self, query, entities):
+        if self.vector_seeds <= 0:
+            return entities
+        # Embedding the query (and any index refresh) is CPU work
+        return await asyncio.to_thread(self.seed_entities, query, entities)
+    
+    def reachability(self):
+        """Reachability index, updated incrementally when the schema version changes"""
+        version = self.graph.schema_version()
+        with self._reachability_lock:
+            index = self._reachability
+            if index is None or index.schema_version != version:
+                self._reachability = sync_reachability(self.graph, current=index)
+            return self._reachability
+    
+    async def areachability(self):
+        version = await self.graph.aschema_version()
+        index = self._reachability
+        if index is not None and index.schema_version == version:
+            return index
+        return await asyncio.to_thread(self.reachability)
+    
+    def _impact_tables(self, entities):
+        if not self.plan(entities).impact:
+            return []
+        return entities.get('tables', [])
+    
+    def _impact(self, index, tables):
+        return index.impact(
+            tables, max_hops=self.impact_max_hops or None, max_tables=self.impact_max_tables
+        )
+    
+    def impact_sets(self, entities):
+        """Exact downstream tables of each extracted table, for impact questions"""
+        tables = self._impact_tables(entities)
+        return self._impact(self.reachability(), tables) if tables else []
+    
+    async def aimpact_sets(self, entities):
+        tables = self._impact_tables(entities)
+        return self._impact(await self.areachability(), tables) if tables else []
+    
+    def _lexical_guess(self, extractor, query):
+        """(entities, confident) from the lexical tier; entities is None without an extractor"""
+        if extractor is None:
+            return None, False
+        entities, confidence = extractor.extract(query)
+        return entities, confidence >= self.lexical_min_confidence
+    
+    def _count_tier(self, tier):
+        with self._tier_lock:
+            self.extraction_tiers[tier] += 1
+    
+    def resolve_entities(self, query):
+        """Entities from the lexical tier when it is confident, else from the LLM.
+
+        Returns (entities, tier) with tier "lexical" or "llm", or
+        "lexical_fallback" when the LLM ran out of time and the low-confidence
+        lexical guess was used instead.
+        """
+        extractor = self.lexical_extractor() if self.lexical_min_confidence <= 1 else None
+        guess, confident = self._lexical_guess(extractor, query)
+        if confident:
+            entities, tier = guess, "lexical"
+        else:
+            try:
+                entities, tier = parse_entities(self.extract_entities(query)), "llm"
+            except TimeoutError:
+                if guess is None:
+                    raise
+                entities, tier = guess, "lexical_fallback"
+        self._count_tier(tier)
+        return entities, tier
+    
+    async def aresolve_entities(self, query):
+        extractor = await self.alexical_extractor() if self.lexical_min_confidence <= 1 else None
+        guess, confident = self._lexical_guess(extractor, query)
+        if confident:
+            entities, tier = guess, "lexical"
+        else:
+            try:
+                entities, tier = parse_entities(await self.aextract_entities(query)), "llm"
+            except TimeoutError:
+                if guess is None:
+                    raise
+                entities, tier = guess, "lexical_fallback"
+        self._count_tier(tier)
+        return entities, tier
+    
+    def _speculation(self, guess):
+        if not self.speculative or not guess or not guess.get('tables'):
+            return None
+        if self.plan(guess).hops(self.retrieval_hops) == 0:
+            return None
+        return Speculation(guess)
+    
+    def _speculation_pool(self):
+        with self._tier_lock:
+            if self._speculation_executor is None:
+                self._speculation_executor = ThreadPoolExecutor(
+                    max_workers=self.batch_concurrency, thread_name_prefix="speculative-retrieval"
+                )
+            return self._speculation_executor
+    
+    def _prefetch(self, speculation):
+        t0 = time.perf_counter()
+        speculation.records = self.retrieve_subgraph(speculation.guess)
+        speculation.prefetch_ms = (time.perf_counter() - t0) * 1000
+    
+    async def _aprefetch(self, speculation):
+        t0 = time.perf_counter()
+        async with self.admission.slot("graph"):
+            speculation.records = await self.aretrieve_subgraph(speculation.guess)
+        speculation.prefetch_ms = (time.perf_counter() - t0) * 1000
+    
+    def resolve_entities_speculative(self, query):
+        """resolve_entities() that prefetches the subgraph of the lexical guess while the LLM runs.
+
+        Returns (entities, tier, speculation); speculation is None unless the
+        LLM tier ran and the lexical tier had a guess with tables to retrieve.
+        """
+        extractor = self.lexical_extractor() if self.lexical_min_confidence <= 1 else None
+        guess, confident = self._lexical_guess(extractor, query)
+        if confident:
+            self._count_tier("lexical")
+            return guess, "lexical", None
+        
+        speculation = self._speculation(guess)
+        future = self._speculation_pool().submit(self._prefetch, speculation) \
+            if speculation is not None else None
+        t0 = time.perf_counter()
+        try:
+            entities, tier = parse_entities(self.extract_entities(query)), "llm"
+        except BaseException as e:
+            if guess is None or not isinstance(e, TimeoutError):
+                if future is not None:
+                    future.cancel()
+                raise
+            # Out of LLM time: go on with the low-confidence lexical guess
+            entities, tier = guess, "lexical_fallback"
+        self._count_tier(tier)
+        if future is not None:
+            speculation.llm_ms = (time.perf_counter() - t0) * 1000
+            try:
+                future.result()
+            except Exception:
+                # No records: the speculation settles as a miss and retrieval runs normally
+                speculation.records = None
+                logger.warning("speculative prefetch failed; retrieving normally", exc_info=True)
+        return entities, tier, speculation
+    
+    async def aresolve_entities_speculative(self, query):
+        extractor = await self.alexical_extractor() if self.lexical_min_confidence <= 1 else None
+        guess, confident = self._lexical_guess(extractor, query)
+        if confident:
+            self._count_tier("lexical")
+            return guess, "lexical", None
+        
+        speculation = self._speculation(guess)
+        task = asyncio.create_task(self._aprefetch(speculation)) \
+            if speculation is not None else None
+        t0 = time.perf_counter()
+        try:
+            entities, tier = parse_entities(await self.aextract_entities(query)), "llm"
+        except BaseException as e:
+            if guess is None or not isinstance(e, TimeoutError):
+                if task is not None:
+                    task.cancel()
+                raise
+            entities, tier = guess, "lexical_fallback"
+        self._count_tier(tier)
+        if task is not None:
+            speculation.llm_ms = (time.perf_counter() - t0) * 1000
+            try:
+                await task
+            except Exception:
+                # No records: the speculation settles as a miss and retrieval runs normally
+                speculation.records = None
+                logger.warning("speculative prefetch failed; retrieving normally", exc_info=True)
+        return entities, tier, speculation
+    
+    def _reconcile(self, entities, speculation):
+        """(prefetched records still valid, tables still to fetch), or None if the guess is unusable
+        or its prefetch failed"""
+        plan = self.plan(entities)
+        if speculation.records is None or plan is not self.plan(speculation.guess):
+            return None
+        tables = self.retrieval_tables(entities)
+        guessed = set(speculation.guess.get('tables', []))
+        if set(tables) == guessed:
+            return speculation.records, []
+        common = [t for t in tables if t in guessed]
+        # A multi-hop neighbourhood cannot be split per table
+        if not common or plan.hops(self.retrieval_hops) != 1:
+            return None
+        return (
+            carve_subgraph(speculation.records, common, plan.direction),
+            [t for t in tables if t not in guessed],
+        )
+    
+    def retrieve_speculative(self, entities, speculation):
+        """retrieve_subgraph() reusing the prefetch; only tables the guess missed are fetched"""
+        reconciled = self._reconcile(entities, speculation)
+        if reconciled is None:
+            speculation.settle("miss")
+            return self.retrieve_subgraph(entities)
+        records, missing = reconciled
+        speculation.settle("partial" if missing else "hit")
+        if missing:
+            records = merge_records(records, self.retrieve_subgraph(
+                {**entities, "tables": missing, "seed_tables": []}
+            ))
+        return records
+    
+    async def aretrieve_speculative(self, entities, speculation):
+        reconciled = self._reconcile(entities, speculation)
+        if reconciled is None:
+            speculation.settle("miss")
+            return await self.aretrieve_subgraph(entities)
+        records, missing = reconciled
+        speculation.settle("partial" if missing else "hit")
+        if missing:
+            extra = await self.aretrieve_subgraph(
+                {**entities, "tables": missing, "seed_tables": []}
+            )
+            records = merge_records(records, extra)
+        return records
+    
+    def _subgraph_version(self):
+        """Current schema version; on a change, drop cached subgraphs of changed tables"""
+        version = self.graph.schema_version()
+        cache = self.subgraph_cache
+        if cache is not None and cache.version is not None and cache.version != version:
+            cache.advance(version, self.graph.changed_tables(cache.version, version))
+        return version
+    
+    async def _asubgraph_version(self):
+        version = await self.graph.aschema_version()
+        cache = self.subgraph_cache
+        if cache is not None and cache.version is not None and cache.version != version:
+            cache.advance(version, await self.graph.achanged_tables(cache.version, version))
+        return version
+    
+    def retrieval_tables(self, entities):
+        """Tables whose neighbourhood is retrieved: the extracted ones, then the vector seeds"""
+        return list(dict.fromkeys(entities.get('tables', []) + entities.get('seed_tables', [])))
+    
+    def plan(self, entities):
+        """Retrieval plan for the extracted intent (see src.rag.retrieval_plan)"""
+        return plan_for(entities.get('intent'))
+    
+    def _subgraph_key(self, tables, plan):
+        return subgraph_key(tables, plan.hops(self.retrieval_hops), plan.direction)
+    
+    def _cached_subgraph(self, tables, plan, version):
+        if self.subgraph_cache is None:
+            return None
+        return self.subgraph_cache.get(self._subgraph_key(tables, plan), version)
+    
+    def _store_subgraph(self, tables, plan, records, version):
+        if self.subgraph_cache is not None:
+            self.subgraph_cache.set(self._subgraph_key(tables, plan), records, version)
+    
     def retrieve_subgraph(self, entities):
-        """Query Neo4j for relevant subgraph"""
-        with self.graph_driver.session() as session:
-            # Example: Get all tables and their relationships
-            result = session.run("""
-                MATCH (t1:Table)-[r:RELATES_TO]->(t2:Table)
-                WHERE t1.name IN $table_names OR t2.name IN $table_names
-                RETURN t1, r, t2
-            """, table_names=entities['tables'])
-            
-            return [record.data() for record in result]
+        """Query the graph backend for the subgraph the intent's plan needs, through the cache.
+
+        Concurrent misses for the same subgraph share one lookup.
+        """
+        tables = self.retrieval_tables(entities)
+        plan = self.plan(entities)
+        hops = plan.hops(self.retrieval_hops)
+        if hops == 0:
+            return []
+        version = self._subgraph_version()
+        records = self._cached_subgraph(tables, plan, version)
+        if records is not None:
+            return records
+        
+        def fetch():
+            if hops == 1:
+                records = self.graph.retrieve_subgraph(tables, direction=plan.direction)
+            else:
+                records = self.graph.retrieve_khop(
+                    tables, max_hops=hops, max_nodes=self.max_nodes
+                )
+            self._store_subgraph(tables, plan, records, version)
+            return records
+        
+        records, _ = self.subgraph_flight.do((self._subgraph_key(tables, plan), version), fetch)
+        return records
     
-    def generate_response(self, query, graph_context):
-        """Use LLM to reason over graph and generate answer"""
+    async def aretrieve_subgraph(self, entities):
+        tables = self.retrieval_tables(entities)
+        plan = self.plan(entities)
+        hops = plan.hops(self.retrieval_hops)
+        if hops == 0:
+            return []
+        version = await self._asubgraph_version()
+        records = self._cached_subgraph(tables, plan, version)
+        if records is not None:
+            return records
         
-        context = self._format_graph_context(graph_context)
+        async def fetch():
+            if hops == 1:
+                records = await self.graph.aretrieve_subgraph(tables, direction=plan.direction)
+            else:
+                records = await self.graph.aretrieve_khop(
+                    tables, max_hops=hops, max_nodes=self.max_nodes
+                )
+            self._store_subgraph(tables, plan, records, version)
+            return records
         
-        prompt = f"""
+        records, _ = await self.subgraph_flight.ado(
+            (self._subgraph_key(tables, plan), version), fetch
+        )
+        return records
+    
+    def _batch_cache_lookup(self, entities, version):
+        """Subgraph per query from the cache and the tables the shared 1-hop lookup still needs.
+
+        Misses are None; so are multi-hop plans, which are retrieved one by one.
+        """
+        subgraphs, missing = [], []
+        for e in entities:
+            plan = self.plan(e)
+            hops = plan.hops(self.retrieval_hops)
+            subgraph = [] if hops == 0 else None
+            if hops == 1:
+                tables = self.retrieval_tables(e)
+                subgraph = self._cached_subgraph(tables, plan, version)
+                if subgraph is None:
+                    missing.extend(tables)
+            subgraphs.append(subgraph)
+        return subgraphs, list(dict.fromkeys(missing))
+    
+    def _batch_cache_fill(self, entities, subgraphs, shared, version):
+        """Carve each missing 1-hop subgraph out of the shared lookup and cache it"""
+        filled = []
+        for e, subgraph in zip(entities, subgraphs):
+            plan = self.plan(e)
+            if subgraph is None and plan.hops(self.retrieval_hops) == 1:
+                tables = self.retrieval_tables(e)
+                subgraph = carve_subgraph(shared, tables, plan.direction)
+                self._store_subgraph(tables, plan, subgraph, version)
+            filled.append(subgraph)
+        return filled
+    
+    def find_join_paths(self, entities):
+        """Shortest join paths between each pair of extracted tables, with their edge records"""
+        tables = entities.get('tables', [])
+        if len(tables) < 2 or not self.plan(entities).join_paths:
+            return [], []
+        return self.graph.find_join_paths(tables, max_hops=self.join_path_hops)
+    
+    async def afind_join_paths(self, entities):
+        tables = entities.get('tables', [])
+        if len(tables) < 2 or not self.plan(entities).join_paths:
+            return [], []
+        return await self.graph.afind_join_paths(tables, max_hops=self.join_path_hops)
+    
+    def context_tables(self, entities, join_paths):
+        """Tables whose fields go into the context: the extracted and seeded ones and those on
+        join paths"""
+        return list(dict.fromkeys(self.retrieval_tables(entities) + path_tables(join_paths)))
+    
+    def build_context(self, entities, graph_context, join_paths=None, fields=None, impact=None):
+        """Token-budgeted schema context for the answer prompt; returns (text, report)"""
+        return self.context_builder.build(entities, graph_context, join_paths, fields, impact)
+    
+    def _answer_prompt(self, query, context):
+        return f"""
         You are an SAP HANA expert. Answer this question using the schema information provided.
         
         Question: {query}
@@ -61,47 +661,376 @@ class GraphRAGProcessor:
         3. Relationship explanations
         4. Field-level details
         """
-        
-        response = self.llm.invoke(prompt)
+    
+    def generate_response(self, query, context):
+        """Use LLM to reason over the schema context and generate answer"""
+        prompt = self._answer_prompt(query, context)
+        response = self.answer_llm.invoke(prompt)
+        record_llm_usage(prompt, response)
         return response.content
     
-    def _format_graph_context(self, graph_data):
-        """Format graph data into readable context for LLM"""
-        formatted = []
-        for record in graph_data:
-            t1 = record.get('t1', {})
-            r = record.get('r', {})
-            t2 = record.get('t2', {})
-            formatted.append(
-                f"Table: {t1.get('name')} ({t1.get('description')})\\n"
-                f"  → Related to: {t2.get('name')} via {r.get('via')}\\n"
-                f"  Relationship: {r.get('description')}\\n"
-            )
-        return "\\n".join(formatted)
+    async def agenerate_response(self, query, context):
+        prompt = self._answer_prompt(query, context)
+        response = await self.answer_llm.ainvoke(prompt)
+        record_llm_usage(prompt, response)
+        return response.content
+    
+    def _result(self, query, entities, tier, retrieved, context, answer, trace=None):
+        graph_context, join_paths, fields, impact = retrieved
+        result = {
+            "query": query,
+            "entities": entities,
+            "extraction_tier": tier,
+            "graph_context": graph_context,
+            "join_paths": join_paths,
+            "fields": fields,
+            "impact": impact,
+            "context_report": context[1],
+            "answer": answer
+        }
+        if trace is not None:
+            result["timings"] = trace.as_dict()
+        return result
+    
+    def _retrieve(self, entities, speculation=None):
+        if speculation is None:
+            graph_context = self.retrieve_subgraph(entities)
+        else:
+            graph_context = self.retrieve_speculative(entities, speculation)
+        join_paths, path_records = self.find_join_paths(entities)
+        records = merge_records(graph_context, path_records)
+        fields = self.graph.table_fields(
+            self.context_tables(entities, join_paths),
+            self.plan(entities).join_fields(records, join_paths),
+        )
+        impact = self.impact_sets(entities)
+        return records, join_paths, fields, impact
     
     def process(self, query):
-        """Main pipeline"""
-        # 1. Extract entities from query
-
-        raw = self.extract_entities(query)
-
-        # 1. Extract JSON from ```json ... ``` if present
-        match = re.search(r"\{.*\}", raw, re.DOTALL)
-        if not match:
-            raise ValueError(f"LLM did not return JSON:\n{raw}")
-
-        entities = json.loads(match.group())
+        """Main pipeline; the result's "timings" break its latency down by stage"""
+        with self.tracer.trace("graph_rag", query) as trace, \
+                latency_budget(self.latency_budget_ms):
+            # 1. Extract entities from query (lexical tier first, LLM fallback)
+            # While the LLM runs, the lexical guess's subgraph is prefetched
+            with trace.span("extract") as span:
+                entities, tier, speculation = self.resolve_entities_speculative(query)
+                span["tier"] = tier
+            with trace.span("seed"):
+                entities = self.seed_entities(query, entities)
+            
+            # 2. Retrieve relevant subgraph, the edges joining the extracted tables and their fields
+            with trace.span("retrieve") as span:
+                retrieved = self._retrieve(entities, speculation)
+                self._retrieval_attrs(span, entities, retrieved, speculation)
+            
+            # 3. Pack them into the token budget and generate response
+            with trace.span("context") as span:
+                context = self.build_context(entities, *retrieved)
+                span["context_tokens"] = context[1]["tokens"]
+            with trace.span("generate"):
+                answer = self.generate_response(query, context[0])
+        
+        return self._result(query, entities, tier, retrieved, context, answer, trace)
+    
+    def _retrieval_attrs(self, span, entities, retrieved, speculation=None):
+        graph_context, join_paths, fields, impact = retrieved
+        span["plan"] = self.plan(entities).intent
+        span["edges"] = len(graph_context)
+        span["join_paths"] = len(join_paths)
+        span["fields"] = len(fields)
+        if impact:
+            span["impacted_tables"] = sum(entry['total'] for entry in impact)
+        if speculation is not None:
+            span["speculation"] = speculation.outcome
+            span["saved_ms"] = speculation.saved_ms
+    
+    async def _aretrieve(self, entities, speculation=None):
+        async with self.admission.slot("graph"):
+            # The neighbourhood and the join paths are independent lookups
+            graph_context, (join_paths, path_records) = await asyncio.gather(
+                self.aretrieve_subgraph(entities) if speculation is None
+                else self.aretrieve_speculative(entities, speculation),
+                self.afind_join_paths(entities),
+            )
+            records = merge_records(graph_context, path_records)
+            fields = await self.graph.atable_fields(
+                self.context_tables(entities, join_paths),
+                self.plan(entities).join_fields(records, join_paths),
+            )
+            impact = await self.aimpact_sets(entities)
+        # Refresh the schema version off the loop before the answer cache reads it
+        await self.graph.aschema_version()
+        return records, join_paths, fields, impact
+    
+    async def aprocess(self, query):
+        """Main pipeline on the async Neo4j driver and ainvoke; never blocks the event loop"""
+        with self.tracer.trace("graph_rag", query) as trace, \
+                latency_budget(self.latency_budget_ms):
+            with trace.span("extract") as span:
+                entities, tier, speculation = await self.aresolve_entities_speculative(query)
+                span["tier"] = tier
+            with trace.span("seed"):
+                entities = await self.aseed_entities(query, entities)
+            with trace.span("retrieve") as span:
+                retrieved = await self._aretrieve(entities, speculation)
+                self._retrieval_attrs(span, entities, retrieved, speculation)
+            with trace.span("context") as span:
+                context = self.build_context(entities, *retrieved)
+                span["context_tokens"] = context[1]["tokens"]
+            with trace.span("generate"):
+                answer = await self.agenerate_response(query, context[0])
+        return self._result(query, entities, tier, retrieved, context, answer, trace)
+    
+    def _batch_retrieved(self, entities, subgraphs, join_results, fields, index):
+        """Per-query (graph_context, join_paths, fields, impact) from the batch's shared lookups"""
+        retrieved = []
+        for e, subgraph, (join_paths, path_records) in zip(entities, subgraphs, join_results):
+            tables = set(self.context_tables(e, join_paths))
+            records = merge_records(subgraph, path_records)
+            join_fields = self.plan(e).join_fields(records, join_paths)
+            impact_tables = self._impact_tables(e)
+            retrieved.append((
+                records,
+                join_paths,
+                [
+                    f for f in fields if f['table'] in tables
+                    and (join_fields is None or f.get('is_key') or f['name'] in join_fields)
+                ],
+                self._impact(index, impact_tables) if impact_tables else [],
+            ))
+        return retrieved
+    
+    def _batch_field_tables(self, entities, join_results):
+        tables = [
+            t for e, (join_paths, _) in zip(entities, join_results)
+            for t in self.context_tables(e, join_paths)
+        ]
+        return list(dict.fromkeys(tables))
+    
+    def _batch_results(self, queries, live, resolved, retrieved, answered, errors):
+        """Results in input order; a query that failed gets {"query", "error"} instead"""
+        results = {}
+        for query, error in errors.items():
+            logger.warning("batch query failed: %r", query, exc_info=error)
+            results[query] = {"query": query, "error": str(error) or type(error).__name__}
+        for query, r, done in zip(live, retrieved, answered):
+            if done is not None:
+                entities, tier = resolved[query][:2]
+                results[query] = self._result(query, entities, tier, r, *done)
+        return [results[query] for query in queries]
+    
+    def process_batch(self, queries, concurrency=None):
+        """process() for many queries, returned in input order.
 
+        Duplicate queries run once. Every query with a 1-hop retrieval plan
+        has its subgraph carved out of one lookup over all their extracted
+        tables, and fields come from one lookup over every table the batch needs.
+        Extraction and generation run `concurrency` (BATCH_CONCURRENCY) at a time.
+        A query that fails gets {"query": ..., "error": ...} and the rest carry on;
+        only a failed shared lookup fails the whole batch.
+        """
+        unique = list(dict.fromkeys(queries))
+        errors = {}
         
-        # 2. Retrieve relevant subgraph
-        graph_context = self.retrieve_subgraph(entities)
+        def guarded(fn):
+            def run(query, *args):
+                try:
+                    return fn(query, *args)
+                except Exception as e:
+                    errors[query] = e
+                    return None
+            return run
         
-        # 3. Generate response
-        answer = self.generate_response(query, graph_context)
+        def lookups(query, entities, subgraph):
+            # Multi-hop plans come back from the shared lookup as None
+            if subgraph is None:
+                subgraph = self.retrieve_subgraph(entities)
+            return subgraph, self.find_join_paths(entities)
         
-        return {
-            "query": query,
-            "entities": entities,
-            "graph_context": graph_context,
-            "answer": answer
-        }
\ No newline at end of file
+        def answer(query, entities, retrieved):
+            context = self.build_context(entities, *retrieved)
+            return context, self.generate_response(query, context[0])
+        
+        with ThreadPoolExecutor(max_workers=concurrency or self.batch_concurrency) as pool:
+            resolved = {}
+            for query, found in zip(unique, pool.map(guarded(self.resolve_entities), unique)):
+                if found is not None:
+                    seeded = guarded(self.seed_entities)(query, found[0])
+                    if seeded is not None:
+                        resolved[query] = (seeded, found[1])
+            live = list(resolved)
+            entities = [resolved[query][0] for query in live]
+            
+            version = self._subgraph_version()
+            subgraphs, missing = self._batch_cache_lookup(entities, version)
+            shared = self.graph.retrieve_subgraph(missing) if missing else []
+            subgraphs = self._batch_cache_fill(entities, subgraphs, shared, version)
+            found = list(pool.map(guarded(lookups), live, entities, subgraphs))
+            live = [query for query, f in zip(live, found) if f is not None]
+            entities = [resolved[query][0] for query in live]
+            subgraphs = [f[0] for f in found if f is not None]
+            join_results = [f[1] for f in found if f is not None]
+            fields = self.graph.table_fields(self._batch_field_tables(entities, join_results))
+            index = self.reachability() if any(map(self._impact_tables, entities)) else None
+            retrieved = self._batch_retrieved(entities, subgraphs, join_results, fields, index)
+            
+            answered = list(pool.map(guarded(answer), live, entities, retrieved))
+        return self._batch_results(queries, live, resolved, retrieved, answered, errors)
+    
+    async def aprocess_batch(self, queries, concurrency=None):
+        unique = list(dict.fromkeys(queries))
+        semaphore = asyncio.Semaphore(concurrency or self.batch_concurrency)
+        errors = {}
+        
+        async def bounded(coro):
+            async with semaphore:
+                return await coro
+        
+        async def guarded(query, coro):
+            try:
+                return await coro
+            except Exception as e:
+                errors[query] = e
+                return None
+        
+        async def resolve(query):
+            # Each query's LLM budget starts with its extraction and carries on to its answer
+            with latency_budget(self.latency_budget_ms):
+                entities, tier = await self.aresolve_entities(query)
+                return entities, tier, budget_deadline()
+        
+        async def lookups(entities, subgraph):
+            if subgraph is None:
+                subgraph = await bounded(self.aretrieve_subgraph(entities))
+            return subgraph, await bounded(self.afind_join_paths(entities))
+        
+        async def answer(query, entities, retrieved):
+            context = self.build_context(entities, *retrieved)
+            with budget_until(resolved[query][2]):
+                return context, await self.agenerate_response(query, context[0])
+        
+        extracted = await asyncio.gather(*(guarded(q, bounded(resolve(q))) for q in unique))
+        resolved = {}
+        for query, found in zip(unique, extracted):
+            if found is not None:
+                seeded = await guarded(query, self.aseed_entities(query, found[0]))
+                if seeded is not None:
+                    resolved[query] = (seeded, *found[1:])
+        live = list(resolved)
+        entities = [resolved[query][0] for query in live]
+        
+        # The batch's graph lookups take one graph-stage slot between them
+        async with self.admission.slot("graph"):
+            version = await self._asubgraph_version()
+            subgraphs, missing = self._batch_cache_lookup(entities, version)
+            shared = await self.graph.aretrieve_subgraph(missing) if missing else []
+            subgraphs = self._batch_cache_fill(entities, subgraphs, shared, version)
+            found = await asyncio.gather(*(
+                guarded(query, lookups(e, subgraph))
+                for query, e, subgraph in zip(live, entities, subgraphs)
+            ))
+            live = [query for query, f in zip(live, found) if f is not None]
+            entities = [resolved[query][0] for query in live]
+            subgraphs = [f[0] for f in found if f is not None]
+            join_results = [f[1] for f in found if f is not None]
+            fields = await self.graph.atable_fields(
+                self._batch_field_tables(entities, join_results)
+            )
+            index = await self.areachability() if any(map(self._impact_tables, entities)) \
+                else None
+        retrieved = self._batch_retrieved(entities, subgraphs, join_results, fields, index)
+        
+        await self.graph.aschema_version()
+        answered = await asyncio.gather(*(
+            guarded(query, bounded(answer(query, e, r)))
+            for query, e, r in zip(live, entities, retrieved)
+        ))
+        return self._batch_results(queries, live, resolved, retrieved, answered, errors)
+    
+    async def _astream_answer(self, prompt, chunks, admitted, deadline=None):
+        """Stream the answer into `chunks`, holding the LLM slot only while the model runs.
+
+        `admitted` resolves once the slot is held, or with the Overloaded (or
+        other) error that kept the stream from starting. A later error is put
+        on the queue; None ends it. `deadline` is the query's LLM budget.
+        """
+        try:
+            with budget_until(deadline):
+                async with self.admission.slot("llm"):
+                    admitted.set_result(True)
+                    async for chunk in self.answer_llm.astream(prompt):
+                        chunks.put_nowait(chunk)
+        except Exception as e:
+            if admitted.done():
+                chunks.put_nowait(e)
+            else:
+                admitted.set_exception(e)
+        finally:
+            chunks.put_nowait(None)
+    
+    async def astream(self, query):
+        """Main pipeline as (event, data) pairs, emitted as each stage finishes:
+        "entities", "subgraph", one "token" per answer chunk, then "done" with the full answer.
+
+        "subgraph" is emitted once the answer has been admitted to the LLM
+        stage, so an overloaded stage raises Overloaded before it.
+        """
+        with self.tracer.trace("graph_rag_stream", query) as trace:
+            # The budget is set around each stage rather than the whole stream: a
+            # context variable must not stay set across yields
+            with trace.span("extract") as span, latency_budget(self.latency_budget_ms):
+                entities, tier = await self.aresolve_entities(query)
+                deadline = budget_deadline()
+                span["tier"] = tier
+            with trace.span("seed"):
+                entities = await self.aseed_entities(query, entities)
+            yield "entities", {"entities": entities, "extraction_tier": tier}
+            
+            with trace.span("retrieve") as span:
+                retrieved = await self._aretrieve(entities)
+                self._retrieval_attrs(span, entities, retrieved)
+            with trace.span("context") as span:
+                context, report = self.build_context(entities, *retrieved)
+                span["context_tokens"] = report["tokens"]
+            graph_context, join_paths, fields, impact = retrieved
+            
+            # Timed by hand: a span's context must not stay open across yields.
+            # The answer streams from a task into a queue, so a slow or gone
+            # client never keeps the LLM slot
+            t0 = time.perf_counter()
+            prompt = self._answer_prompt(query, context)
+            chunks = asyncio.Queue()
+            admitted = asyncio.get_running_loop().create_future()
+            producer = asyncio.create_task(
+                self._astream_answer(prompt, chunks, admitted, deadline)
+            )
+            try:
+                await admitted
+                yield "subgraph", {
+                    "graph_context": graph_context,
+                    "join_paths": join_paths,
+                    "fields": fields,
+                    "impact": impact,
+                    "context_report": report,
+                }
+                parts = []
+                cached = False
+                while True:
+                    chunk = await chunks.get()
+                    if chunk is None:
+                        break
+                    if isinstance(chunk, Exception):
+                        raise chunk
+                    cached = cached or bool((chunk.response_metadata or {}).get("cached"))
+                    if chunk.content:
+                        parts.append(chunk.content)
+                        yield "token", {"text": chunk.content}
+            finally:
+                producer.cancel()
+            answer = "".join(parts)
+            attrs = {}
+            record_llm_usage(prompt, AIMessage(
+                content=answer, response_metadata={"cached": True} if cached else {}
+            ), span=attrs)
+            trace.add("generate", (time.perf_counter() - t0) * 1000, attrs)
+        yield "done", {"answer": answer, "timings": trace.as_dict()}
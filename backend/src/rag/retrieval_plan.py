@@ -0,0 +1,69 @@
+"""Retrieval plans: what each question intent needs from the schema graph.
+
+A plan picks which RELATES_TO edges are fetched around the extracted tables
+(both directions, only the tables they reference, only the tables
+referencing them, or none), how far, whether join paths are searched and
+which fields come along. The plans are built once; each maps onto a fixed,
+parameterized backend query that starts from the indexed Table.name.
+"""
+
+
+class RetrievalPlan:
+    """Graph lookups for one intent.
+
+    direction: "both", "out" (tables the seeds reference), "in" (tables
+        referencing the seeds) or None for no edges. Directed plans are 1-hop.
+    min_hops: lower bound on the processor's RETRIEVAL_HOPS for undirected plans.
+    fields: "all" fields of the context tables, or "join" for key fields and
+        the fields the retrieved edges join on.
+    """
+
+    def __init__(self, intent, direction="both", min_hops=1, join_paths=True, fields="join",
+                 impact=False):
+        self.intent = intent
+        self.direction = direction
+        self.min_hops = min_hops
+        self.join_paths = join_paths
+        self.fields = fields
+        self.impact = impact
+
+    def hops(self, default):
+        if self.direction is None:
+            return 0
+        if self.direction != "both":
+            return 1
+        return max(self.min_hops, default)
+
+    def join_fields(self, records, join_paths=()):
+        """Field names kept besides keys, or None when the plan wants every field"""
+        if self.fields == "all":
+            return None
+        names = {record['r'].get('via') for record in records}
+        for path in join_paths or []:
+            names.update(step['via'] for step in path['path'] or [])
+        return names - {None}
+
+    def __repr__(self):
+        return f"RetrievalPlan({self.intent!r})"
+
+
+PLANS = {
+    # "Which table stores customers?": the table, its neighbours and keys
+    "entity_lookup": RetrievalPlan("entity_lookup", join_paths=False),
+    # "Show me all fields in VBAK": fields only
+    "field_listing": RetrievalPlan("field_listing", direction=None, join_paths=False,
+                                   fields="all"),
+    "relationship": RetrievalPlan("relationship"),
+    # Referencing tables; the full transitive set comes from the reachability index
+    "impact": RetrievalPlan("impact", direction="in", join_paths=False, impact=True),
+    "data_flow": RetrievalPlan("data_flow", min_hops=2),
+    # Whether a direct edge exists, and the path that does connect the tables
+    "join_check": RetrievalPlan("join_check"),
+}
+
+# Unknown or missing intents keep the original retrieval: everything around the tables
+DEFAULT_PLAN = RetrievalPlan("default", fields="all")
+
+
+def plan_for(intent):
+    return PLANS.get(intent, DEFAULT_PLAN)
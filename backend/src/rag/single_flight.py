@@ -0,0 +1,101 @@
+"""Single-flight coalescing of identical concurrent calls.
+
+The first caller for a key runs the call; callers arriving with the same key
+while it is in flight wait for it and share its result (or its exception).
+Nothing is kept once the call finishes, so this is deduplication, not caching.
+"""
+import asyncio
+import threading
+
+
+def normalize_query(query):
+    """Whitespace-insensitive form of a question, used as a coalescing key.
+
+    Case is kept: the lexical tier reads upper-case identifiers (VBAK, KUNNR)
+    differently from ordinary words.
+    """
+    return " ".join(query.split())
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls per key, from threads (do) or coroutines (ado).
+
+    `counter`, when given, is incremented per call with the flight's name and
+    the caller's role ("leader" ran the call, "follower" shared it).
+    """
+
+    def __init__(self, name, counter=None):
+        self.name = name
+        self.counter = counter
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._tasks = {}
+        self._stats = {"calls": 0, "executions": 0, "coalesced": 0}
+
+    def _count(self, leader):
+        self._stats["calls"] += 1
+        self._stats["executions" if leader else "coalesced"] += 1
+        if self.counter is not None:
+            self.counter.inc(flight=self.name, role="leader" if leader else "follower")
+
+    def do(self, key, fn):
+        """Return (fn(), coalesced); concurrent callers with the same key share one fn() call"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            self._count(leader)
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value, True
+
+        try:
+            call.value = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value, False
+
+    async def ado(self, key, factory):
+        """Return (await factory(), coalesced), sharing one in-flight coroutine per key.
+
+        The call runs as its own task, so a caller that is cancelled (a client
+        disconnecting) does not cancel it for the others.
+        """
+        with self._lock:
+            task = self._tasks.get(key)
+            leader = task is None
+            if leader:
+                task = self._tasks[key] = asyncio.ensure_future(factory())
+                task.add_done_callback(lambda _: self._forget(key, task))
+            self._count(leader)
+        return await asyncio.shield(task), not leader
+
+    def _forget(self, key, task):
+        with self._lock:
+            if self._tasks.get(key) is task:
+                del self._tasks[key]
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._calls) + len(self._tasks)
+        stats["coalescing_ratio"] = (
+            round(stats["coalesced"] / stats["calls"], 3) if stats["calls"] else 0.0
+        )
+        return stats
@@ -0,0 +1,370 @@
+import contextvars
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from src.rag.context_builder import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+
+# ----- Summaries -----
+
+def percentile(values, q):
+    """Linear-interpolated percentile, q in [0, 100]"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    pos = (len(ordered) - 1) * q / 100
+    lo = int(pos)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (pos - lo)
+
+
+# ----- Prometheus-format metrics -----
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = dict(self._values)
+        return [f"{self.name}{_label_text(key)} {value}" for key, value in sorted(values.items())]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._values = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            row = self._values.setdefault(key, [0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    row[i] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    def render(self):
+        with self._lock:
+            values = {key: list(row) for key, row in self._values.items()}
+        lines = []
+        for key, row in sorted(values.items()):
+            for bound, count in zip(self.buckets, row):
+                lines.append(f"{self.name}_bucket{_label_text(key + (('le', bound),))} {count}")
+            lines.append(f"{self.name}_bucket{_label_text(key + (('le', '+Inf'),))} {row[-1]}")
+            lines.append(f"{self.name}_sum{_label_text(key)} {round(row[-2], 6)}")
+            lines.append(f"{self.name}_count{_label_text(key)} {row[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name, help_text):
+        metric = Counter(name, help_text)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help_text, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Prometheus text exposition format"""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# ----- Sampling profiler -----
+
+class SamplingProfiler:
+    """Samples one thread's Python stack every `interval` seconds from a helper thread.
+
+    Stacks are counted in collapsed form ("module:function;..."), outermost
+    frame first, ready for a flame graph.
+    """
+
+    def __init__(self, thread_id, interval=0.005, max_depth=40):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.samples
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                key = ";".join(reversed(stack))
+                self.samples[key] = self.samples.get(key, 0) + 1
+
+
+# ----- Traces -----
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+def record_llm_usage(prompt, response, span=None):
+    """Attach prompt/completion token counts of an LLM call to `span` (default: the current one).
+
+    Provider usage is used when the response carries it, otherwise the counts
+    are estimated from the text. Cache hits are counted as cached, not tokens.
+    """
+    span = _current_span.get() if span is None else span
+    if span is None:
+        return
+    content = response if isinstance(response, str) else response.content
+    metadata = getattr(response, "response_metadata", None) or {}
+    usage = getattr(response, "usage_metadata", None) or metadata.get("usage") or {}
+    if metadata.get("cached"):
+        span["llm_cached"] = span.get("llm_cached", 0) + 1
+        return
+    prompt_tokens = usage.get("input_tokens") or estimate_tokens(prompt)
+    completion_tokens = usage.get("output_tokens") or estimate_tokens(content)
+    span["prompt_tokens"] = span.get("prompt_tokens", 0) + prompt_tokens
+    span["completion_tokens"] = span.get("completion_tokens", 0) + completion_tokens
+
+
+class Trace:
+    """Timed spans for the stages of one request."""
+
+    def __init__(self, tracer, pipeline, query):
+        self.tracer = tracer
+        self.pipeline = pipeline
+        self.query = query
+        self.spans = []
+        self.started = time.perf_counter()
+        self.total_ms = None
+        self.profiler = None
+
+    @contextmanager
+    def span(self, stage):
+        """Time a stage; the yielded dict collects attributes such as token counts"""
+        attrs = {}
+        token = _current_span.set(attrs)
+        t0 = time.perf_counter()
+        try:
+            yield attrs
+        finally:
+            _current_span.reset(token)
+            self.add(stage, (time.perf_counter() - t0) * 1000, attrs)
+
+    def add(self, stage, ms, attrs=None):
+        """Record a stage timed by the caller, e.g. one spanning an async generator's yields"""
+        self.spans.append({"stage": stage, "ms": round(ms, 2), "attrs": attrs or {}})
+
+    def stages(self):
+        stages = {}
+        for span in self.spans:
+            stages[span["stage"]] = round(stages.get(span["stage"], 0) + span["ms"], 2)
+        return stages
+
+    def finish(self, error=None):
+        self.total_ms = round((time.perf_counter() - self.started) * 1000, 2)
+        self.tracer.record(self, error)
+        return self.as_dict()
+
+    def as_dict(self):
+        return {"total_ms": self.total_ms, "stages": self.stages(), "spans": self.spans}
+
+
+class Tracer:
+    """Records finished traces as metrics and dumps slow ones.
+
+    With TRACE_SLOW_MS > 0, each request's thread is sampled every
+    TRACE_SAMPLE_MS while it runs, and requests slower than the threshold are
+    written with their spans and stack samples to TRACE_DIR. For async
+    requests the sampled thread is the event loop, so samples include any
+    request running concurrently on it.
+    """
+
+    def __init__(self, slow_ms=None, trace_dir=None, sample_ms=None):
+        self.slow_ms = float(os.getenv("TRACE_SLOW_MS", "0") if slow_ms is None else slow_ms)
+        self.trace_dir = trace_dir or os.getenv("TRACE_DIR", "runs/traces")
+        self.sample_interval = float(
+            os.getenv("TRACE_SAMPLE_MS", "5") if sample_ms is None else sample_ms
+        ) / 1000
+
+        self.registry = MetricsRegistry()
+        self.requests = self.registry.counter(
+            "graphrag_requests_total", "Processed queries by pipeline and status"
+        )
+        self.request_seconds = self.registry.histogram(
+            "graphrag_request_seconds", "End-to-end query latency"
+        )
+        self.stage_seconds = self.registry.histogram(
+            "graphrag_stage_seconds", "Latency of each pipeline stage"
+        )
+        self.llm_tokens = self.registry.counter(
+            "graphrag_llm_tokens_total", "LLM tokens by stage and direction (prompt/completion)"
+        )
+        self.llm_cache_hits = self.registry.counter(
+            "graphrag_llm_cached_total", "LLM calls answered from the response cache"
+        )
+        self.subgraph_edges = self.registry.histogram(
+            "graphrag_subgraph_edges", "Relationship records retrieved per query", SIZE_BUCKETS
+        )
+        self.context_tokens = self.registry.histogram(
+            "graphrag_context_tokens", "Tokens of schema context sent to the LLM",
+            (100, 250, 500, 1000, 1500, 2000, 4000, 8000),
+        )
+        self.speculations = self.registry.counter(
+            "graphrag_speculative_retrievals_total",
+            "Subgraphs prefetched during LLM extraction, by outcome (hit/partial/miss)",
+        )
+        self.speculation_saved = self.registry.counter(
+            "graphrag_speculation_saved_seconds_total",
+            "Retrieval time overlapped with LLM extraction by speculative prefetches",
+        )
+        self.singleflight_calls = self.registry.counter(
+            "graphrag_singleflight_calls_total",
+            "Coalesced calls by flight and role (leader ran it, follower shared it)",
+        )
+        self.admissions = self.registry.counter(
+            "graphrag_admission_total",
+            "Stage admission decisions by stage, priority and outcome "
+            "(admitted/queued/rejected/timed_out/shed)",
+        )
+        self.admission_wait = self.registry.histogram(
+            "graphrag_admission_wait_seconds", "Time admitted requests waited for a stage slot"
+        )
+        self.llm_calls = self.registry.counter(
+            "graphrag_llm_calls_total",
+            "LLM calls, attempts, retries, timeouts, errors and hedges by stage",
+        )
+        self.slow_traces = self.registry.counter(
+            "graphrag_slow_traces_total", "Traces dumped for exceeding TRACE_SLOW_MS"
+        )
+
+    def start(self, pipeline, query):
+        trace = Trace(self, pipeline, query)
+        if self.slow_ms > 0:
+            trace.profiler = SamplingProfiler(threading.get_ident(), self.sample_interval).start()
+        return trace
+
+    @contextmanager
+    def trace(self, pipeline, query):
+        """Trace a request; it is recorded when the block exits, with the error if it raised"""
+        trace = self.start(pipeline, query)
+        try:
+            yield trace
+        except BaseException as e:
+            trace.finish(error=e)
+            raise
+        trace.finish()
+
+    def record(self, trace, error=None):
+        samples = trace.profiler.stop() if trace.profiler is not None else None
+        pipeline = trace.pipeline
+        self.requests.inc(pipeline=pipeline, status="error" if error else "ok")
+        self.request_seconds.observe(trace.total_ms / 1000, pipeline=pipeline)
+        for span in trace.spans:
+            stage, attrs = span["stage"], span["attrs"]
+            self.stage_seconds.observe(span["ms"] / 1000, pipeline=pipeline, stage=stage)
+            for direction in ("prompt", "completion"):
+                if attrs.get(f"{direction}_tokens"):
+                    self.llm_tokens.inc(
+                        attrs[f"{direction}_tokens"],
+                        pipeline=pipeline, stage=stage, direction=direction,
+                    )
+            if attrs.get("llm_cached"):
+                self.llm_cache_hits.inc(attrs["llm_cached"], pipeline=pipeline, stage=stage)
+            if "edges" in attrs:
+                self.subgraph_edges.observe(attrs["edges"], pipeline=pipeline)
+            if "context_tokens" in attrs:
+                self.context_tokens.observe(attrs["context_tokens"], pipeline=pipeline)
+            if attrs.get("speculation"):
+                self.speculations.inc(pipeline=pipeline, outcome=attrs["speculation"])
+                self.speculation_saved.inc(
+                    round(attrs.get("saved_ms", 0) / 1000, 6), pipeline=pipeline
+                )
+
+        if samples is not None and trace.total_ms >= self.slow_ms:
+            self.slow_traces.inc(pipeline=pipeline)
+            self.dump(trace, samples, error)
+
+    def dump(self, trace, samples, error=None):
+        os.makedirs(self.trace_dir, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d_%H%M%S')}_{trace.pipeline}_{id(trace):x}.json"
+        top = sorted(samples.items(), key=lambda item: -item[1])[:200]
+        with open(os.path.join(self.trace_dir, name), "w") as f:
+            json.dump({
+                "pipeline": trace.pipeline,
+                "query": trace.query,
+                "error": None if error is None else str(error),
+                **trace.as_dict(),
+                "sample_interval_ms": self.sample_interval * 1000,
+                "samples": [{"stack": stack, "count": count} for stack, count in top],
+            }, f, indent=2, default=str)
+        logger.warning("slow %s query (%.0f ms) written to %s",
+                       trace.pipeline, trace.total_ms, name)
+
+
+_default_tracer = None
+_default_tracer_lock = threading.Lock()
+
+
+def get_tracer():
+    """Process-wide tracer configured from the environment"""
+    global _default_tracer
+    with _default_tracer_lock:
+        if _default_tracer is None:
+            _default_tracer = Tracer()
+        return _default_tracer
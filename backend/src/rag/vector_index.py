@@ -0,0 +1,370 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+import zlib
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INDEX_FORMAT = 1
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32)
+
+
+def _features(text):
+    """Lowercased words (plural 's' stripped) and their character trigrams"""
+    features = []
+    for word in re.findall(r"[a-z0-9]+", (text or "").lower()):
+        if len(word) > 3 and word.endswith("s"):
+            word = word[:-1]
+        features.append(word)
+        padded = f"#{word}#"
+        features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    return features
+
+
+class HashingEmbedder:
+    """Offline stand-in for a sentence model: signed feature hashing of words and trigrams.
+
+    Deterministic across processes, so vectors saved by one worker are valid in another.
+    """
+
+    def __init__(self, dim=384):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def embed(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for feature in _features(text):
+                h = zlib.crc32(feature.encode("utf-8"))
+                vectors[i, h % self.dim] += -1.0 if h & 0x80000000 else 1.0
+        return _normalize(vectors)
+
+
+class SentenceTransformerEmbedder:
+    def __init__(self, model_name=DEFAULT_MODEL, batch_size=64, local_files_only=False):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name, local_files_only=local_files_only)
+        self.name = model_name
+        self.batch_size = batch_size
+
+    def embed(self, texts):
+        vectors = self.model.encode(
+            list(texts), batch_size=self.batch_size, normalize_embeddings=True,
+            convert_to_numpy=True,
+        )
+        return vectors.astype(np.float32)
+
+
+def get_embedder(kind=None):
+    """EMBEDDER=auto|sentence-transformers|hashing.
+
+    auto uses sentence-transformers only when EMBEDDING_MODEL is set or the
+    default model is already in the local cache, so startup never downloads a
+    model nobody asked for; otherwise, or when loading fails, it hashes.
+    """
+    kind = kind or os.getenv("EMBEDDER", "auto")
+    if kind == "hashing":
+        return HashingEmbedder()
+    model = os.getenv("EMBEDDING_MODEL")
+    if kind != "auto":
+        return SentenceTransformerEmbedder(model or DEFAULT_MODEL)
+    try:
+        return SentenceTransformerEmbedder(model or DEFAULT_MODEL, local_files_only=not model)
+    except Exception:
+        if model:
+            logger.warning("EMBEDDING_MODEL %s unavailable; using the hashing embedder", model,
+                           exc_info=True)
+        else:
+            logger.info("%s not in the local cache; using the hashing embedder", DEFAULT_MODEL)
+        return HashingEmbedder()
+
+
+def schema_documents(tables, fields):
+    """(doc id, text) for every table ("KNA1") and field ("KNA1.KUNNR")"""
+    docs = []
+    for t in tables:
+        text = f"{t['name']} {t.get('description') or ''}. {t.get('documentation') or ''}"
+        docs.append((t['name'], text.strip()))
+    for f in fields:
+        docs.append((f"{f['table']}.{f['name']}", f"{f['name']} {f.get('description') or ''}"))
+    return docs
+
+
+def _content_hash(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def _embed_batches(embedder, texts, batch_size):
+    if not texts:
+        return np.zeros((0, getattr(embedder, "dim", 0)), dtype=np.float32)
+    return np.vstack([
+        embedder.embed(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)
+    ]).astype(np.float32)
+
+
+def _kmeans(vectors, nlist, iterations=10, seed=0):
+    """Spherical k-means; returns (centroids, assignment)"""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(vectors @ centroids.T, axis=1)
+        for c in range(nlist):
+            members = vectors[assign == c]
+            if len(members):
+                centroids[c] = members.sum(axis=0)
+        centroids = _normalize(centroids)
+    return centroids, np.argmax(vectors @ centroids.T, axis=1)
+
+
+class VectorIndex:
+    """Embeddings of table and field descriptions in one float32 matrix.
+
+    Rows are L2-normalized, so search is a single matrix-vector product and
+    a partial sort. In "ivf" mode rows are grouped by k-means cluster (CSR
+    offsets, as in SchemaGraph) and only the `nprobe` nearest clusters are
+    scanned. Saved indexes are loaded memory-mapped.
+    """
+
+    def __init__(self, ids, hashes, vectors, model, schema_version=None,
+                 centroids=None, offsets=None):
+        self.ids = ids
+        self.hashes = hashes
+        self.vectors = vectors
+        self.model = model
+        self.schema_version = schema_version
+        self.centroids = centroids
+        self.offsets = offsets
+        self._row = {doc_id: i for i, doc_id in enumerate(ids)}
+
+    # -----------------------------
+    # Construction
+    # -----------------------------
+    @classmethod
+    def build(cls, docs, embedder, schema_version=None, mode="flat", batch_size=256):
+        vectors = _embed_batches(embedder, [text for _, text in docs], batch_size)
+        return cls._assemble(
+            [doc_id for doc_id, _ in docs],
+            [_content_hash(text) for _, text in docs],
+            vectors, embedder.name, schema_version, mode,
+        )
+
+    @classmethod
+    def _assemble(cls, ids, hashes, vectors, model, schema_version, mode):
+        if mode != "ivf" or len(ids) < 2:
+            return cls(ids, hashes, vectors, model, schema_version)
+        nlist = max(1, int(np.sqrt(len(ids))))
+        centroids, assign = _kmeans(vectors, nlist)
+        order = np.argsort(assign, kind="stable")
+        offsets = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assign, minlength=nlist), out=offsets[1:])
+        return cls(
+            [ids[i] for i in order], [hashes[i] for i in order], vectors[order],
+            model, schema_version, centroids, offsets,
+        )
+
+    @property
+    def mode(self):
+        return "flat" if self.centroids is None else "ivf"
+
+    def refresh(self, docs, embedder, schema_version=None, batch_size=256):
+        """New index for `docs`, embedding only documents that are new or whose text changed.
+
+        Returns (index, {"added", "changed", "removed", "reused"}).
+        """
+        hashes = [_content_hash(text) for _, text in docs]
+        reuse = []
+        embed = []
+        stats = {"added": 0, "changed": 0, "removed": 0, "reused": 0}
+        for i, ((doc_id, _), h) in enumerate(zip(docs, hashes)):
+            row = self._row.get(doc_id)
+            if row is not None and self.hashes[row] == h and self.model == embedder.name:
+                reuse.append((i, row))
+                stats["reused"] += 1
+            else:
+                embed.append(i)
+                stats["changed" if row is not None else "added"] += 1
+        stats["removed"] = len(self._row.keys() - {doc_id for doc_id, _ in docs})
+
+        vectors = np.zeros((len(docs), self.vectors.shape[1]), dtype=np.float32)
+        if reuse:
+            targets, rows = zip(*reuse)
+            vectors[list(targets)] = self.vectors[list(rows)]
+        if embed:
+            fresh = _embed_batches(embedder, [docs[i][1] for i in embed], batch_size)
+            if fresh.shape[1] != vectors.shape[1]:
+                return self.build(docs, embedder, schema_version, self.mode, batch_size), stats
+            vectors[embed] = fresh
+
+        index = self._assemble(
+            [doc_id for doc_id, _ in docs], hashes, vectors, embedder.name, schema_version,
+            self.mode,
+        )
+        return index, stats
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+    def save(self, path):
+        """Write the index atomically.
+
+        Arrays go to new files named after this save, and meta.json, which
+        names them, is swapped in last with os.replace. A reader sees either
+        the old index or the new one, never vectors of one with the ids of
+        the other; mapped readers keep their copy of the old files.
+        """
+        os.makedirs(path, exist_ok=True)
+        arrays = {"vectors": self.vectors}
+        if self.centroids is not None:
+            arrays.update(centroids=self.centroids, offsets=self.offsets)
+        generation = f"{time.time_ns():x}"
+        files = {}
+        for name, array in arrays.items():
+            files[name] = f"{name}.{generation}.npy"
+            tmp = os.path.join(path, f"{name}.{generation}.tmp.npy")
+            np.save(tmp, np.ascontiguousarray(array))
+            os.replace(tmp, os.path.join(path, files[name]))
+        meta = {
+            "format": INDEX_FORMAT,
+            "model": self.model,
+            "schema_version": self.schema_version,
+            "mode": self.mode,
+            "files": files,
+            "ids": self.ids,
+            "hashes": self.hashes,
+        }
+        tmp = os.path.join(path, f"meta.{generation}.tmp.json")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(path, "meta.json"))
+        # Arrays of earlier saves are no longer named by meta.json
+        for name in os.listdir(path):
+            if name.endswith(".npy") and name not in files.values() and ".tmp." not in name:
+                os.remove(os.path.join(path, name))
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        if meta.get("format") != INDEX_FORMAT:
+            raise ValueError(f"Unsupported vector index format in {path}: {meta.get('format')}")
+        mmap_mode = "r" if mmap else None
+        files = meta.get("files") or {
+            name: f"{name}.npy" for name in ("vectors", "centroids", "offsets")
+            if os.path.exists(os.path.join(path, f"{name}.npy"))
+        }
+        arrays = {
+            name: np.load(os.path.join(path, filename), mmap_mode=mmap_mode)
+            for name, filename in files.items()
+        }
+        return cls(
+            meta["ids"], meta["hashes"], arrays["vectors"], meta["model"],
+            meta.get("schema_version"), arrays.get("centroids"), arrays.get("offsets"),
+        )
+
+    # -----------------------------
+    # Search
+    # -----------------------------
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, query_vector, k=10, nprobe=None):
+        """Top-k (doc id, cosine score), best first"""
+        if not self.ids:
+            return []
+        query_vector = np.asarray(query_vector, dtype=np.float32).reshape(-1)
+        if self.centroids is None:
+            rows = None
+            scores = self.vectors @ query_vector
+        else:
+            nprobe = nprobe or int(os.getenv("VECTOR_NPROBE", "8"))
+            nearest = np.argsort(-(self.centroids @ query_vector))[:nprobe]
+            rows = np.concatenate([
+                np.arange(self.offsets[c], self.offsets[c + 1]) for c in nearest
+            ])
+            scores = self.vectors[rows] @ query_vector
+        k = min(k, len(scores))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        if rows is not None:
+            return [(self.ids[rows[i]], float(scores[i])) for i in top]
+        return [(self.ids[i], float(scores[i])) for i in top]
+
+    def search_tables(self, query, embedder, k=3, min_score=0.0, candidates=50):
+        """Tables whose own or whose fields' descriptions are closest to `query`"""
+        best = {}
+        for doc_id, score in self.search(embedder.embed([query])[0], k=candidates):
+            if score < min_score:
+                break
+            table = doc_id.split(".", 1)[0]
+            best.setdefault(table, score)
+        return list(best)[:k]
+
+
+def sync_index(backend, embedder, path=None, current=None, mode=None):
+    """Index matching the backend's schema version.
+
+    Reuses `current` or the index saved at `path` when it is up to date;
+    otherwise refreshes it incrementally (or builds it) and saves it back.
+    """
+    mode = mode or os.getenv("VECTOR_INDEX_MODE", "flat")
+    version = backend.schema_version()
+    if current is None and path and os.path.exists(os.path.join(path, "meta.json")):
+        current = VectorIndex.load(path)
+    if current is not None and current.model == embedder.name \
+            and current.schema_version == version and current.mode == mode:
+        return current
+
+    docs = schema_documents(backend.list_tables(), backend.list_fields())
+    if current is not None and current.mode == mode:
+        index, stats = current.refresh(docs, embedder, version)
+        logger.info("vector index refreshed for schema version %s: %s", version, stats)
+    else:
+        index = VectorIndex.build(docs, embedder, version, mode)
+        logger.info("vector index built: %d vectors with %s", len(index), embedder.name)
+    if path:
+        index.save(path)
+    return index
+
+
+def main():
+    from src.graph.backends import create_graph_backend
+    from src.graph.pool import close_pools
+
+    parser = argparse.ArgumentParser(
+        description="Build or refresh the vector index over table and field descriptions"
+    )
+    parser.add_argument("--out", default=os.getenv("VECTOR_INDEX_PATH", "data/vector_index"))
+    parser.add_argument("--mode", choices=["flat", "ivf"], default=None)
+    parser.add_argument("--embedder", choices=["auto", "sentence-transformers", "hashing"])
+    args = parser.parse_args()
+
+    backend = create_graph_backend(
+        os.getenv("NEO4J_URI", "bolt://localhost:7687"),
+        os.getenv("NEO4J_USER", "neo4j"),
+        os.getenv("NEO4J_PASSWORD", "password"),
+    )
+    try:
+        index = sync_index(backend, get_embedder(args.embedder), args.out, mode=args.mode)
+    finally:
+        backend.close()
+        close_pools()
+    print(f"Saved vector index to {args.out}: {len(index)} vectors ({index.mode})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,41 @@
+"""Side-by-side Plain RAG vs GraphRAG explorer.
+
+Run from backend/ with `python -m`, so the `src` package is importable:
+
+    python -m streamlit run src/streamlit_compare.py
+"""
 import json
 import os
-import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import streamlit as st
 
-from rag.query_processor import GraphRAGProcessor
-from rag.plain_rag import PlainRAGProcessor
-from eval.dataset import generate_dataset
+from src.eval.dataset import generate_dataset
+from src.eval.scoring import context_of, get_scorer
+from src.rag.plain_rag import PlainRAGProcessor
+from src.rag.query_processor import GraphRAGProcessor
 
 
 # -----------------------------
 # Helpers
 # -----------------------------
-KNOWN_TABLES = {"KNA1", "VBAK", "VBAP"}
+# Every table and field name in the schema, matched in one pass per answer
+scorer = get_scorer()
 
 
-def highlight_tables(text, tables):
-    for t in tables:
-        text = re.sub(
-            rf"\b{t}\b",
-            f":green[{t}]",
-            text
-        )
-    return text
+def highlight_tables(text):
+    return scorer.highlight(text)
 
 
 def extract_tables_from_text(text):
-    return [t for t in KNOWN_TABLES if t in text]
+    return scorer.tables_in(text)
+
+
+def timed(process, query):
+    t0 = time.perf_counter()
+    result = process(query)
+    return result, (time.perf_counter() - t0) * 1000
 
 
 def flatten_graph_context(graph_context):
@@ -81,9 +91,30 @@ st.markdown(f"### 🔍 Query\n> **{query}**")
 # -----------------------------
 # Run agents
 # -----------------------------
+# Both agents answer at the same time; the page waits for the slower one only
 with st.spinner("Running agents..."):
-    graph_result = graph_agent.process(query)
-    plain_result = plain_agent.process(query)
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        graph_future = pool.submit(timed, graph_agent.process, query)
+        plain_future = pool.submit(timed, plain_agent.process, query)
+        graph_result, graph_ms = graph_future.result()
+        plain_result, plain_ms = plain_future.result()
+    wall_ms = (time.perf_counter() - t0) * 1000
+
+st.caption(
+    f"Plain RAG {plain_ms:.0f} ms, Graph RAG {graph_ms:.0f} ms, run side by side in "
+    f"{wall_ms:.0f} ms (saved {max(plain_ms + graph_ms - wall_ms, 0):.0f} ms)"
+)
+retrieve_span = next(
+    (span for span in graph_result.get("timings", {}).get("spans", [])
+     if span["stage"] == "retrieve"),
+    None,
+)
+if retrieve_span and retrieve_span["attrs"].get("speculation"):
+    st.caption(
+        f"Speculative retrieval: {retrieve_span['attrs']['speculation']}, "
+        f"saved {retrieve_span['attrs']['saved_ms']:.0f} ms"
+    )
 
 # -----------------------------
 # Layout
@@ -100,7 +131,7 @@ with col1:
     tables = extract_tables_from_text(answer)
 
     st.markdown("**Answer**")
-    st.markdown(highlight_tables(answer, tables))
+    st.markdown(highlight_tables(answer))
 
     st.markdown("**Tables Mentioned**")
     if tables:
@@ -127,7 +158,7 @@ with col2:
     st.code(flatten_graph_context(graph_result["graph_context"]), language="json")
 
     st.markdown("**Answer**")
-    st.markdown(highlight_tables(answer, tables))
+    st.markdown(highlight_tables(answer))
 
     st.markdown("**Tables Mentioned**")
     if tables:
@@ -135,6 +166,16 @@ with col2:
     else:
         st.warning("No tables mentioned")
 
+    scores = scorer.score(answer, context=context_of(graph_result))
+    st.markdown("**Grounding**")
+    if scores["grounded"]:
+        st.success("Every table and relationship mentioned was retrieved from the graph")
+    else:
+        st.error(
+            "Not in the retrieved graph: "
+            + ", ".join(scores["ungrounded_tables"] + scores["unsupported_relationships"])
+        )
+
     st.markdown("**Reasoning**")
     st.info("LLM reasons only over retrieved graph evidence.")
 
@@ -0,0 +1,119 @@
+# File: backend/tests/conftest.py
+
+import asyncio
+import time
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from src.graph.backends import EmbeddedGraphBackend
+from src.graph.embedded import SchemaGraph
+from src.rag import llm_cache
+from src.rag.llm_cache import LLMCache
+from src.rag.query_processor import GraphRAGProcessor
+
+SCHEMA_FILE = "data/mock_sap_schema.json"
+# make_processor keeps the processor's own extraction model unless given another
+DEFAULT = object()
+
+
+@pytest.fixture(autouse=True)
+def data_paths(tmp_path, monkeypatch):
+    """Caches, snapshots and indexes built at their default paths land in tmp_path, not data/"""
+    monkeypatch.setenv("LLM_CACHE_PATH", str(tmp_path / "llm_cache.sqlite"))
+    monkeypatch.setenv("GRAPH_SNAPSHOT", str(tmp_path / "schema_snapshot"))
+    monkeypatch.setenv("VECTOR_INDEX_PATH", str(tmp_path / "vector_index"))
+    monkeypatch.setenv("PLAIN_RAG_INDEX_PATH", str(tmp_path / "plain_rag_index"))
+    monkeypatch.setattr(llm_cache, "_default_cache", None)
+
+
+class StubLLM:
+    """Answers every prompt with `content` after `delay` seconds, recording the prompts.
+
+    A prompt containing `fail_on` is rejected with a ValueError.
+    """
+
+    def __init__(self, content="ok", delay=0, fail_on=None):
+        self.content = content
+        self.delay = delay
+        self.fail_on = fail_on
+        self.prompts = []
+
+    def _answer(self, prompt):
+        self.prompts.append(prompt)
+        if self.fail_on and self.fail_on in prompt:
+            raise ValueError("model rejected the prompt")
+        return AIMessage(content=self.content)
+
+    def invoke(self, prompt):
+        time.sleep(self.delay)
+        return self._answer(prompt)
+
+    async def ainvoke(self, prompt):
+        await asyncio.sleep(self.delay)
+        return self._answer(prompt)
+
+
+class CountingBackend(EmbeddedGraphBackend):
+    """Records the sorted tables of every subgraph lookup, each taking `delay` seconds.
+
+    The first `failures` lookups are recorded as None and raise ConnectionError.
+    """
+
+    def __init__(self, graph, delay=0, failures=0):
+        super().__init__(graph)
+        self.delay = delay
+        self.failures = failures
+        self.lookups = []
+
+    def retrieve_subgraph(self, table_names, direction="both"):
+        if len(self.lookups) < self.failures:
+            self.lookups.append(None)
+            raise ConnectionError("graph unavailable")
+        time.sleep(self.delay)
+        self.lookups.append(sorted(table_names))
+        return super().retrieve_subgraph(table_names, direction)
+
+
+@pytest.fixture(scope="session")
+def schema_graph():
+    return SchemaGraph.from_schema_file(SCHEMA_FILE)
+
+
+@pytest.fixture
+def stub_llm():
+    """StubLLM(content="ok", delay=0, fail_on=None)"""
+    return StubLLM
+
+
+@pytest.fixture
+def counting_backend(schema_graph):
+    """CountingBackend over the mock schema: counting_backend(delay=0, failures=0)"""
+    return lambda **kwargs: CountingBackend(schema_graph, **kwargs)
+
+
+@pytest.fixture
+def make_processor(tmp_path, counting_backend):
+    """GraphRAGProcessor over the mock schema with stub LLMs and no vector seeding.
+
+    `backend` defaults to a CountingBackend and `answer_llm` to StubLLM(); an
+    `entity_llm` given replaces the extraction model. Other keyword arguments go
+    to the processor. Every processor made is closed after the test.
+    """
+    processors = []
+
+    def make(backend=None, answer_llm=None, entity_llm=DEFAULT, **kwargs):
+        kwargs.setdefault("vector_seeds", 0)
+        kwargs.setdefault("llm_cache", LLMCache(path=str(tmp_path / "cache.sqlite")))
+        processor = GraphRAGProcessor(
+            None, None, None, None, graph_backend=backend or counting_backend(), **kwargs
+        )
+        processor.answer_llm = answer_llm or StubLLM()
+        if entity_llm is not DEFAULT:
+            processor.entity_llm = entity_llm
+        processors.append(processor)
+        return processor
+
+    yield make
+    for processor in processors:
+        processor.close()
@@ -0,0 +1,140 @@
+# File: backend/tests/test_admission.py
+
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from src.graph.backends import EmbeddedGraphBackend
+from src.graph.embedded import SchemaGraph
+from src.rag.admission import Admission, Overloaded, StageLimiter, request_class
+from src.rag.query_processor import GraphRAGProcessor
+
+
+def test_queue_order_limits_and_shedding():
+    limiter = StageLimiter("llm", limit=1, queue_size=2, timeout=5)
+    order = []
+
+    async def work(name, priority, hold=0.01):
+        with request_class(priority):
+            try:
+                async with limiter.slot():
+                    order.append(name)
+                    await asyncio.sleep(hold)
+            except Overloaded as e:
+                return e
+
+    async def main():
+        holder = asyncio.create_task(work("holder", "interactive", hold=0.05))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(work("batch1", "batch")),
+                   asyncio.create_task(work("batch2", "batch"))]
+        await asyncio.sleep(0)
+        # The queue is full: an interactive request displaces the newest batch one
+        waiters.append(asyncio.create_task(work("interactive", "interactive")))
+        await asyncio.sleep(0)
+        assert limiter.stats()["waiting_by_priority"] == {"interactive": 1, "batch": 1}
+        # ...but a batch request has nothing to displace and is turned away
+        rejected = await work("batch3", "batch")
+        return rejected, await asyncio.gather(holder, *waiters)
+
+    rejected, results = asyncio.run(main())
+    assert rejected.status == 429 and rejected.retry_after >= 1
+    shed = results[2]
+    assert isinstance(shed, Overloaded) and shed.status == 503
+    assert order == ["holder", "interactive", "batch1"]
+
+    stats = limiter.stats()
+    assert stats["active"] == 0 and stats["waiting"] == 0
+    assert (stats["admitted"], stats["rejected"], stats["shed"]) == (3, 1, 1)
+
+
+def test_waiters_give_up_at_their_deadline():
+    limiter = StageLimiter("graph", limit=1, queue_size=8, timeout=5)
+
+    async def main():
+        async with limiter.slot():
+            with request_class("interactive", timeout=0.02):
+                with pytest.raises(Overloaded) as raised:
+                    await limiter.acquire()
+        return raised.value
+
+    error = asyncio.run(main())
+    assert error.status == 503 and "deadline" in error.reason
+    assert limiter.stats()["timed_out"] == 1 and limiter.active == 0
+
+
+class SlowLLM:
+    async def ainvoke(self, prompt):
+        await asyncio.sleep(0.05)
+        return AIMessage(content="ok")
+
+
+def test_api_sheds_load_with_retry_hint():
+    httpx = pytest.importorskip("httpx")
+    from src.api import main
+
+    backend = EmbeddedGraphBackend(SchemaGraph.from_schema_file("data/mock_sap_schema.json"))
+    processor = GraphRAGProcessor(
+        None, None, None, None, graph_backend=backend, vector_seeds=0,
+        admission=Admission(llm_limit=1, graph_limit=0, queue_size=0, timeout=1),
+    )
+    # Each attempt takes its slot inside the stage's ResilientLLM; skip the answer cache
+    processor.llm_stages["generate"].llm = SlowLLM()
+    processor.answer_llm = processor.llm_stages["generate"]
+    original, main.processor = main.processor, processor
+    try:
+        async def run():
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                responses = await asyncio.gather(
+                    client.post("/query", json={"query": "Show me all fields in VBAK"}),
+                    client.post("/query", json={"query": "Show me all fields in KNA1"}),
+                )
+                return responses, (await client.get("/stats")).json()
+
+        responses, stats = asyncio.run(run())
+    finally:
+        main.processor = original
+
+    assert sorted(r.status_code for r in responses) == [200, 429]
+    shed = next(r for r in responses if r.status_code == 429)
+    assert int(shed.headers["Retry-After"]) >= 1
+    assert stats["admission"]["llm"]["rejected"] == 1
+
+
+class SlowStreamingLLM:
+    async def astream(self, prompt):
+        await asyncio.sleep(0.05)
+        yield AIMessageChunk(content="ok")
+
+
+def test_stream_is_refused_before_it_starts():
+    httpx = pytest.importorskip("httpx")
+    from src.api import main
+
+    backend = EmbeddedGraphBackend(SchemaGraph.from_schema_file("data/mock_sap_schema.json"))
+    processor = GraphRAGProcessor(
+        None, None, None, None, graph_backend=backend,
+        admission=Admission(llm_limit=1, graph_limit=0, queue_size=0, timeout=1),
+    )
+    processor.answer_llm = SlowStreamingLLM()
+    original, main.processor = main.processor, processor
+    try:
+        async def run():
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await asyncio.gather(
+                    client.post("/query/stream", json={"query": "How is VBAK connected to KNA1?"}),
+                    client.post("/query/stream", json={"query": "How is VBAP connected to VBAK?"}),
+                )
+
+        responses = asyncio.run(run())
+    finally:
+        main.processor = original
+
+    assert sorted(r.status_code for r in responses) == [200, 429]
+    streamed = next(r for r in responses if r.status_code == 200)
+    assert "event: done" in streamed.text and "event: error" not in streamed.text
+    # The slot went back as soon as the model finished, not when the client did
+    assert processor.admission.stats()["llm"]["active"] == 0
@@ -0,0 +1,79 @@
+# File: backend/tests/test_batch.py
+
+import asyncio
+
+import pytest
+
+QUERIES = [
+    "How is VBAK connected to KNA1?",
+    "Which tables reference the customer master?",
+    "How is VBAK connected to KNA1?",
+    "What fields does KNA1 have?",
+]
+
+
+@pytest.fixture
+def batch_processor(make_processor, stub_llm):
+    def make(**llm_args):
+        # Every query here is answered by the lexical tier
+        return make_processor(answer_llm=stub_llm("answer", **llm_args), entity_llm=None,
+                              batch_concurrency=2)
+    return make
+
+
+def edges(records):
+    return {(r['t1']['name'], r['r']['via'], r['t2']['name']) for r in records}
+
+
+def test_batch_dedupes_and_shares_one_lookup(batch_processor):
+    processor = batch_processor()
+    expected = {
+        query: edges(processor.retrieve_subgraph(processor.resolve_entities(query)[0]))
+        for query in QUERIES
+    }
+    processor.subgraph_cache.clear()
+    processor.graph.lookups.clear()
+
+    for results in (
+        processor.process_batch(QUERIES),
+        asyncio.run(processor.aprocess_batch(QUERIES)),
+    ):
+        assert [r['query'] for r in results] == QUERIES
+        assert results[0] is results[2]
+        for result in results:
+            assert edges(result['graph_context']) >= expected[result['query']]
+
+    # The async pass is served from the subgraph cache
+    assert len(processor.graph.lookups) == 1
+    assert len(processor.answer_llm.prompts) == 6
+
+
+def test_a_failed_query_does_not_fail_the_batch(batch_processor):
+    processor = batch_processor(fail_on="KNA1 have")
+
+    for results in (
+        processor.process_batch(QUERIES),
+        asyncio.run(processor.aprocess_batch(QUERIES)),
+    ):
+        assert [r['query'] for r in results] == QUERIES
+        assert results[3] == {"query": QUERIES[3], "error": "model rejected the prompt"}
+        assert all(r['answer'].startswith("answer") for r in results[:3])
+
+    httpx = pytest.importorskip("httpx")
+    from src.api import main
+
+    original, main.processor = main.processor, processor
+    try:
+        async def run():
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.post("/query/batch", json={"queries": QUERIES})
+
+        response = asyncio.run(run())
+    finally:
+        main.processor = original
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert results[3] == {"query": QUERIES[3], "error": "model rejected the prompt"}
+    assert results[0]["answer"].startswith("answer")
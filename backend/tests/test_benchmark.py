@@ -0,0 +1,27 @@
+# File: backend/tests/test_benchmark.py
+
+import asyncio
+
+import pytest
+
+from src.eval.benchmark import compare, run_benchmark
+
+
+def test_benchmark_reports_scenarios_and_flags_regressions():
+    pytest.importorskip("httpx")  # the "api" target calls the app through httpx
+    results = asyncio.run(run_benchmark(
+        targets=["graph_rag", "api"], num_queries=8, concurrency_levels=(1, 4),
+        llm_latency_ms=1, warmup=2,
+    ))
+    scenarios = results["scenarios"]
+    assert [(s["target"], s["concurrency"]) for s in scenarios] == [
+        ("graph_rag", 1), ("graph_rag", 4), ("api", 1), ("api", 4)
+    ]
+    for s in scenarios:
+        assert s["p50_ms"] <= s["p95_ms"] <= s["p99_ms"]
+        assert s["throughput_qps"] > 0 and s["peak_mem_mb"] > 0
+
+    assert compare(results, results) == []
+    slower = {"scenarios": [{**s, "p95_ms": s["p95_ms"] * 2} for s in scenarios]}
+    regressions = compare(slower, results)
+    assert {r["metric"] for r in regressions} == {"p95_ms"} and len(regressions) == 4
@@ -0,0 +1,96 @@
+# File: backend/tests/test_bm25.py
+
+import json
+import os
+
+import numpy as np
+
+from src.rag import bm25
+from src.rag.bm25 import BM25Index, chunk_schema_text
+from src.rag.context_builder import estimate_tokens
+from src.rag.plain_rag import PlainRAGProcessor
+
+SCHEMA_TEXT = "\n".join(
+    [
+        "Table VBRK: Billing Document: Header Data",
+        "  - VBELN: Billing Document",
+        "  - KUNAG: Payer",
+        "Table KNA1: Customer Master (General Data)",
+        "  - KUNNR: Customer Number",
+        "  - NAME1: Name 1",
+        "Table MARA: General Material Data",
+    ]
+    + [f"  - ZFIELD{i}: Custom attribute number {i}" for i in range(200)]
+)
+
+
+def test_chunks_keep_the_table_line():
+    chunks = chunk_schema_text(SCHEMA_TEXT, max_tokens=100)
+
+    assert chunks[0].startswith("Table VBRK") and "KUNAG" in chunks[0]
+    mara = [c for c in chunks if c.startswith("Table MARA")]
+    assert len(mara) > 1
+    assert all(estimate_tokens(c) <= 100 for c in mara)
+
+
+def test_ranks_chunks_and_persists(tmp_path):
+    path = str(tmp_path / "index")
+    index = BM25Index.for_schema_text(SCHEMA_TEXT, path, chunk_tokens=100)
+
+    best, _ = index.search("Which billing documents exist?", k=1)[0]
+    assert index.chunks[best].startswith("Table VBRK")
+    assert index.search("quantum chromodynamics") == []
+
+    loaded = BM25Index.for_schema_text(SCHEMA_TEXT, path, chunk_tokens=100)
+    assert list(loaded.chunks) == list(index.chunks)
+    assert loaded.search("customer number") == index.search("customer number")
+
+    changed = BM25Index.for_schema_text(SCHEMA_TEXT + "\nTable LIKP: Delivery", path)
+    assert changed.fingerprint != index.fingerprint
+    assert changed.search("delivery", k=1)
+
+    # A different chunk size is a different index, and both stay on disk
+    finer = BM25Index.for_schema_text(SCHEMA_TEXT, path, chunk_tokens=50)
+    assert finer.fingerprint != index.fingerprint
+    assert len(finer.chunks) > len(index.chunks)
+    again = BM25Index.for_schema_text(SCHEMA_TEXT, path, chunk_tokens=100)
+    assert list(again.chunks) == list(index.chunks)
+    assert len(os.listdir(path)) == 3
+
+
+def test_plain_rag_prompt_holds_only_top_chunks(tmp_path):
+    rag = PlainRAGProcessor(SCHEMA_TEXT, index_path=str(tmp_path / "index"), token_budget=60)
+    prompt = rag._prompt("What is the customer number field?")
+
+    assert "KUNNR: Customer Number" in prompt
+    assert "ZFIELD" not in prompt
+    assert estimate_tokens("\n\n".join(rag.retrieve("custom attribute"))) <= 60
+
+
+def test_schema_file_index_loads_without_reading_the_schema(tmp_path, monkeypatch):
+    with open("data/mock_sap_schema.json") as f:
+        schema = json.load(f)
+    schema_file = tmp_path / "schema.json"
+    schema_file.write_text(json.dumps(schema))
+    path = str(tmp_path / "index")
+
+    index = BM25Index.for_schema_file(str(schema_file), path)
+    assert index.chunks[index.search("customer number", k=1)[0][0]].startswith("Table KNA1")
+
+    def flatten(schema_file):
+        raise AssertionError("a saved index should not need the schema text")
+
+    monkeypatch.setattr(bm25, "schema_file_text", flatten)
+    loaded = BM25Index.for_schema_file(str(schema_file), path)
+    assert list(loaded.chunks) == list(index.chunks)
+    assert loaded.search("customer number") == index.search("customer number")
+    assert isinstance(loaded.post_docs, np.memmap)
+    # Everything but a few counters is in numpy files
+    (saved,) = os.listdir(path)
+    assert os.path.getsize(os.path.join(path, saved, "meta.json")) < 200
+
+    # An edited schema file is a different index
+    schema["tables"][0]["description"] = "Debtors"
+    schema_file.write_text(json.dumps(schema))
+    monkeypatch.undo()
+    assert BM25Index.for_schema_file(str(schema_file), path).fingerprint != index.fingerprint
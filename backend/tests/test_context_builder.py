@@ -0,0 +1,55 @@
+# File: backend/tests/test_context_builder.py
+
+from src.rag.context_builder import ContextBuilder, estimate_tokens
+
+
+def table(name, description):
+    return {"name": name, "description": description, "type": "transactional"}
+
+
+def record(t1, t2, via):
+    return {"t1": t1, "r": {"via": via, "description": f"{t1['name']} references {t2['name']}"},
+            "t2": t2}
+
+
+VBAP, VBAK, KNA1 = table("VBAP", "Sales Item"), table("VBAK", "Sales Header"), table("KNA1", "Customer")
+NEIGHBOURS = [table(f"Z{i:03d}", "Custom table " * 5) for i in range(40)]
+RECORDS = [record(VBAP, VBAK, "VBELN"), record(VBAK, KNA1, "KUNNR")] + [
+    record(t, KNA1, "KUNNR") for t in NEIGHBOURS
+]
+JOIN_PATHS = [{
+    "from": "VBAP", "to": "KNA1", "hops": 2,
+    "path": [
+        {"from": "VBAP", "to": "VBAK", "via": "VBELN", "direction": "->"},
+        {"from": "VBAK", "to": "KNA1", "via": "KUNNR", "direction": "->"},
+    ],
+}]
+FIELDS = [
+    {"table": "KNA1", "name": "KUNNR", "type": "CHAR(10)", "description": "Customer", "is_key": True},
+    {"table": "KNA1", "name": "NAME1", "type": "CHAR(35)", "description": "Name", "is_key": False},
+]
+ENTITIES = {"tables": ["VBAP", "KNA1"], "intent": "join_check"}
+
+
+def test_packs_most_relevant_items_into_budget():
+    text, report = ContextBuilder(token_budget=120).build(ENTITIES, RECORDS, JOIN_PATHS, FIELDS)
+
+    assert report["tokens"] == estimate_tokens(text) <= 120
+    assert report["dropped_tokens"] > 0 and report["dropped"]["edge"] > 0
+    assert "\\n" not in text
+    # The join path and the edges it walks beat the neighbours hanging off KNA1
+    assert "- VBAP -> VBAK (via VBELN) -> KNA1 (via KUNNR)" in text
+    assert "- VBAK -> KNA1 via KUNNR" in text
+    assert "KUNNR* CHAR(10) Customer" in text
+    # Every table is described once however many edges touch it
+    assert text.count("KNA1 (transactional): Customer") == 1
+
+
+def test_layout_is_stable_and_complete_when_it_fits():
+    builder = ContextBuilder(token_budget=5000)
+    text, report = builder.build(ENTITIES, RECORDS, JOIN_PATHS, FIELDS)
+
+    assert builder.build(ENTITIES, list(reversed(RECORDS)), JOIN_PATHS, FIELDS)[0] == text
+    assert report["dropped_tokens"] == 0
+    assert report["edges"] == len(RECORDS) and report["fields"] == 2
+    assert text.startswith("Tables:\n- VBAP (transactional): Sales Item\n- KNA1")
@@ -0,0 +1,188 @@
+# File: backend/tests/test_embedded_graph.py
+
+import json
+import multiprocessing
+import os
+
+import pytest
+
+from src.graph.backends import EmbeddedGraphBackend, load_schema_graph
+from src.graph.embedded import SchemaGraph
+
+SCHEMA_FILE = "data/mock_sap_schema.json"
+
+
+def test_snapshot_round_trip(tmp_path):
+    graph = SchemaGraph.from_schema_file(SCHEMA_FILE)
+    graph.save(tmp_path)
+    loaded = SchemaGraph.load(tmp_path)
+
+    assert loaded.num_tables == 2
+    assert loaded.num_fields == 7
+    assert loaded.num_relationships == 1
+    assert loaded.table_id("KNA1") is not None
+    assert loaded.table_id("VBAP") is None
+
+    keys = [f["name"] for f in loaded.fields(loaded.table_id("KNA1")) if f["is_key"]]
+    assert keys == ["KUNNR"]
+
+
+def test_retrieve_subgraph_matches_neo4j_record_shape():
+    backend = EmbeddedGraphBackend(SchemaGraph.from_schema_file(SCHEMA_FILE))
+
+    records = backend.retrieve_subgraph(["KNA1"])
+
+    assert len(records) == 1
+    record = records[0]
+    assert set(record) == {"t1", "r", "t2"}
+    assert record["t1"]["name"] == "VBAK"
+    assert record["t2"]["name"] == "KNA1"
+    assert record["r"] == {
+        "via": "KUNNR",
+        "type": "explicit",
+        "description": "Sales order references customer",
+    }
+    assert backend.retrieve_subgraph(["VBAP"]) == []
+
+
+def _order_to_cash_backend(tmp_path):
+    schema = {
+        "tables": [
+            {"name": name, "description": name, "type": "transactional", "fields": []}
+            for name in ["KNA1", "VBAK", "VBAP", "MARA", "LIKP", "LIPS"]
+        ],
+        "relationships": [
+            {"from": "VBAK", "to": "KNA1", "via": "KUNNR"},
+            {"from": "VBAP", "to": "VBAK", "via": "VBELN"},
+            {"from": "VBAP", "to": "MARA", "via": "MATNR"},
+            {"from": "LIPS", "to": "LIKP", "via": "VBELN"},
+            {"from": "LIPS", "to": "VBAP", "via": "VGBEL"},
+        ],
+    }
+    path = tmp_path / "schema.json"
+    path.write_text(json.dumps(schema))
+    return EmbeddedGraphBackend(SchemaGraph.from_schema_file(str(path)))
+
+
+def test_join_path_goes_through_header_table(tmp_path):
+    backend = _order_to_cash_backend(tmp_path)
+
+    paths, records = backend.find_join_paths(["VBAP", "KNA1"])
+
+    assert paths == [{
+        "from": "VBAP",
+        "to": "KNA1",
+        "hops": 2,
+        "path": [
+            {"from": "VBAP", "to": "VBAK", "via": "VBELN", "direction": "->"},
+            {"from": "VBAK", "to": "KNA1", "via": "KUNNR", "direction": "->"},
+        ],
+    }]
+    assert {(r["t1"]["name"], r["t2"]["name"]) for r in records} == {
+        ("VBAP", "VBAK"), ("VBAK", "KNA1"),
+    }
+    assert backend.find_join_paths(["LIKP", "KNA1"], max_hops=2)[0][0]["path"] is None
+
+
+def test_khop_respects_hop_and_node_budgets(tmp_path):
+    backend = _order_to_cash_backend(tmp_path)
+
+    one_hop = backend.retrieve_khop(["KNA1"], max_hops=1)
+    two_hops = backend.retrieve_khop(["KNA1"], max_hops=2)
+    capped = backend.retrieve_khop(["VBAP"], max_hops=3, max_nodes=2)
+
+    assert [(r["t1"]["name"], r["t2"]["name"]) for r in one_hop] == [("VBAK", "KNA1")]
+    assert len(two_hops) == 2
+    assert len(capped) == 1
+
+
+def test_relationships_to_undeclared_tables_are_skipped(tmp_path):
+    # As in Neo4j, where MERGE_RELATIONSHIPS MATCHes both endpoints
+    from src.graph.schema_sync import load_rows
+
+    with open(SCHEMA_FILE) as f:
+        schema = json.load(f)
+    schema["relationships"].append({"from": "VBAP", "to": "VBAK", "via": "VBELN"})
+    path = tmp_path / "schema.json"
+    path.write_text(json.dumps(schema))
+
+    graph = SchemaGraph.from_schema_file(str(path))
+    assert graph.num_tables == 2 and graph.num_relationships == 1
+    assert graph.table_id("VBAP") is None
+    rows = load_rows(str(path))
+    assert set(rows["tables"]) == {"VBAK", "KNA1"} and len(rows["relationships"]) == 1
+
+
+def test_stale_snapshot_is_rebuilt(tmp_path):
+    with open(SCHEMA_FILE) as f:
+        schema = json.load(f)
+    path = tmp_path / "schema.json"
+    path.write_text(json.dumps(schema))
+    snapshot = str(tmp_path / "snapshot")
+    first = load_schema_graph(snapshot, str(path))
+    assert load_schema_graph(snapshot, str(path)).schema_version == first.schema_version
+
+    schema["tables"].append({"name": "VBAP", "fields": [{"name": "VBELN", "key": True}]})
+    path.write_text(json.dumps(schema))
+    rebuilt = load_schema_graph(snapshot, str(path))
+    assert rebuilt.schema_version != first.schema_version
+    assert rebuilt.table_id("VBAP") is not None
+
+
+def load_in_worker(snapshot, schema_file):
+    graph = load_schema_graph(snapshot, schema_file)
+    return graph.schema_version, graph.num_tables, len(graph.out_offsets) - 1
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(),
+                    reason="needs fork to share the patched builder")
+def test_workers_rebuild_a_stale_snapshot_once(tmp_path, monkeypatch):
+    with open(SCHEMA_FILE) as f:
+        schema = json.load(f)
+    path = tmp_path / "schema.json"
+    path.write_text(json.dumps(schema))
+    snapshot = str(tmp_path / "snapshot")
+    load_schema_graph(snapshot, str(path))
+
+    schema["tables"].append({"name": "VBAP", "fields": [{"name": "VBELN", "key": True}]})
+    path.write_text(json.dumps(schema))
+    builds = tmp_path / "builds"
+    build = SchemaGraph.from_schema_file.__func__
+
+    def counted(cls, schema_file):
+        with open(builds, "a") as f:
+            f.write(f"{os.getpid()}\n")
+        return build(cls, schema_file)
+
+    monkeypatch.setattr(SchemaGraph, "from_schema_file", classmethod(counted))
+    with multiprocessing.get_context("fork").Pool(4) as pool:
+        results = pool.starmap(load_in_worker, [(snapshot, str(path))] * 4)
+
+    assert len(builds.read_text().split()) == 1
+    assert len(set(results)) == 1
+    _, tables, offsets = results[0]
+    assert tables == offsets
+    # One generation of arrays is left, the one meta.json names
+    with open(os.path.join(snapshot, "meta.json")) as f:
+        files = set(json.load(f)["files"].values())
+    assert {e for e in os.listdir(snapshot) if e.endswith(".npy")} == files
+
+
+def test_join_paths_of_all_pairs_share_one_lookup_per_level(tmp_path):
+    backend = _order_to_cash_backend(tmp_path)
+    expand = backend.expand
+    lookups = []
+
+    def counted(nodes):
+        lookups.append(list(nodes))
+        return expand(nodes)
+
+    backend.expand = counted
+    paths, _ = backend.find_join_paths(["LIPS", "KNA1", "MARA", "LIKP"], max_hops=4)
+
+    assert len(paths) == 6 and all(p["path"] for p in paths)
+    assert next(p for p in paths if p["to"] == "KNA1")["hops"] == 3
+    # One round trip per BFS level, each table fetched once
+    assert len(lookups) <= 4
+    fetched = [node for nodes in lookups for node in nodes]
+    assert len(fetched) == len(set(fetched))
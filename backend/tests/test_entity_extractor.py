@@ -0,0 +1,87 @@
+# File: backend/tests/test_entity_extractor.py
+
+import threading
+
+import pytest
+
+from src.rag.automaton import KeywordAutomaton
+from src.rag import entity_extractor
+from src.rag.entity_extractor import LexicalEntityExtractor
+from src.graph.backends import EmbeddedGraphBackend
+from src.graph.embedded import SchemaGraph
+from src.rag.query_processor import GraphRAGProcessor
+
+
+@pytest.fixture(scope="module")
+def extractor():
+    backend = EmbeddedGraphBackend(SchemaGraph.from_schema_file("data/mock_sap_schema.json"))
+    return LexicalEntityExtractor.from_backend(backend)
+
+
+def test_automaton_matches_whole_words_only():
+    automaton = KeywordAutomaton()
+    for pattern in ["order", "sales order", "he"]:
+        automaton.add(pattern, pattern)
+
+    matches = [payload for _, _, payload in automaton.find("The Sales Order and its orders")]
+
+    assert matches == ["sales order", "order"]
+
+
+@pytest.mark.parametrize("query, tables, intent", [
+    ("How is VBAK connected to KNA1?", ["VBAK", "KNA1"], "relationship"),
+    ("What tables store customer data?", ["KNA1"], "entity_lookup"),
+    ("What is the relationship between sales orders and customers?", ["VBAK", "KNA1"], "relationship"),
+    ("Which tables rely on KNA1?", ["KNA1"], "impact"),
+    ("Is there a direct join between VBAP and KNA1?", ["KNA1", "VBAP"], "join_check"),
+    ("Show me all fields in VBAK table", ["VBAK"], "field_listing"),
+    # Join words outrank field words, and flow words outrank change words
+    ("Which field joins VBAK to KNA1?", ["VBAK", "KNA1"], "relationship"),
+    ("What key fields link VBAK and KNA1?", ["VBAK", "KNA1"], "relationship"),
+    ("What columns connect VBAP to VBAK?", ["VBAK", "VBAP"], "relationship"),
+    ("How do sales order changes flow to billing?", ["VBAK"], "data_flow"),
+])
+def test_extracts_tables_and_intent(extractor, query, tables, intent):
+    entities, confidence = extractor.extract(query)
+
+    assert entities["tables"] == tables
+    assert entities["intent"] == intent
+    assert confidence >= 0.7
+
+
+def test_no_schema_terms_means_no_confidence(extractor):
+    entities, confidence = extractor.extract("Explain the order-to-cash flow")
+
+    assert entities == {"tables": [], "entities": [], "intent": "data_flow"}
+    assert confidence == 0.0
+
+
+class VersionedBackend(EmbeddedGraphBackend):
+    version = "v1"
+
+    def schema_version(self):
+        return self.version
+
+
+def test_schema_change_rebuilds_the_extractor_in_the_background(monkeypatch):
+    backend = VersionedBackend(SchemaGraph.from_schema_file("data/mock_sap_schema.json"))
+    processor = GraphRAGProcessor(None, None, None, None, graph_backend=backend)
+    current = processor.lexical_extractor()
+    assert current.schema_version == "v1"
+
+    release = threading.Event()
+    build = LexicalEntityExtractor.from_backend.__func__
+
+    def slow_build(cls, backend):
+        release.wait(5)
+        return build(cls, backend)
+
+    monkeypatch.setattr(entity_extractor.LexicalEntityExtractor, "from_backend",
+                        classmethod(slow_build))
+    backend.version = "v2"
+    # The old extractor keeps answering while the new one is built
+    assert processor.lexical_extractor() is current
+    assert processor.lexical_extractor() is current
+    release.set()
+    processor._lexical_refresh.join(5)
+    assert processor.lexical_extractor().schema_version == "v2"
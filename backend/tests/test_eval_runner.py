@@ -0,0 +1,60 @@
+# File: backend/tests/test_eval_runner.py
+
+import asyncio
+
+from src.eval.runner import EvalRunner
+from src.eval.scoring import AnswerScorer
+from src.rag.tracing import percentile
+
+DATASET = [
+    {
+        "query_id": f"Q{i:03d}",
+        "task_type": "relationship",
+        "query": f"How is VBAK connected to KNA1? ({i})",
+        "expected": {"tables": ["VBAK", "KNA1"], "relationships": [], "answerable": True},
+    }
+    for i in range(6)
+]
+SCORER = AnswerScorer.from_schema_file("data/mock_sap_schema.json")
+
+
+class StubAgent:
+    def __init__(self, fail_on=()):
+        self.fail_on = set(fail_on)
+        self.seen = []
+
+    async def aprocess(self, query):
+        self.seen.append(query)
+        await asyncio.sleep(0.01)
+        if query in self.fail_on:
+            raise RuntimeError("rate limited")
+        return {"answer": "VBAK joins KNA1 on KUNNR."}
+
+
+def test_failed_examples_are_retried_on_resume(tmp_path):
+    flaky = StubAgent(fail_on={DATASET[2]["query"]})
+    runner = EvalRunner({"a": flaky, "b": StubAgent()}, str(tmp_path), "run", concurrency=4,
+                        scorer=SCORER)
+    summary = asyncio.run(runner.run(DATASET))
+
+    assert summary["completed"] == 11 and summary["failed"] == 1
+    # Both agents ran each question at once
+    assert summary["parallel_saved_ms"]["examples"] == 5
+    assert summary["parallel_saved_ms"]["p50"] > 0
+    assert len(runner.completed()) == 11
+
+    again = StubAgent()
+    resumed = EvalRunner({"a": again, "b": StubAgent()}, str(tmp_path), "run", scorer=SCORER)
+    summary = asyncio.run(resumed.run(DATASET))
+
+    assert again.seen == [DATASET[2]["query"]]
+    assert len(resumed.completed()) == 12
+    agent = summary["agents"]["a"]
+    assert agent["examples"] == 6
+    assert agent["precision"] == agent["recall"] == 1.0
+
+
+def test_percentile_interpolates():
+    assert percentile([], 50) is None
+    assert percentile([10, 20, 30, 40], 50) == 25
+    assert percentile([10, 20, 30, 40], 100) == 40
@@ -0,0 +1,39 @@
+# File: backend/tests/test_imports.py
+
+import ast
+import importlib
+import pathlib
+
+import pytest
+
+SRC = pathlib.Path(__file__).resolve().parents[1] / "src"
+# Scripts that run their UI on import; only their imports are checked
+SCRIPTS = {"src.streamlit_compare"}
+MODULES = sorted(
+    ".".join(path.relative_to(SRC.parent).with_suffix("").parts)
+    for path in SRC.rglob("*.py")
+)
+
+
+@pytest.mark.parametrize("module", [m for m in MODULES if m not in SCRIPTS])
+def test_module_imports(module):
+    importlib.import_module(module)
+
+
+@pytest.mark.parametrize("module", sorted(SCRIPTS))
+def test_script_imports_resolve(module):
+    path = SRC.parent.joinpath(*module.split(".")).with_suffix(".py")
+    for node in ast.parse(path.read_text()).body:
+        if isinstance(node, ast.ImportFrom) and node.level == 0:
+            names = [node.module]
+        elif isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        else:
+            continue
+        for name in names:
+            if name.split(".")[0] == "streamlit":
+                continue
+            imported = importlib.import_module(name)
+            if isinstance(node, ast.ImportFrom):
+                for alias in node.names:
+                    assert hasattr(imported, alias.name), f"{name}.{alias.name}"
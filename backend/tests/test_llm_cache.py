@@ -0,0 +1,55 @@
+# File: backend/tests/test_llm_cache.py
+
+from langchain_core.messages import AIMessage
+
+from src.rag.llm_cache import CachedLLM, LLMCache
+
+
+class CountingLLM:
+    model = "stub"
+    max_tokens = 100
+
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, prompt):
+        self.calls += 1
+        return AIMessage(content=f"answer {self.calls}")
+
+
+def test_whitespace_variants_share_an_entry(tmp_path):
+    llm = CountingLLM()
+    cached = CachedLLM(llm, LLMCache(path=str(tmp_path / "cache.sqlite")), "answers")
+
+    first = cached.invoke("What depends on   KNA1?")
+    second = cached.invoke("\n  What depends on KNA1?  ")
+
+    assert first.content == second.content == "answer 1"
+    assert llm.calls == 1
+    counts = cached.cache.stats()["namespaces"]["answers"]
+    assert counts["misses"] == 1 and counts["memory_hits"] == 1
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    llm = CountingLLM()
+    CachedLLM(llm, LLMCache(path=path), "entities").invoke("VBAK?")
+
+    restarted = LLMCache(path=path)
+    assert CachedLLM(llm, restarted, "entities").invoke("VBAK?").content == "answer 1"
+    assert llm.calls == 1
+    assert restarted.stats()["namespaces"]["entities"]["disk_hits"] == 1
+
+
+def test_schema_version_change_invalidates_answers(tmp_path):
+    llm = CountingLLM()
+    version = {"epoch": 1}
+    cached = CachedLLM(llm, LLMCache(path=str(tmp_path / "cache.sqlite")), "answers",
+                       version=lambda: version["epoch"])
+
+    cached.invoke("How is VBAK connected to KNA1?")
+    version["epoch"] = 2
+    refreshed = cached.invoke("How is VBAK connected to KNA1?")
+
+    assert refreshed.content == "answer 2"
+    assert llm.calls == 2
@@ -0,0 +1,175 @@
+# File: backend/tests/test_llm_resilience.py
+
+import asyncio
+import threading
+import time
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from src.eval.benchmark import StubLLM
+from src.graph.backends import EmbeddedGraphBackend
+from src.graph.embedded import SchemaGraph
+from src.rag.admission import StageLimiter
+from src.rag.llm_resilience import ResilientLLM, is_transient, latency_budget, stage_deadline
+from src.rag.query_processor import GraphRAGProcessor
+
+
+def hedged(stub):
+    # Hedge past the median once three calls have been timed
+    return ResilientLLM(stub, "generate", timeout_ms=5000, retries=0,
+                        hedge_percentile=50, hedge_min_samples=3)
+
+
+def test_slow_call_is_hedged():
+    # The 4th call stalls for a second; its duplicate (the 5th call) does not
+    stub = StubLLM(latency_ms=5, tail_every=4, tail_ms=1000)
+    llm = hedged(stub)
+
+    async def main():
+        for _ in range(3):
+            await llm.ainvoke("question")
+        t0 = time.perf_counter()
+        await llm.ainvoke("question")
+        return time.perf_counter() - t0
+
+    assert asyncio.run(main()) < 0.5
+    stats = llm.stats()
+    assert stats["hedged"] == 1 and stats["hedge_wins"] == 1 and stub.calls == 5
+
+    stub = StubLLM(latency_ms=5, tail_every=4, tail_ms=1000)
+    llm = hedged(stub)
+    for _ in range(3):
+        llm.invoke("question")
+    t0 = time.perf_counter()
+    llm.invoke("question")
+    assert time.perf_counter() - t0 < 0.5 and llm.stats()["hedge_wins"] == 1
+
+
+class FlakyLLM:
+    def __init__(self, failures, error=ConnectionError("overloaded"), limiter=None):
+        self.failures = failures
+        self.error = error
+        self.limiter = limiter
+        self.active = []
+        self.calls = 0
+
+    async def ainvoke(self, prompt):
+        self.calls += 1
+        if self.limiter is not None:
+            self.active.append(self.limiter.active)
+        if self.calls <= self.failures:
+            raise self.error
+        return AIMessage(content="ok")
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def test_retries_and_deadlines():
+    llm = ResilientLLM(FlakyLLM(failures=2), "extract", retries=2, backoff_ms=1,
+                       hedge_percentile=0)
+    assert asyncio.run(llm.ainvoke("q")).content == "ok"
+    assert (llm.stats()["errors"], llm.stats()["retries"]) == (2, 2)
+
+    # Client errors are not retried; rate limits and server errors are
+    rejected = ResilientLLM(FlakyLLM(failures=5, error=StatusError(401)), "extract",
+                            retries=2, backoff_ms=1)
+    with pytest.raises(StatusError):
+        asyncio.run(rejected.ainvoke("q"))
+    assert rejected.llm.calls == 1 and rejected.stats()["retries"] == 0
+    assert is_transient(StatusError(429)) and is_transient(StatusError(529))
+    assert not is_transient(StatusError(400)) and not is_transient(ValueError("bad"))
+
+    slow = ResilientLLM(StubLLM(latency_ms=200), "extract", timeout_ms=20, retries=1,
+                        backoff_ms=1, hedge_percentile=0)
+    with pytest.raises(TimeoutError):
+        asyncio.run(slow.ainvoke("q"))
+    assert slow.stats()["timeouts"] == 2 and slow.stats()["failed"] == 1
+
+    # Extraction gets a quarter of the budget, the answer whatever is left
+    with latency_budget(400):
+        now = time.monotonic()
+        assert 0.09 < stage_deadline("extract") - now < 0.11
+        assert 0.39 < stage_deadline("generate") - now < 0.41
+    assert stage_deadline("generate") is None
+
+
+def test_extraction_out_of_budget_falls_back_to_lexical_guess():
+    backend = EmbeddedGraphBackend(SchemaGraph.from_schema_file("data/mock_sap_schema.json"))
+    processor = GraphRAGProcessor(
+        None, None, None, None, graph_backend=backend, vector_seeds=0,
+        lexical_min_confidence=0.95, latency_budget_ms=400,
+    )
+    processor.entity_llm = ResilientLLM(StubLLM(latency_ms=1000), "extract", retries=0)
+    processor.answer_llm = StubLLM(latency_ms=1)
+
+    t0 = time.perf_counter()
+    result = asyncio.run(processor.aprocess("Tell me about VBAK and KNA1"))
+    assert time.perf_counter() - t0 < 0.5
+    assert result["extraction_tier"] == "lexical_fallback"
+    assert set(result["entities"]["tables"]) == {"VBAK", "KNA1"}
+
+    # Batches and streams get the same per-query budget and fallback
+    t0 = time.perf_counter()
+    batch = asyncio.run(processor.aprocess_batch(["Tell me about VBAK and KNA1"]))
+    assert time.perf_counter() - t0 < 0.5
+    assert batch[0]["extraction_tier"] == "lexical_fallback"
+
+    async def stream():
+        return [event async for event in processor.astream("Tell me about VBAP and VBAK")]
+
+    events = asyncio.run(stream())
+    assert events[0][1]["extraction_tier"] == "lexical_fallback" and events[-1][0] == "done"
+
+
+def test_each_attempt_takes_its_own_slot():
+    limiter = StageLimiter("llm", limit=1, queue_size=4, timeout=5)
+    flaky = FlakyLLM(failures=2, limiter=limiter)
+    llm = ResilientLLM(flaky, "generate", retries=2, backoff_ms=1, limiter=limiter)
+
+    assert asyncio.run(llm.ainvoke("q")).content == "ok"
+    # One slot per attempt, each given back before the backoff
+    assert flaky.active == [1, 1, 1]
+    assert limiter.stats()["admitted"] == 3 and limiter.active == 0
+
+
+def test_defaults_scale_the_answer_timeout_and_leave_hedging_off():
+    llm = ResilientLLM(StubLLM(), "generate")
+    # 10 s plus StubLLM.max_tokens (1000) at 25 tokens/s
+    assert llm.timeout == 50.0
+    assert ResilientLLM(StubLLM(), "extract").timeout == 8.0
+    assert llm.hedge_percentile == 0 and llm.hedge_delay() is None
+
+
+class StalledLLM:
+    def __init__(self):
+        self.release = threading.Event()
+        self.calls = 0
+
+    def invoke(self, prompt):
+        self.calls += 1
+        self.release.wait(5)
+        return AIMessage(content="ok")
+
+
+def test_abandoned_sync_attempts_hold_their_workers_until_they_return():
+    stalled = StalledLLM()
+    limiter = StageLimiter("llm", limit=2, queue_size=4, timeout=5)
+    llm = ResilientLLM(stalled, "generate", timeout_ms=50, retries=0, limiter=limiter)
+
+    for _ in range(2):
+        with pytest.raises(TimeoutError):
+            llm.invoke("q")
+    assert llm.stats()["abandoned"] == 2
+    # Both workers are still busy with abandoned calls: no third one is started
+    with pytest.raises(TimeoutError, match="workers"):
+        llm.invoke("q")
+    assert stalled.calls == 2
+
+    stalled.release.set()
+    assert llm.invoke("q").content == "ok"
+    assert stalled.calls == 3 and llm.sync_workers == 2
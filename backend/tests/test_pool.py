@@ -0,0 +1,111 @@
+# File: backend/tests/test_pool.py
+
+import asyncio
+from contextlib import ExitStack, contextmanager
+
+from src.graph import pool as pool_module
+from src.graph.pool import Neo4jPool, close_pools, get_pool, pool_stats
+
+
+class FlakyDriver:
+    """Runs each managed transaction twice, as the driver does after a transient error"""
+
+    def __init__(self):
+        self.modes = []
+
+    @contextmanager
+    def session(self, default_access_mode):
+        self.modes.append(default_access_mode)
+        driver = self
+
+        class Session:
+            def execute_read(self, work):
+                work(driver)
+                return work(driver)
+
+            execute_write = execute_read
+
+        yield Session()
+
+    def run(self, query, **params):
+        return type("Result", (), {"data": lambda result: [{"query": query, **params}]})()
+
+    def close(self):
+        pass
+
+
+def test_pool_routes_reads_and_counts_retries():
+    pool = Neo4jPool("bolt://example:7687", "neo4j", "pw", liveness_interval=0)
+    pool._driver = FlakyDriver()
+
+    assert pool.read("RETURN $x", x=1) == [{"query": "RETURN $x", "x": 1}]
+    pool.write("CREATE (n)")
+    assert pool._driver.modes == ["READ", "WRITE"]
+
+    stats = pool.stats()
+    assert stats["sessions"] == 2 and stats["retries"] == 2
+    assert stats["in_use"] == 0 and stats["peak_in_use"] == 1
+    assert stats["peak_utilization"] == round(1 / stats["max_pool_size"], 3)
+
+
+def test_get_pool_is_shared_per_server(monkeypatch):
+    monkeypatch.setattr(pool_module, "_pools", {})
+    a = get_pool("bolt://example:7687", "neo4j", "pw")
+    assert get_pool("bolt://example:7687", "neo4j", "pw") is a
+    assert get_pool("bolt://other:7687", "neo4j", "pw") is not a
+    # New credentials for the same server and user get their own driver
+    assert get_pool("bolt://example:7687", "neo4j", "rotated") is not a
+    assert len(pool_stats()) == 3
+
+    close_pools()
+    assert pool_stats() == []
+
+
+class FakeDriver:
+    def __init__(self):
+        self.alive = True
+        self.closed = False
+
+    @contextmanager
+    def session(self, default_access_mode):
+        assert not self.closed
+        yield self
+
+    def verify_connectivity(self):
+        if not self.alive:
+            raise ConnectionError("server went away")
+
+    def close(self):
+        self.closed = True
+
+
+def test_reconnect_waits_for_open_sessions_on_the_old_driver(monkeypatch):
+    monkeypatch.setattr(pool_module.GraphDatabase, "driver", lambda *a, **kw: FakeDriver())
+    pool = Neo4jPool("bolt://example:7687", "neo4j", "pw", liveness_interval=1)
+    old = pool.driver
+
+    with ExitStack() as held:
+        assert held.enter_context(pool.session()) is old
+        old.alive = False
+        pool._last_used -= 10
+        with pool.session() as session:
+            new = session
+        assert new is not old and pool.driver is new
+        # Still in use by the first session
+        assert not old.closed
+    assert old.closed and not new.closed
+    assert pool.stats()["reconnects"] == 1
+
+
+def test_async_drivers_of_closed_loops_are_dropped(monkeypatch):
+    monkeypatch.setattr(pool_module.AsyncGraphDatabase, "driver",
+                        lambda *a, **kw: FakeDriver())
+    pool = Neo4jPool("bolt://example:7687", "neo4j", "pw", liveness_interval=0)
+
+    async def driver():
+        return pool.async_driver
+
+    first = asyncio.run(driver())
+    second = asyncio.run(driver())
+    assert first is not second
+    assert list(pool._async_drivers.values()) == [second]
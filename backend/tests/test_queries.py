@@ -1,5 +1,9 @@
 # File: backend/tests/test_queries.py
 
+import asyncio
+
+from src.eval.benchmark import build_targets
+
 test_queries = [
     "What tables contain customer information?",
     "How are sales orders related to customers?",
@@ -8,7 +12,16 @@ test_queries = [
     "Explain the order-to-cash flow"
 ]
 
-for query in test_queries:
-    result = processor.process(query)
-    print(f"Q: {query}")
-    print(f"A: {result['answer']}\\n")
\ No newline at end of file
+
+def test_queries_run_offline():
+    targets, llm = build_targets(llm_latency_ms=0)
+    processor = targets["graph_rag"]
+
+    for query in test_queries:
+        result = processor.process(query)
+        assert result["answer"].startswith("Relevant tables:")
+        assert set(result["timings"]["stages"]) >= {"extract", "retrieve", "generate"}
+
+    plain = asyncio.run(targets["plain_rag"].aprocess(test_queries[2]))
+    assert "VBAK" in plain["answer"]
+    assert llm.calls >= len(test_queries) + 1
@@ -0,0 +1,112 @@
+# File: backend/tests/test_reachability.py
+
+import random
+import time
+import tracemalloc
+
+from src.graph.embedded import SchemaGraph
+from src.graph.reachability import ReachabilityIndex
+from src.graph.synthetic_schema import generate_schema
+
+# An edge A -> B means A references B
+EDGES = [
+    ("VBAK", "KNA1"), ("VBAP", "VBAK"), ("LIKP", "VBAK"), ("LIPS", "LIKP"),
+    ("VBRK", "KNA1"), ("VBRP", "VBRK"), ("VBRP", "LIPS"),
+    # A cycle: every member references the others
+    ("BSEG", "BKPF"), ("BKPF", "BSEG"), ("BSEG", "KNA1"),
+]
+TABLES = sorted({t for edge in EDGES for t in edge} | {"MARA"})
+
+
+def closure_by_bfs(edges, name, max_hops=None):
+    referencing = {}
+    for a, b in edges:
+        referencing.setdefault(b, []).append(a)
+    found, frontier, hops = {}, [name], 0
+    while frontier and (max_hops is None or hops < max_hops):
+        hops += 1
+        nxt = []
+        for node in frontier:
+            for other in referencing.get(node, []):
+                if other != name and other not in found:
+                    found[other] = hops
+                    nxt.append(other)
+        frontier = nxt
+    return found
+
+
+def test_downstream_sets_and_hops():
+    index = ReachabilityIndex(TABLES, EDGES)
+
+    assert index.downstream("KNA1") == {
+        "VBAK": 1, "VBRK": 1, "BSEG": 1, "VBAP": 2, "LIKP": 2, "VBRP": 2, "BKPF": 2, "LIPS": 3,
+    }
+    assert index.downstream("KNA1", max_hops=1) == {"VBAK": 1, "VBRK": 1, "BSEG": 1}
+    assert index.upstream("VBRP") == {"VBRK": 1, "LIPS": 1, "KNA1": 2, "LIKP": 2, "VBAK": 3}
+    assert index.reaches("LIPS", "KNA1") and not index.reaches("KNA1", "LIPS")
+    assert index.reaches("BSEG", "BSEG")
+    assert index.count("KNA1") == 8 and index.downstream("MARA") == {}
+    assert index.num_components == len(TABLES) - 1
+
+
+def test_incremental_update_matches_rebuild():
+    rng = random.Random(7)
+    names = [f"T{i:02d}" for i in range(40)]
+    edges = {(rng.choice(names), rng.choice(names)) for _ in range(60)}
+    index = ReachabilityIndex(names, edges)
+
+    for _ in range(20):
+        a, b = rng.choice(names), rng.choice(names + ["NEW1", "NEW2"])
+        edges.add((a, b))
+        touching = [e for e in edges if {a, b} & set(e)]
+        assert index.update({a, b}, touching, schema_version=2) in ("incremental", "unchanged")
+        for name in names:
+            assert index.downstream(name) == closure_by_bfs(edges, name)
+
+    removed = next(iter(edges))
+    edges.discard(removed)
+    touching = [e for e in edges if set(removed) & set(e)]
+    assert index.update(set(removed), touching) == "rebuild"
+    for name in names:
+        assert index.downstream(name, max_hops=2) == closure_by_bfs(edges, name, max_hops=2)
+    assert index.stats["incremental_updates"] > 0
+
+
+def test_impact_questions_get_exact_impact_sets(make_processor, stub_llm):
+    llm = stub_llm("VBAK references KNA1.")
+    processor = make_processor(answer_llm=llm)
+
+    result = processor.process("What tables depend on KNA1?")
+    assert result["impact"] == [{
+        "table": "KNA1", "max_hops": None, "total": 1,
+        "impacted": [{"table": "VBAK", "hops": 1}],
+    }]
+    assert "Impacted by a change" in llm.prompts[-1]
+    assert "- KNA1: VBAK (1)" in llm.prompts[-1]
+
+    assert processor.process("List the fields of KNA1")["impact"] == []
+
+
+def test_index_stays_small_and_fast_at_10k_tables(tmp_path):
+    path = tmp_path / "schema.json"
+    generate_schema(str(path), 10000, seed=1)
+    graph = SchemaGraph.from_schema_file(str(path))
+
+    t0 = time.perf_counter()
+    ReachabilityIndex.from_schema_graph(graph)
+    assert time.perf_counter() - t0 < 1.0
+    tracemalloc.start()
+    index = ReachabilityIndex.from_schema_graph(graph)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert peak < 16 * 2**20
+
+    edges = index.edges.tolist()
+    names = index.names
+    for hub in ("KNA1", "T001", "MARA"):
+        t0 = time.perf_counter()
+        impact = index.impact([hub], max_tables=5)[0]
+        assert time.perf_counter() - t0 < 0.05
+        expected = closure_by_bfs([(names[a], names[b]) for a, b in edges], hub)
+        assert impact["total"] == len(expected) > 1000
+        assert all(expected[row["table"]] == row["hops"] == 1 for row in impact["impacted"])
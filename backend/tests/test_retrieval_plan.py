@@ -0,0 +1,44 @@
+# File: backend/tests/test_retrieval_plan.py
+
+from src.rag.query_processor import carve_subgraph
+from src.rag.retrieval_plan import DEFAULT_PLAN, plan_for
+
+
+def fields(result):
+    return {(f['table'], f['name']) for f in result['fields']}
+
+
+def test_each_intent_fetches_only_what_it_needs(make_processor):
+    processor = make_processor(subgraph_cache=None)
+
+    listing = processor.process("Show me all fields in VBAK")
+    assert listing['entities']['intent'] == "field_listing"
+    assert listing['graph_context'] == [] and listing['join_paths'] == []
+    assert fields(listing) == {("VBAK", n) for n in ("VBELN", "KUNNR", "VKORG", "NETWR")}
+    assert listing['timings']['spans'][2]['attrs']['plan'] == "field_listing"
+
+    # Relationship questions keep keys and the fields the edges join on
+    related = processor.process("How is VBAK connected to KNA1?")
+    assert len(related['graph_context']) == 1 and related['join_paths'][0]['hops'] == 1
+    assert fields(related) == {("VBAK", "VBELN"), ("VBAK", "KUNNR"), ("KNA1", "KUNNR")}
+
+    # Asking which field joins two tables is a relationship question, not a listing
+    joins = processor.process("Which field joins VBAK to KNA1?")
+    assert joins['entities']['intent'] == "relationship"
+    assert len(joins['graph_context']) == 1 and joins['join_paths'][0]['hops'] == 1
+
+    # Impact looks only at tables referencing the seed
+    assert len(processor.process("What tables depend on KNA1?")['graph_context']) == 1
+    assert processor.process("What tables depend on VBAK?")['graph_context'] == []
+
+    assert plan_for("not an intent") is DEFAULT_PLAN and plan_for("data_flow").hops(1) == 2
+
+
+def test_shared_lookup_is_carved_by_direction():
+    records = [
+        {"t1": {"name": "VBAK"}, "r": {"via": "KUNNR"}, "t2": {"name": "KNA1"}},
+        {"t1": {"name": "VBAP"}, "r": {"via": "VBELN"}, "t2": {"name": "VBAK"}},
+    ]
+    assert carve_subgraph(records, ["VBAK"]) == records
+    assert carve_subgraph(records, ["VBAK"], "out") == records[:1]
+    assert carve_subgraph(records, ["VBAK"], "in") == records[1:]
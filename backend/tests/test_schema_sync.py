@@ -0,0 +1,73 @@
+# File: backend/tests/test_schema_sync.py
+
+import copy
+import json
+
+from src.graph.embedded import SchemaGraph
+from src.graph.schema_sync import ChangeSet, apply_changes, load_rows, schema_graph_rows
+from src.graph.schema_version import changed_tables_between
+from src.graph.subgraph_cache import SubgraphCache, subgraph_key
+
+SCHEMA = "data/mock_sap_schema.json"
+
+
+def _edited_schema(tmp_path):
+    with open(SCHEMA) as f:
+        schema = json.load(f)
+    edited = copy.deepcopy(schema)
+    vbak = next(t for t in edited["tables"] if t["name"] == "VBAK")
+    vbak["description"] = "Sales order header"
+    vbak["fields"] = [f for f in vbak["fields"] if f["name"] != "NETWR"]
+    edited["tables"].append({"name": "ZNEW", "fields": [{"name": "ID", "key": True}]})
+    edited["relationships"].append({"from": "ZNEW", "to": "VBAK", "via": "VBELN"})
+    path = tmp_path / "schema.json"
+    path.write_text(json.dumps(edited))
+    return str(path)
+
+
+def test_changeset_diffs_schema_against_snapshot(tmp_path):
+    old = schema_graph_rows(SchemaGraph.from_schema_file(SCHEMA))
+    assert not ChangeSet(old, load_rows(SCHEMA))
+
+    changes = ChangeSet(old, load_rows(_edited_schema(tmp_path)))
+    assert changes.summary() == {
+        "tables": {"added": 1, "removed": 0, "changed": 1},
+        "fields": {"added": 1, "removed": 1, "changed": 0},
+        "relationships": {"added": 1, "removed": 0, "changed": 0},
+    }
+    assert changes.affected_tables() == ["VBAK", "ZNEW"]
+    assert "fields removed: 1: VBAK.NETWR" in changes.report()
+
+    class Session:
+        def __init__(self):
+            self.batches = []
+
+        def execute_write(self, work):
+            class Tx:
+                def run(tx, query, rows):
+                    self.batches.append(len(rows))
+                    record = {"written": len(rows)} if "written" in query else None
+                    return type("Result", (), {"single": lambda result: record})()
+            return work(Tx())
+
+    session = Session()
+    assert apply_changes(session, changes, batch_size=1) == 5
+    assert session.batches == [1] * 5
+
+
+def test_subgraph_cache_drops_only_changed_tables():
+    cache = SubgraphCache()
+    edge = {"t1": {"name": "VBAK"}, "r": {"via": "KUNNR"}, "t2": {"name": "KNA1"}}
+    cache.set(subgraph_key(["KNA1"], 1), [edge], version=1)
+    cache.set(subgraph_key(["MARA"], 1), [], version=1)
+
+    rows = [{"epoch": 2, "tables": ["VBAK"]}]
+    cache.advance(2, changed_tables_between(rows, 1, 2))
+    # KNA1's neighbourhood mentions VBAK, so it goes; MARA's survives
+    assert cache.get(subgraph_key(["KNA1"], 1), 2) is None
+    assert cache.get(subgraph_key(["MARA"], 1), 2) == []
+    assert cache.stats()["invalidated_entries"] == 1
+
+    # Epoch 3 came from a full reload with no change record: everything goes
+    cache.advance(4, changed_tables_between(rows, 2, 4))
+    assert len(cache) == 0
@@ -0,0 +1,83 @@
+# File: backend/tests/test_scoring.py
+
+import csv
+import json
+
+from src.eval.scoring import AnswerScorer, rescore_run, trie_pattern
+
+SCORER = AnswerScorer(
+    ["VBAK", "VBAP", "KNA1", "MARA"],
+    [
+        {"name": "VBELN", "table": "VBAK"}, {"name": "VBELN", "table": "VBAP"},
+        {"name": "KUNNR", "table": "VBAK"}, {"name": "KUNNR", "table": "KNA1"},
+    ],
+    [{"from": "VBAK", "to": "KNA1"}, {"from": "VBAP", "to": "VBAK"}],
+)
+
+
+def test_trie_pattern_matches_whole_names_only():
+    assert trie_pattern(["VB", "VBAK", "VBAP"]) == "VB(?:A(?:K|P))?"
+    assert SCORER.tables_in("VBAKX, xVBAK, vbak and VBAP_1 are not tables") == []
+    assert SCORER.tables_in("VBAP first, then VBAK.VBELN and VBAP again") == ["VBAP", "VBAK"]
+
+
+def test_answers_are_checked_against_schema_and_retrieved_context():
+    answer = (
+        "VBAK joins KNA1 via KUNNR. "
+        "VBAP links to KNA1 directly.\n"
+        "MARA is unrelated. Status lives in VBUK (CHAR 1)."
+    )
+    context = {"tables": {"VBAK", "KNA1"}, "edges": {("KNA1", "VBAK")}}
+    scores = SCORER.score(answer, ["VBAK", "KNA1"], context)
+
+    assert scores["predicted_tables"] == ["VBAK", "KNA1", "VBAP", "MARA"]
+    assert scores["table_precision"] == 0.5 and scores["table_recall"] == 1.0
+    assert scores["ungrounded_tables"] == ["VBAP", "MARA"]
+    # VBAP-KNA1 is not an edge of the schema at all
+    assert scores["unsupported_relationships"] == ["KNA1-VBAP"]
+    assert scores["unknown_identifiers"] == ["VBUK"]
+    assert scores["grounded"] == 0
+
+    assert SCORER.score("VBAK references KNA1 on KUNNR.", context=context)["grounded"] == 1
+    assert SCORER.highlight("VBAK and KUNNR") == ":green[VBAK] and KUNNR"
+
+
+def test_stored_runs_are_rescored(tmp_path):
+    rows = [
+        {"agent": "graph_rag", "answer": "VBAP joins VBAK via VBELN.",
+         "expected_tables": "VBAP,VBAK", "context_tables": "VBAK,KNA1",
+         "context_edges": "KNA1-VBAK"},
+        {"agent": "plain_rag", "answer": "KNA1 holds customers.", "expected_tables": "KNA1"},
+    ]
+    with open(tmp_path / "results.tsv", "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=rows[0].keys(), delimiter="\t", restval="")
+        writer.writeheader()
+        writer.writerows(rows)
+
+    rescored, _ = rescore_run(str(tmp_path), SCORER)
+    assert [r["grounded"] for r in rescored] == [0, 1]
+    assert rescored[0]["ungrounded_tables"] == "VBAP"
+    assert rescored[0]["unsupported_relationships"] == "VBAK-VBAP"
+    assert (tmp_path / "rescored.tsv").exists()
+
+
+def test_scorer_over_schema_file_matches_the_graph(tmp_path):
+    from src.graph.backends import EmbeddedGraphBackend
+    from src.graph.embedded import SchemaGraph
+
+    with open("data/mock_sap_schema.json") as f:
+        schema = json.load(f)
+    schema["relationships"].append({"from": "VBAP", "to": "VBAK", "via": "VBELN"})
+    path = tmp_path / "schema.json"
+    path.write_text(json.dumps(schema))
+
+    from_file = AnswerScorer.from_schema_file(str(path), ["VBAP"])
+    from_graph = AnswerScorer.from_backend(
+        EmbeddedGraphBackend(SchemaGraph.from_schema_file(str(path))), ["VBAP"]
+    )
+    # VBAP is not declared, so its relationship never reaches the graph
+    assert from_file.edges == from_graph.edges == {("KNA1", "VBAK")}
+    assert from_file.tables == from_graph.tables == {"KNA1", "VBAK", "VBAP"}
+    assert from_file.score("VBAP joins VBAK via VBELN.")["unsupported_relationships"] == [
+        "VBAK-VBAP"
+    ]
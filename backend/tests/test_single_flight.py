@@ -0,0 +1,103 @@
+# File: backend/tests/test_single_flight.py
+
+import asyncio
+import threading
+
+import pytest
+
+from src.rag.single_flight import SingleFlight, normalize_query
+
+
+def test_concurrent_coroutines_share_one_call():
+    flight = SingleFlight("test")
+    runs = []
+
+    async def answer(value):
+        runs.append(value)
+        await asyncio.sleep(0.01)
+        return value
+
+    async def main():
+        return await asyncio.gather(
+            *(flight.ado("q", lambda: answer("a")) for _ in range(5)),
+            flight.ado("other", lambda: answer("b")),
+        )
+
+    results = asyncio.run(main())
+    assert runs == ["a", "b"]
+    assert [value for value, _ in results] == ["a"] * 5 + ["b"]
+    assert sum(coalesced for _, coalesced in results) == 4
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def failing():
+        return await asyncio.gather(*(flight.ado("q", fail) for _ in range(3)),
+                                    return_exceptions=True)
+
+    assert all(isinstance(e, ValueError) for e in asyncio.run(failing()))
+    stats = flight.stats()
+    assert stats["calls"] == 9 and stats["executions"] == 3 and stats["in_flight"] == 0
+    assert stats["coalescing_ratio"] == round(6 / 9, 3)
+    assert normalize_query("  Which  table\nstores VBAK? ") == "Which table stores VBAK?"
+
+
+def test_concurrent_subgraph_misses_share_one_lookup(make_processor, counting_backend):
+    backend = counting_backend(delay=0.05)
+    processor = make_processor(backend=backend)
+    entities = {"tables": ["VBAK"], "intent": "relationship"}
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(processor.retrieve_subgraph(entities)))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(backend.lookups) == 1
+    assert all(result == results[0] for result in results) and results[0]
+    assert processor.subgraph_flight.stats()["coalesced"] == 3
+
+
+class SlowProcessor:
+    """Stands in for the processor behind the API"""
+
+    def __init__(self, processor):
+        self.graph = processor.graph
+        self.tracer = processor.tracer
+        self.admission = processor.admission
+        self.runs = 0
+
+    async def aprocess(self, query):
+        self.runs += 1
+        await asyncio.sleep(0.05)
+        return {"query": query, "entities": {}, "graph_context": [], "answer": "ok"}
+
+
+def test_api_coalesces_identical_queries():
+    httpx = pytest.importorskip("httpx")
+    from src.api import main
+
+    original = main.processor
+    main.processor = stub = SlowProcessor(original)
+    try:
+        async def run():
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await asyncio.gather(
+                    client.post("/query", json={"query": "Which table stores customers?"}),
+                    client.post("/query", json={"query": "Which  table stores customers? "}),
+                    client.post("/query", json={"query": "Show me all fields in VBAK"}),
+                )
+
+        responses = [r.json() for r in asyncio.run(run())]
+    finally:
+        main.processor = original
+
+    assert stub.runs == 2
+    assert sorted(r["coalesced"] for r in responses) == [False, False, True]
+    # Each caller gets its own query back, even when it shared another's run
+    assert responses[1]["query"] == "Which  table stores customers? "
@@ -0,0 +1,79 @@
+# File: backend/tests/test_speculation.py
+
+import asyncio
+import json
+
+import pytest
+
+from src.rag.tracing import Tracer
+
+# Names the tables but no intent, so the lexical tier is not confident enough
+QUERY = "Tell me about VBAK and KNA1"
+
+
+@pytest.fixture
+def speculating(make_processor, stub_llm, counting_backend):
+    """Processor whose extraction model answers `entities` slower than a lookup takes"""
+    def make(entities, tracer, failures=0):
+        return make_processor(
+            backend=counting_backend(delay=0.02, failures=failures),
+            entity_llm=stub_llm(json.dumps(entities), delay=0.05),
+            lexical_min_confidence=0.95, tracer=tracer, speculative=True,
+        )
+    return make
+
+
+def retrieve_attrs(result):
+    return next(s["attrs"] for s in result["timings"]["spans"] if s["stage"] == "retrieve")
+
+
+def test_prefetch_is_reused_when_the_llm_agrees(speculating):
+    tracer = Tracer(slow_ms=0)
+    processor = speculating(
+        {"tables": ["KNA1", "VBAK"], "entities": [], "intent": "relationship"}, tracer
+    )
+    result = processor.process(QUERY)
+
+    attrs = retrieve_attrs(result)
+    assert result["extraction_tier"] == "llm"
+    assert attrs["speculation"] == "hit" and attrs["saved_ms"] >= 15
+    assert processor.graph.lookups == [["KNA1", "VBAK"]]
+    assert len(result["graph_context"]) == 1
+    assert 'graphrag_speculative_retrievals_total{outcome="hit",pipeline="graph_rag"} 1' \
+        in tracer.registry.render()
+
+
+def test_only_the_missed_tables_are_fetched(speculating):
+    processor = speculating(
+        {"tables": ["VBAK", "VBAP"], "entities": [], "intent": "relationship"}, Tracer(slow_ms=0)
+    )
+    result = asyncio.run(processor.aprocess(QUERY))
+
+    assert retrieve_attrs(result)["speculation"] == "partial"
+    assert processor.graph.lookups == [["KNA1", "VBAK"], ["VBAP"]]
+    assert [r["t2"]["name"] for r in result["graph_context"]] == ["KNA1"]
+
+
+def test_a_different_plan_discards_the_prefetch(speculating):
+    processor = speculating(
+        {"tables": ["KNA1"], "entities": [], "intent": "impact"}, Tracer(slow_ms=0)
+    )
+    result = processor.process(QUERY)
+
+    attrs = retrieve_attrs(result)
+    assert attrs["speculation"] == "miss" and attrs["saved_ms"] == 0
+    assert processor.graph.lookups == [["KNA1", "VBAK"], ["KNA1"]]
+
+
+def test_a_failed_prefetch_falls_back_to_normal_retrieval(speculating):
+    entities = {"tables": ["KNA1", "VBAK"], "entities": [], "intent": "relationship"}
+    for run in (lambda p: p.process(QUERY), lambda p: asyncio.run(p.aprocess(QUERY))):
+        # The first lookup, the prefetch, fails
+        processor = speculating(entities, Tracer(slow_ms=0), failures=1)
+        result = run(processor)
+
+        assert retrieve_attrs(result)["speculation"] == "miss"
+        assert processor.graph.lookups == [None, ["KNA1", "VBAK"]]
+        assert len(result["graph_context"]) == 1
+        processor.close()
+        assert processor._speculation_executor is None
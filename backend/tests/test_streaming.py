@@ -0,0 +1,47 @@
+# File: backend/tests/test_streaming.py
+
+import asyncio
+
+from langchain_core.messages import AIMessageChunk
+
+from src.rag.llm_cache import CachedLLM, LLMCache
+
+
+class StreamingLLM:
+    model = "stub"
+    max_tokens = 100
+
+    def __init__(self):
+        self.calls = 0
+
+    async def astream(self, prompt):
+        self.calls += 1
+        for token in ["VBAK ", "joins ", "KNA1."]:
+            yield AIMessageChunk(content=token)
+
+
+def collect(processor, query):
+    async def run():
+        return [event async for event in processor.astream(query)]
+    return asyncio.run(run())
+
+
+def test_stream_emits_stages_then_tokens(make_processor, tmp_path):
+    cache = LLMCache(path=str(tmp_path / "cache.sqlite"))
+    processor = make_processor(llm_cache=cache)
+    llm = StreamingLLM()
+    processor.answer_llm = CachedLLM(llm, cache, "answers")
+
+    events = collect(processor, "How is VBAK connected to KNA1?")
+    names = [name for name, _ in events]
+
+    assert names == ["entities", "subgraph", "token", "token", "token", "done"]
+    assert events[0][1]["entities"]["tables"] == ["VBAK", "KNA1"]
+    assert events[1][1]["graph_context"]
+    assert events[-1][1]["answer"] == "VBAK joins KNA1."
+
+    # The completed stream was cached and replays as one chunk
+    replay = collect(processor, "How is VBAK connected to KNA1?")
+    assert [name for name, _ in replay] == ["entities", "subgraph", "token", "done"]
+    assert replay[-1][1]["answer"] == "VBAK joins KNA1."
+    assert llm.calls == 1
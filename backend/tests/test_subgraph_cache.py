@@ -0,0 +1,24 @@
+# File: backend/tests/test_subgraph_cache.py
+
+from src.graph.subgraph_cache import SubgraphCache, subgraph_key
+
+
+def test_lru_eviction_and_version_invalidation():
+    cache = SubgraphCache(maxsize=2)
+    a, b, c = subgraph_key(["VBAK", "KNA1"], 1), subgraph_key(["KNA1"], 1), subgraph_key(["VBAP"], 1)
+    assert a == subgraph_key(["KNA1", "VBAK"], 1)
+
+    cache.set(a, [{"r": "a"}], version=1)
+    cache.set(b, [{"r": "b"}], version=1)
+    assert cache.get(a, 1) == [{"r": "a"}]
+    cache.set(c, [], version=1)  # evicts b, the least recently used
+
+    assert cache.get(b, 1) is None
+    assert cache.get(c, 1) == []
+    assert cache.stats()["evictions"] == 1
+
+    # GraphBuilder bumped the epoch: everything cached under 1 is gone
+    assert cache.get(a, 2) is None
+    stats = cache.stats()
+    assert stats["entries"] == 0 and stats["approx_bytes"] == 0
+    assert stats["invalidations"] == 1 and stats["hit_ratio"] == 0.5
@@ -0,0 +1,63 @@
+# File: backend/tests/test_synthetic_schema.py
+
+import json
+from collections import Counter
+
+import pytest
+
+from src.eval.scale_benchmark import main, run_scale_benchmark
+from src.graph.embedded import SchemaGraph
+from src.graph.synthetic_schema import HUB_TABLES, generate_schema
+
+
+def test_generated_schema_is_seeded_clustered_and_hub_heavy(tmp_path):
+    path = tmp_path / "schema.json"
+    stats = generate_schema(str(path), 2000, avg_fields=12, seed=3)
+    schema = json.loads(path.read_text())
+    tables = {t["name"]: t for t in schema["tables"]}
+    rels = schema["relationships"]
+
+    assert stats["tables"] == len(tables) == 2000
+    assert stats["relationships"] == len(rels)
+    assert stats["fields"] == sum(len(t["fields"]) for t in tables.values())
+    assert 8 < stats["fields"] / 2000 < 16
+
+    # Every reference joins on the target's key, which the source table carries
+    for rel in rels:
+        target_key = next(f["name"] for f in tables[rel["to"]]["fields"] if f["key"])
+        assert rel["via"] == target_key
+        assert target_key in {f["name"] for f in tables[rel["from"]]["fields"]}
+
+    in_degree = Counter(rel["to"] for rel in rels)
+    top = {name for name, _ in in_degree.most_common(len(HUB_TABLES))}
+    assert {"KNA1", "MARA", "T001"} <= top
+
+    # Synthetic tables (Z<module><n>) mostly reference their own module
+    synthetic = [r for r in rels if r["from"].startswith("Z") and r["to"].startswith("Z")]
+    same = sum(r["from"][1:3] == r["to"][1:3] for r in synthetic)
+    assert same / len(synthetic) > 0.6
+
+    again = tmp_path / "again.json"
+    generate_schema(str(again), 2000, avg_fields=12, seed=3)
+    assert again.read_bytes() == path.read_bytes()
+    assert SchemaGraph.from_schema_file(str(path)).num_relationships == len(rels)
+
+
+def test_scale_benchmark_reports_tiers_and_exponents(tmp_path):
+    results = run_scale_benchmark(tiers=(300, 100), data_dir=str(tmp_path), samples=5,
+                                  verbose=False)
+    assert [t["tables"] for t in results["tiers"]] == [100, 300]
+    for tier in results["tiers"]:
+        assert tier["rows"] == tier["tables"] + tier["fields"] + tier["relationships"]
+        assert tier["hubs"]["edges"]["max"] >= tier["sample"]["edges"]["mean"]
+        assert tier["sample"]["context_ms"]["p50"] > 0
+    step = results["scaling"][0]
+    assert (step["from"], step["to"]) == (100, 300)
+    assert "embedded_load_s" in step["exponents"]
+
+
+def test_scale_benchmark_neo4j_mode_must_be_confirmed(tmp_path, capsys):
+    with pytest.raises(SystemExit):
+        main(["--tiers", "100", "--data-dir", str(tmp_path), "--neo4j"])
+    assert "--clear-neo4j" in capsys.readouterr().err
+    assert not list(tmp_path.iterdir())
@@ -0,0 +1,39 @@
+# File: backend/tests/test_tracing.py
+
+import json
+import time
+
+from src.rag.tracing import Tracer
+
+
+def test_process_reports_stage_timings_and_metrics(make_processor, stub_llm):
+    tracer = Tracer(slow_ms=0)
+    processor = make_processor(answer_llm=stub_llm("VBAK joins KNA1 via KUNNR."), tracer=tracer)
+
+    result = processor.process("How is VBAK connected to KNA1?")
+    timings = result["timings"]
+    assert list(timings["stages"]) == ["extract", "seed", "retrieve", "context", "generate"]
+    spans = {span["stage"]: span["attrs"] for span in timings["spans"]}
+    assert spans["extract"]["tier"] == "lexical"
+    assert spans["retrieve"]["edges"] == len(result["graph_context"])
+    assert spans["generate"]["prompt_tokens"] > 0
+
+    text = tracer.registry.render()
+    assert 'graphrag_requests_total{pipeline="graph_rag",status="ok"} 1' in text
+    assert 'graphrag_stage_seconds_count{pipeline="graph_rag",stage="generate"} 1' in text
+    assert "# TYPE graphrag_stage_seconds histogram" in text
+
+
+def test_slow_requests_are_dumped_with_stack_samples(tmp_path):
+    tracer = Tracer(slow_ms=20, trace_dir=str(tmp_path), sample_ms=1)
+    with tracer.trace("plain_rag", "slow one") as trace:
+        with trace.span("generate"):
+            time.sleep(0.05)
+    with tracer.trace("plain_rag", "fast one"):
+        pass
+
+    dumps = list(tmp_path.iterdir())
+    assert len(dumps) == 1
+    dump = json.loads(dumps[0].read_text())
+    assert dump["query"] == "slow one" and dump["stages"]["generate"] >= 50
+    assert any("test_tracing.py" in s["stack"] for s in dump["samples"])
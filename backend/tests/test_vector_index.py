@@ -0,0 +1,123 @@
+# File: backend/tests/test_vector_index.py
+
+import json
+import sys
+import types
+
+import numpy as np
+
+from src.graph.backends import EmbeddedGraphBackend
+from src.graph.embedded import SchemaGraph
+from src.rag.query_processor import GraphRAGProcessor
+from src.rag.vector_index import (
+    HashingEmbedder,
+    VectorIndex,
+    get_embedder,
+    schema_documents,
+    sync_index,
+)
+
+TABLES = {
+    "VBRK": ("Billing Document: Header Data", "Stores invoices sent to customers"),
+    "VBAK": ("Sales Document: Header Data", "Contains header information for all sales documents"),
+    "KNA1": ("Customer Master (General Data)", "Stores general customer master data"),
+    "LIKP": ("SD Document: Delivery Header Data", "Outbound deliveries to customers"),
+    "MARA": ("General Material Data", "Material master"),
+}
+
+
+def write_schema(path, tables=TABLES):
+    schema = {
+        "tables": [
+            {"name": name, "description": desc, "documentation": doc, "type": "transactional",
+             "fields": [{"name": "MANDT", "type": "CLNT(3)", "key": True, "description": "Client"}]}
+            for name, (desc, doc) in tables.items()
+        ],
+        "relationships": [{"from": "VBRK", "to": "KNA1", "via": "KUNAG", "type": "explicit",
+                           "description": "Billing document references payer"}],
+    }
+    path.write_text(json.dumps(schema))
+    return EmbeddedGraphBackend(SchemaGraph.from_schema_file(str(path)))
+
+
+def test_search_finds_tables_by_description(tmp_path):
+    backend = write_schema(tmp_path / "schema.json")
+    embedder = HashingEmbedder()
+    docs = schema_documents(backend.list_tables(), backend.list_fields())
+
+    flat = VectorIndex.build(docs, embedder)
+    assert flat.search_tables("Which billing documents exist?", embedder, k=1) == ["VBRK"]
+    assert flat.search_tables("customer master", embedder, k=1) == ["KNA1"]
+
+    flat.save(str(tmp_path / "index"))
+    loaded = VectorIndex.load(str(tmp_path / "index"))
+    assert isinstance(loaded.vectors, np.memmap)
+    query = embedder.embed(["outbound delivery"])[0]
+    assert loaded.search(query, k=3) == flat.search(query, k=3)
+
+    ivf = VectorIndex.build(docs, embedder, mode="ivf")
+    assert ivf.mode == "ivf" and len(ivf.centroids) == 3
+    # Probing every cluster is exact
+    assert ivf.search(query, k=3, nprobe=3) == flat.search(query, k=3)
+
+
+def test_refresh_embeds_only_changed_documents(tmp_path):
+    class CountingEmbedder(HashingEmbedder):
+        embedded = 0
+
+        def embed(self, texts):
+            self.embedded += len(texts)
+            return super().embed(texts)
+
+    embedder = CountingEmbedder()
+    backend = write_schema(tmp_path / "v1.json")
+    path = str(tmp_path / "index")
+    index = sync_index(backend, embedder, path)
+    assert embedder.embedded == 10
+
+    tables = {**TABLES, "VBRK": ("Invoice header", "Billing documents")}
+    del tables["MARA"]
+    tables["EKKO"] = ("Purchasing Document Header", "Purchase orders")
+    backend = write_schema(tmp_path / "v2.json", tables)
+
+    refreshed = sync_index(backend, embedder, path, current=index)
+    # VBRK's description changed, EKKO and its field are new
+    assert embedder.embedded == 10 + 3
+    assert refreshed.schema_version == backend.schema_version()
+    assert "MARA" not in refreshed.ids and "EKKO.MANDT" in refreshed.ids
+    assert VectorIndex.load(path).ids == refreshed.ids
+
+
+def test_processor_seeds_retrieval_from_vector_hits(tmp_path, monkeypatch):
+    monkeypatch.setenv("VECTOR_INDEX_PATH", "")
+    processor = GraphRAGProcessor(
+        None, None, None, None, graph_backend=write_schema(tmp_path / "schema.json"),
+        embedder=HashingEmbedder(), vector_seeds=1,
+    )
+    entities = processor.seed_entities(
+        "Which billing documents exist?", {"tables": [], "intent": "entity_lookup"}
+    )
+    assert entities["tables"] == [] and entities["seed_tables"] == ["VBRK"]
+    assert processor.retrieve_subgraph(entities)[0]["t1"]["name"] == "VBRK"
+    assert processor.find_join_paths({**entities, "seed_tables": ["VBRK", "KNA1"]}) == ([], [])
+
+
+def test_auto_embedder_never_downloads_the_default_model(monkeypatch):
+    loads = []
+
+    class FakeModel:
+        def __init__(self, name, local_files_only=False):
+            loads.append((name, local_files_only))
+            if local_files_only:
+                raise OSError("not in the local cache")
+
+    monkeypatch.setitem(sys.modules, "sentence_transformers",
+                        types.SimpleNamespace(SentenceTransformer=FakeModel))
+    monkeypatch.delenv("EMBEDDER", raising=False)
+    monkeypatch.delenv("EMBEDDING_MODEL", raising=False)
+    assert isinstance(get_embedder(), HashingEmbedder)
+    assert loads == [("all-MiniLM-L6-v2", True)]
+
+    monkeypatch.setenv("EMBEDDING_MODEL", "my-model")
+    assert get_embedder().name == "my-model"
+    assert loads[-1] == ("my-model", False)